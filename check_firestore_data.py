@@ -4,9 +4,16 @@ Firestoreのofficial_pricesコレクションの内容を確認するスクリ
 """
 
 import json
+import os
+import sys
+
 from google.cloud import firestore
 from google.oauth2 import service_account
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'functions'))
+
+from common.product_catalog import load_product_catalog  # noqa: E402
+
 def check_official_prices():
     """official_pricesコレクションの内容を確認"""
     try:
@@ -51,12 +58,8 @@ def check_official_prices():
         print("\n🔍 iPhone 17シリーズの確認:")
         print("=" * 40)
         
-        expected_series = [
-            "iPhone 17",
-            "iPhone 17 Air", 
-            "iPhone 17 Pro",
-            "iPhone 17 Pro Max"
-        ]
+        catalog = load_product_catalog()
+        expected_series = catalog.series_names(current=True)
         
         # 再度コレクションを取得してiPhone 17シリーズをチェック
         docs = db.collection('official_prices').stream()
@@ -72,13 +75,7 @@ def check_official_prices():
         print("\n🔍 古いiPhone 16シリーズの確認:")
         print("=" * 40)
         
-        old_series = [
-            "iPhone 16",
-            "iPhone 16 Plus",
-            "iPhone 16 Pro", 
-            "iPhone 16 Pro Max",
-            "iPhone 16 e"
-        ]
+        old_series = catalog.series_names(current=False)
         
         for series in old_series:
             if series in found_series:
@@ -1,8 +1,59 @@
+export type ChannelMargin = {
+  effective_price: number;
+  margin: number;
+  margin_rate: number;
+};
+
 export type PriceInfo = {
   official_price: number;
   kaitori_price: number;
   price_diff: number;
   rakuten_diff: number;
+  channels?: Record<string, ChannelMargin>;
+};
+
+export type RankingEntry = {
+  series: string;
+  capacity: string;
+  color: string;
+  channel: string;
+  official_price: number;
+  kaitori_price: number;
+  effective_price: number;
+  margin: number;
+  margin_rate: number;
+};
+
+export type RankingsResponse = {
+  by: 'margin' | 'rate';
+  limit: number;
+  entries: RankingEntry[];
+  updated_at: string;
+};
+
+export type PriceStatsWindow = {
+  days: number;
+  count: number;
+  mean?: number;
+  std?: number;
+  volatility?: number | null;
+  ewma?: number;
+  min?: number;
+  max?: number;
+  first?: number;
+  last?: number;
+  change?: number;
+  change_rate?: number | null;
+};
+
+export type PriceStatsResponse = {
+  series: string;
+  stats: {
+    series: string;
+    capacity: string;
+    last_timestamp: number | null;
+    windows: Record<string, PriceStatsWindow>;
+  }[];
 };
 
 export type PricesResponse = {
@@ -22,9 +73,72 @@ export type PriceHistoryResponse = {
   series: string;
   capacity: string;
   days: number;
+  original_count: number;
   history: PriceHistoryData[];
 };
 
+export type PriceHistoryBatchEntry = {
+  series: string;
+  capacity: string;
+  status: 'ok' | 'timeout' | 'error';
+  error?: string;
+  original_count?: number;
+  history: PriceHistoryData[];
+};
+
+export type PriceHistoryBatchResponse = {
+  days: number;
+  models: PriceHistoryBatchEntry[];
+};
+
+// format=compact の履歴（列ごとの配列。色はカタログの色IDごと）
+export type CompactPriceHistory = {
+  timestamp: number[];
+  kaitori_price_min: number[];
+  kaitori_price_max: number[];
+  colors: Record<string, (number | null)[]>;
+};
+
+export type CompactPriceHistoryResponse = {
+  format: 'compact';
+  catalog_version: number;
+  model_id: string | null;
+  days: number;
+  original_count: number;
+  history: CompactPriceHistory;
+};
+
+// カタログID → 名前の辞書
+export type CatalogDictionary = {
+  version: number;
+  series: Record<string, string>;
+  capacities: Record<string, string>;
+  colors: Record<string, string>;
+};
+
+export type ProbeResult = {
+  status: string;
+  latency_ms: number | null;
+  p50_ms: number | null;
+  p95_ms: number | null;
+  samples: number;
+  checked_at: string | null;
+  last_success: string | null;
+  last_failure: string | null;
+  error?: string;
+};
+
+export type CacheStats = {
+  hit: number;
+  miss: number;
+  coalesced: number;
+  stale: number;
+  timeouts: number;
+  errors: number;
+  entries: number;
+  inflight: number;
+};
+
 export type ApiStatusResponse = {
   status: string;
   services: {
@@ -32,6 +146,8 @@ export type ApiStatusResponse = {
     database: string;
     storage: string;
   };
+  probes?: Record<string, ProbeResult>;
+  caches?: Record<string, CacheStats>;
   timestamp: string;
 };
 
@@ -103,12 +219,14 @@ export async function fetchPrices(series: string): Promise<PricesResponse> {
 export async function fetchPriceHistory(
   series: string,
   capacity: string,
-  days: number = 14
+  days: number = 14,
+  maxPoints?: number
 ): Promise<PriceHistoryResponse> {
   const baseUrl = getApiBaseUrl();
-  const url = `${baseUrl}/get_price_history?series=${encodeURIComponent(
+  let url = `${baseUrl}/get_price_history?series=${encodeURIComponent(
     series
   )}&capacity=${encodeURIComponent(capacity)}&days=${days}`;
+  if (maxPoints) url += `&max_points=${maxPoints}`;
 
   const res = await fetch(url, { cache: 'no-store' });
   if (!res.ok) throw new Error('Price history API fetch failed');
@@ -116,6 +234,106 @@ export async function fetchPriceHistory(
   return res.json();
 }
 
+// 複数モデルの価格推移を1リクエストでまとめて取得
+export async function fetchPriceHistoryBatch(
+  models: { series: string; capacity: string }[],
+  days: number = 14,
+  maxPoints?: number
+): Promise<PriceHistoryBatchResponse> {
+  const baseUrl = getApiBaseUrl();
+  const modelsParam = models
+    .map(({ series, capacity }) => `${series}:${capacity}`)
+    .join(',');
+  let url = `${baseUrl}/get_price_history?models=${encodeURIComponent(
+    modelsParam
+  )}&days=${days}`;
+  if (maxPoints) url += `&max_points=${maxPoints}`;
+
+  const res = await fetch(url, { cache: 'no-store' });
+  if (!res.ok) throw new Error('Price history batch API fetch failed');
+
+  return res.json();
+}
+
+// 利益ランキングの上位を取得
+export async function fetchRankings(
+  by: 'margin' | 'rate' = 'margin',
+  limit: number = 10,
+  filters: { series?: string; capacity?: string; channel?: string } = {}
+): Promise<RankingsResponse> {
+  const baseUrl = getApiBaseUrl();
+  const params = new URLSearchParams({ by, limit: String(limit) });
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value) params.set(key, value);
+  });
+  const url = `${baseUrl}/get_rankings?${params.toString()}`;
+
+  const res = await fetch(url, { cache: 'no-store' });
+  if (!res.ok) throw new Error('Rankings API fetch failed');
+
+  return res.json();
+}
+
+// 7/14/30日の価格統計を取得
+export async function fetchPriceStats(
+  series: string,
+  capacity?: string,
+  days?: 7 | 14 | 30
+): Promise<PriceStatsResponse> {
+  const baseUrl = getApiBaseUrl();
+  let url = `${baseUrl}/get_price_stats?series=${encodeURIComponent(series)}`;
+  if (capacity) url += `&capacity=${encodeURIComponent(capacity)}`;
+  if (days) url += `&days=${days}`;
+
+  const res = await fetch(url, { cache: 'no-store' });
+  if (!res.ok) throw new Error('Price stats API fetch failed');
+
+  return res.json();
+}
+
+// 価格推移をカタログIDの列形式（format=compact）で取得
+export async function fetchCompactPriceHistory(
+  series: string,
+  capacity: string,
+  days: number = 14,
+  maxPoints?: number
+): Promise<CompactPriceHistoryResponse> {
+  const baseUrl = getApiBaseUrl();
+  let url = `${baseUrl}/get_price_history?series=${encodeURIComponent(
+    series
+  )}&capacity=${encodeURIComponent(capacity)}&days=${days}&format=compact`;
+  if (maxPoints) url += `&max_points=${maxPoints}`;
+
+  const res = await fetch(url, { cache: 'no-store' });
+  if (!res.ok) throw new Error('Compact price history API fetch failed');
+
+  return res.json();
+}
+
+// カタログ辞書を取得（IDは変わらないため version が同じ間はキャッシュを使う）
+export async function fetchCatalog(): Promise<CatalogDictionary> {
+  const baseUrl = getApiBaseUrl();
+  const url = `${baseUrl}/get_catalog`;
+
+  const cached = cache[url];
+  const now = Date.now();
+
+  if (cached && now - cached.timestamp < CACHE_DURATION) {
+    return cached.data;
+  }
+
+  const res = await fetch(url, { cache: 'no-store' });
+  if (!res.ok) throw new Error('Catalog API fetch failed');
+
+  const data = await res.json();
+  cache[url] = {
+    data,
+    timestamp: now,
+  };
+
+  return data;
+}
+
 export async function fetchApiPrices(): Promise<OfficialPriceData[]> {
   const baseUrl = getApiBaseUrl();
   const url = `${baseUrl}/api_prices`;
@@ -1,31 +1,63 @@
 import json
+import os
 from datetime import datetime
 
-from google.cloud import firestore
+from common.cache import SingleFlightCache
 from common.cors import get_cors_headers, handle_cors_request
+from common.firestore_client import get_firestore_client
+from common.instrumentation import phase, record_reads
+from common.rate_limit import check_rate_limit
 
+API_PRICES_CACHE_TTL_SECONDS = float(os.getenv('PRICES_CACHE_TTL_SECONDS', '60'))
+_api_prices_cache = SingleFlightCache('api_prices', API_PRICES_CACHE_TTL_SECONDS)
 
-def api_prices(request):
-    """Cloud Functions用 価格データ取得エンドポイント (Firestore版)"""
-    # CORS preflight request handling
-    cors_response = handle_cors_request(request)
-    if cors_response:
-        return cors_response
-    
-    db = firestore.Client()
+
+def _load_official_prices(db):
+    """公式価格を全件取得"""
     # 必要に応じてクエリパラメータでフィルタ可能
     prices_ref = db.collection('official_prices')
-    docs = prices_ref.stream()
+    with phase('firestore'):
+        docs = list(prices_ref.stream())
+    record_reads(len(docs))
     result = []
     for doc in docs:
         data = doc.to_dict()
         data['id'] = doc.id
         result.append(data)
+    return result
+
+
+def api_prices(request):
+    """Cloud Functions用 価格データ取得エンドポイント (Firestore版)"""
+    # CORS preflight request handling
+    cors_response = handle_cors_request(request)
+    if cors_response:
+        return cors_response
+    
+    # キャッシュから返せる（Firestoreを読まない）リクエストはレート制限の対象外
+    if not _api_prices_cache.is_fresh(''):
+        rate_limited = check_rate_limit(request)
+        if rate_limited:
+            return rate_limited
+    
+    db = get_firestore_client()
+    try:
+        result, cache_status = _api_prices_cache.get('', lambda: _load_official_prices(db))
+    except TimeoutError:
+        # 他のリクエストの読み込みを待ちきれなかった（期限切れの値もない）
+        return (json.dumps({'error': 'Price data is being loaded, please retry'}), 503, {
+            'Content-Type': 'application/json',
+            **get_cors_headers()
+        })
+    
+    with phase('encode'):
+        body = json.dumps(result, default=str)
     
     # CORSヘッダーを含むヘッダーを設定
     headers = {
         'Content-Type': 'application/json',
         'Cache-Control': 'public, max-age=300',
+        'X-Cache': cache_status.upper(),
         **get_cors_headers()
     }
-    return (json.dumps(result, default=str), 200, headers) 
\ No newline at end of file
+    return (body, 200, headers) 
\ No newline at end of file
@@ -1,34 +1,34 @@
 import json
-import os
 from datetime import datetime
 
-from google.cloud import firestore
+from common.cache import get_cache_stats
 from common.cors import get_cors_headers, handle_cors_request
+from api_status.probes import get_probe_results
 
 
 def api_status(request):
-    """Cloud Functions用 APIステータスエンドポイント"""
+    """Cloud Functions用 APIステータスエンドポイント
+
+    Firestore・Cloud Storage の状態はキャッシュされたプローブ結果を返す
+    （リクエストごとに接続確認は行わない）。
+    caches には同じインスタンスの読み取りキャッシュの統計（合流したリクエスト数など）を返す。
+    """
     # CORS preflight request handling
     cors_response = handle_cors_request(request)
     if cors_response:
         return cors_response
     
-    # Firestore接続確認
-    try:
-        firestore.Client().collection('_health_check').limit(1).get()
-        db_status = "connected"
-    except Exception as e:
-        print(f"Firestore connection failed: {e}")  # Log for debugging
-        db_status = "disconnected"
-    # Storage接続確認（省略可、必要ならgoogle-cloud-storageで実装）
-    storage_status = os.getenv('BUCKET_NAME', None)
+    probes = get_probe_results()
+    storage_status = probes['storage']['status']
     result = {
         "status": "operational",
         "services": {
             "api": "running",
-            "database": db_status,
-            "storage": "configured" if storage_status else "not_configured"
+            "database": probes['database']['status'],
+            "storage": "configured" if storage_status == 'connected' else storage_status
         },
+        "probes": probes,
+        "caches": get_cache_stats(),
         "timestamp": datetime.now().isoformat()
     }
     headers = {
@@ -36,4 +36,4 @@ def api_status(request):
         'Cache-Control': 'public, max-age=60',
         **get_cors_headers()
     }
-    return (json.dumps(result, default=str), 200, headers) 
\ No newline at end of file
+    return (json.dumps(result, default=str), 200, headers)
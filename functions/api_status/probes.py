@@ -0,0 +1,149 @@
+"""
+依存サービス（Firestore・Cloud Storage）のヘルスプローブ
+
+プローブ結果は PROBE_TTL_SECONDS の間キャッシュし、期限切れ後の最初の
+リクエストの中で再取得する。そのため api_status へのポーリングごとに
+Firestoreの読み取りは発生しない。
+
+gen1 の関数はレスポンスを返した後にCPUが割り当てられないため、
+バックグラウンドのスレッドでは再取得しない（止まったまま古い結果を返し続けるのを防ぐ）。
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from common.firestore_client import get_firestore_client
+
+PROBE_TTL_SECONDS = float(os.getenv('HEALTH_PROBE_TTL_SECONDS', '30'))
+
+# p50/p95 の計算に使う直近のレイテンシの件数
+LATENCY_WINDOW = 100
+
+
+def _percentile(sorted_values, percent):
+    """ソート済みの値から最近傍順位法でパーセンタイルを求める"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class DependencyProbe:
+    """1つの依存サービスの状態をキャッシュ付きで確認するプローブ
+
+    check は成功時に状態文字列（'connected' など）を返し、失敗時は例外を送出する。
+    """
+
+    def __init__(self, name, check, ttl_seconds=PROBE_TTL_SECONDS, window=LATENCY_WINDOW):
+        self.name = name
+        self._check = check
+        self._ttl_seconds = ttl_seconds
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._checked_at = None  # time.monotonic() 基準
+        self._status = None
+        self._error = None
+        self._last_latency_ms = None
+        self._last_checked = None
+        self._last_success = None
+        self._last_failure = None
+
+    def _refresh(self):
+        start = time.perf_counter()
+        try:
+            status = self._check()
+            error = None
+        except Exception as e:
+            print(f"Health probe '{self.name}' failed: {e}")  # Log for debugging
+            status = 'disconnected'
+            error = str(e)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        now = time.time()
+        with self._lock:
+            self._status = status
+            self._error = error
+            self._last_latency_ms = latency_ms
+            self._latencies.append(latency_ms)
+            self._checked_at = time.monotonic()
+            self._last_checked = now
+            if error is None:
+                self._last_success = now
+            else:
+                self._last_failure = now
+            self._refreshing = False
+
+    def get(self):
+        """プローブ結果を返す（期限切れならこのリクエストの中で再取得する）
+
+        同じインスタンスで別のリクエストが再取得中の場合は、待たずにキャッシュ済みの結果を返す。
+        """
+        with self._lock:
+            stale = self._checked_at is None or time.monotonic() - self._checked_at >= self._ttl_seconds
+            start_refresh = stale and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+
+        if start_refresh:
+            self._refresh()
+
+        return self.snapshot()
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            result = {
+                'status': self._status or 'unknown',
+                'latency_ms': self._last_latency_ms,
+                'p50_ms': _percentile(latencies, 50),
+                'p95_ms': _percentile(latencies, 95),
+                'samples': len(latencies),
+                'checked_at': _isoformat(self._last_checked),
+                'last_success': _isoformat(self._last_success),
+                'last_failure': _isoformat(self._last_failure),
+            }
+            if self._error:
+                result['error'] = self._error
+            return result
+
+
+def _check_firestore():
+    get_firestore_client().collection('_health_check').limit(1).get()
+    return 'connected'
+
+
+_storage_client = None
+
+
+def _check_storage():
+    bucket_name = os.getenv('BUCKET_NAME')
+    if not bucket_name:
+        return 'not_configured'
+
+    global _storage_client
+    if _storage_client is None:
+        from google.cloud import storage
+        _storage_client = storage.Client()
+    if not _storage_client.bucket(bucket_name).exists():
+        raise RuntimeError(f"Bucket not found: {bucket_name}")
+    return 'connected'
+
+
+PROBES = {
+    'database': DependencyProbe('database', _check_firestore),
+    'storage': DependencyProbe('storage', _check_storage),
+}
+
+
+def get_probe_results():
+    """全プローブの結果を返す"""
+    return {name: probe.get() for name, probe in PROBES.items()}
@@ -1,18 +1,95 @@
 import json
 from datetime import datetime
 
+from common.alerts import evaluate_alerts, load_undelivered_events, mark_alerts_notified, mark_events_delivered
+from common.auth import has_bearer_secret
+from common.firestore_client import get_firestore_client
+from common.notifications import NotificationDispatcher, StdoutTransport, get_transport
+from common.rankings import refresh_margin_ranking
+
+
+# 価格チェックの実行に必要な共有シークレット（Authorization: Bearer ...）。未設定の場合は実行しない
+CHECK_PRICES_SECRET_ENV = 'CHECK_PRICES_SECRET'
+
 
 def check_prices(request):
-    """Cloud Functions用 価格チェックエンドポイント"""
-    if request.method != 'GET':
-        return (json.dumps({"error": "Method Not Allowed"}), 405, {'Content-Type': 'application/json'})
-    # ここで実際の価格チェック処理を呼び出す（ダミー実装）
-    result = {
-        "message": "Price check completed",
-        "timestamp": datetime.now().isoformat()
-    }
+    """Cloud Functions用 価格チェックエンドポイント（POST）
+
+    スクレイピング後に呼び出され、現在の買取価格に対して価格アラートを判定し、
+    発火したアラートを受信者ごとにまとめて通知する。
+    あわせて get_rankings が返す利益ランキングを作り直す。
+    書き込みと通知を行うため Authorization: Bearer <CHECK_PRICES_SECRET> が必要（なければ 401）。
+
+    ?dry_run=1 の場合は判定だけを行い、Firestoreに書き込まず、通知は標準出力にのみ書き出す
+    （デプロイ後の動作確認用。Slack などの本番のトランスポートは使わない）。
+    """
     headers = {
         'Content-Type': 'application/json',
         'Cache-Control': 'no-store'
     }
-    return (json.dumps(result, default=str), 200, headers) 
\ No newline at end of file
+    if request.method != 'POST':
+        return (json.dumps({"error": "Method Not Allowed"}), 405, {**headers, 'Allow': 'POST'})
+    if not has_bearer_secret(request, CHECK_PRICES_SECRET_ENV):
+        return (json.dumps({"error": "Unauthorized"}), 401, {**headers, 'WWW-Authenticate': 'Bearer'})
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true')
+    db = get_firestore_client()
+    try:
+        summary = evaluate_alerts(db, dry_run=dry_run)
+    except Exception as e:
+        return (json.dumps({"error": f"Price check failed: {str(e)}"}), 500, headers)
+
+    if dry_run:
+        notifications = None
+        if summary['events']:
+            dispatcher = NotificationDispatcher(StdoutTransport())
+            dispatcher.enqueue(summary['events'])
+            notifications = dispatcher.flush()
+            for key in ('notified_alert_ids', 'delivered_event_ids', 'failed_event_ids'):
+                notifications.pop(key)
+        result = {
+            "message": "Price check completed (dry run)",
+            "dry_run": True,
+            "models_checked": summary['models_checked'],
+            "alerts_active": summary['alerts_active'],
+            "alerts_triggered": summary['alerts_triggered'],
+            "notifications": notifications,
+            "timestamp": datetime.now().isoformat()
+        }
+        return (json.dumps(result, default=str), 200, headers)
+
+    # 発火したアラートの通知（通知の失敗は価格チェックの結果に影響させない）
+    # 前回までに送信に失敗したイベントも再送する（失敗したイベントは delivered: False のまま残る）
+    notifications = None
+    try:
+        fresh_ids = {event['id'] for event in summary['events']}
+        pending = [event for event in load_undelivered_events(db) if event['id'] not in fresh_ids]
+        pending.sort(key=lambda event: event.get('triggered_at') or '')
+        if pending or summary['events']:
+            dispatcher = NotificationDispatcher(get_transport())
+            dispatcher.enqueue(pending + summary['events'])
+            notifications = dispatcher.flush()
+            mark_alerts_notified(db, notifications.pop('notified_alert_ids'))
+            mark_events_delivered(db, notifications.pop('delivered_event_ids'), notifications.pop('failed_event_ids'))
+            notifications['retried'] = len(pending)
+            print(f"Alert notifications: {json.dumps(notifications)}")
+    except Exception as e:
+        print(f"Alert notification failed: {e}")  # Log for debugging
+        notifications = {"error": str(e)}
+
+    # 利益ランキングの更新（失敗しても価格チェックの結果に影響させない）
+    try:
+        ranking = refresh_margin_ranking(db)
+    except Exception as e:
+        print(f"Margin ranking refresh failed: {e}")  # Log for debugging
+        ranking = {"error": str(e)}
+
+    result = {
+        "message": "Price check completed",
+        "models_checked": summary['models_checked'],
+        "alerts_active": summary['alerts_active'],
+        "alerts_triggered": summary['alerts_triggered'],
+        "notifications": notifications,
+        "ranking": ranking,
+        "timestamp": datetime.now().isoformat()
+    }
+    return (json.dumps(result, default=str), 200, headers)
@@ -0,0 +1,268 @@
+"""
+価格アラートの共通モジュール
+- アラートの入力検証
+- (series, capacity) ごとにしきい値をソートして保持するインデックス
+- 買取価格の変化に対するアラートの判定
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from common.price_record import model_key
+
+ALERTS_COLLECTION = 'price_alerts'
+ALERT_STATE_COLLECTION = 'alert_state'
+ALERT_EVENTS_COLLECTION = 'alert_events'
+
+# above: 買取価格がしきい値以上になったら通知 / below: しきい値以下になったら通知
+DIRECTIONS = ('above', 'below')
+
+# Firestoreのバッチ書き込みの上限
+MAX_BATCH_WRITES = 500
+
+
+def is_evaluated(alert):
+    """一度でも判定（または通知）されたアラートか
+
+    未判定のアラートは作成時点で条件を満たしていることがあるため、
+    前回の価格からの変化ではなく現在の価格で判定する。
+    """
+    return bool(alert.get('last_evaluated_at') or alert.get('last_notified_at'))
+
+
+def validate_alert(data):
+    """set_alert のリクエストボディを検証して保存用のアラートを返す
+
+    Raises:
+        ValueError: 必須項目の不足や値が不正な場合
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+
+    series = data.get('series')
+    capacity = data.get('capacity')
+    recipient = data.get('recipient')
+    for field, value in (('series', series), ('capacity', capacity), ('recipient', recipient)):
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"'{field}' is required")
+
+    threshold = data.get('threshold')
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or threshold <= 0:
+        raise ValueError("'threshold' must be a positive number")
+
+    direction = data.get('direction', 'above')
+    if direction not in DIRECTIONS:
+        raise ValueError(f"'direction' must be one of {', '.join(DIRECTIONS)}")
+
+    return {
+        'series': series.strip(),
+        'capacity': capacity.strip(),
+        'model': model_key(series.strip(), capacity.strip()),
+        'threshold': int(threshold),
+        'direction': direction,
+        'recipient': recipient.strip(),
+        'active': True,
+        'created_at': datetime.now().isoformat()
+    }
+
+
+class AlertIndex:
+    """(series, capacity) ごと・方向ごとにしきい値の昇順でアラートを保持するインデックス
+
+    価格が変化したときに発火するアラートを、全件走査ではなく二分探索で求める。
+    判定済みのアラートと未判定のアラート（is_evaluated）は別に保持する。
+    """
+
+    def __init__(self):
+        # model -> (しきい値の昇順リスト, 同じ順序のアラートのリスト)
+        self._books = {direction: {} for direction in DIRECTIONS}
+        self._new_books = {direction: {} for direction in DIRECTIONS}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @classmethod
+    def build(cls, alerts):
+        """アラートのリストから一括でインデックスを作成（モデルごとに1回だけソートする）"""
+        index = cls()
+        grouped = {}
+        for alert in alerts:
+            books = index._books if is_evaluated(alert) else index._new_books
+            grouped.setdefault((id(books), alert['direction'], alert['model']), (books, []))[1].append(alert)
+        for (_, direction, model), (books, model_alerts) in grouped.items():
+            model_alerts.sort(key=lambda a: a['threshold'])
+            books[direction][model] = ([a['threshold'] for a in model_alerts], model_alerts)
+            index._count += len(model_alerts)
+        return index
+
+    def add(self, alert):
+        """アラートを1件追加"""
+        books = self._books if is_evaluated(alert) else self._new_books
+        thresholds, alerts = books[alert['direction']].setdefault(alert['model'], ([], []))
+        position = bisect_right(thresholds, alert['threshold'])
+        thresholds.insert(position, alert['threshold'])
+        alerts.insert(position, alert)
+        self._count += 1
+
+    def match(self, series, capacity, price, previous_price=None):
+        """価格の変化で発火するアラートを返す
+
+        判定済みのアラートは、previous_price が指定された場合は前回の価格から
+        しきい値を跨いだものだけを返す（価格が動かなければ同じアラートは再発火しない）。
+        未判定のアラートと previous_price が指定されない場合は、現在の価格で条件を満たすものを返す。
+        """
+        model = model_key(series, capacity)
+        return _match_books(self._books, model, price, previous_price) + _match_books(self._new_books, model, price)
+
+    def new_alerts(self, series, capacity):
+        """未判定のアラート（evaluate_alerts で判定後に last_evaluated_at を記録する）"""
+        model = model_key(series, capacity)
+        return [
+            alert
+            for direction in DIRECTIONS
+            for alert in self._new_books[direction].get(model, ([], []))[1]
+        ]
+
+
+def _match_books(books, model, price, previous_price=None):
+    matched = []
+
+    # above: previous_price < threshold <= price
+    book = books['above'].get(model)
+    if book:
+        thresholds, alerts = book
+        lo = bisect_right(thresholds, previous_price) if previous_price is not None else 0
+        hi = bisect_right(thresholds, price)
+        matched.extend(alerts[lo:hi])
+
+    # below: price <= threshold < previous_price
+    book = books['below'].get(model)
+    if book:
+        thresholds, alerts = book
+        lo = bisect_left(thresholds, price)
+        hi = bisect_left(thresholds, previous_price) if previous_price is not None else len(thresholds)
+        matched.extend(alerts[lo:hi])
+
+    return matched
+
+
+def load_alert_index(db):
+    """Firestoreの有効なアラートからインデックスを作成"""
+    alerts = []
+    for doc in db.collection(ALERTS_COLLECTION).where('active', '==', True).stream():
+        alert = doc.to_dict()
+        alert['id'] = doc.id
+        if alert.get('direction') in DIRECTIONS and alert.get('model'):
+            alerts.append(alert)
+    return AlertIndex.build(alerts)
+
+
+def _commit_in_batches(db, writes, merge=False):
+    """(DocumentReference, data) のリストを上限件数ごとにバッチで書き込む"""
+    for start in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for ref, data in writes[start:start + MAX_BATCH_WRITES]:
+            batch.set(ref, data, merge=merge)
+        batch.commit()
+
+
+def mark_alerts_notified(db, alert_ids, notified_at=None):
+    """通知したアラートに last_notified_at を記録する（通知のクールダウン判定に使う）"""
+    notified_at = notified_at or datetime.now().isoformat()
+    writes = [
+        (db.collection(ALERTS_COLLECTION).document(alert_id), {'last_notified_at': notified_at})
+        for alert_id in dict.fromkeys(alert_ids)
+    ]
+    _commit_in_batches(db, writes, merge=True)
+
+
+def load_undelivered_events(db):
+    """送信に失敗した（または送信前に止まった）発火イベント。id にドキュメントIDを入れて返す"""
+    return [
+        {**doc.to_dict(), 'id': doc.id}
+        for doc in db.collection(ALERT_EVENTS_COLLECTION).where('delivered', '==', False).stream()
+    ]
+
+
+def mark_events_delivered(db, delivered_ids, failed_ids=(), at=None):
+    """発火イベントに送信の成否を記録する（delivered が False のイベントは次回の通知で再送する）"""
+    at = at or datetime.now().isoformat()
+    writes = [
+        (db.collection(ALERT_EVENTS_COLLECTION).document(event_id), {'delivered': True, 'delivered_at': at})
+        for event_id in dict.fromkeys(delivered_ids)
+    ]
+    writes += [
+        (db.collection(ALERT_EVENTS_COLLECTION).document(event_id), {'delivered': False, 'last_failed_at': at})
+        for event_id in dict.fromkeys(failed_ids)
+    ]
+    _commit_in_batches(db, writes, merge=True)
+
+
+def evaluate_alerts(db, dry_run=False):
+    """現在の買取価格に対してアラートを判定し、発火したものを alert_events に記録する
+
+    前回判定時の価格は alert_state コレクションに (series, capacity) ごとに保存し、
+    次回の判定ではその価格からしきい値を跨いだアラートのみを発火させる。
+    未判定のアラート（作成後に初めて判定するもの）は現在の価格で判定し、
+    判定後に last_evaluated_at を記録する。
+    イベントは delivered: False で記録し、返すイベントには id（ドキュメントID）を入れる。
+    dry_run の場合は判定だけを行い、何も書き込まない。
+
+    Returns:
+        判定結果のサマリー
+    """
+    index = load_alert_index(db)
+    states = {doc.id: doc.to_dict() for doc in db.collection(ALERT_STATE_COLLECTION).stream()}
+
+    now = datetime.now().isoformat()
+    writes = []
+    evaluated_writes = []
+    triggered = []
+    models_checked = 0
+    for doc in db.collection('kaitori_prices').stream():
+        data = doc.to_dict()
+        series = data.get('series')
+        capacity = data.get('capacity')
+        price = data.get('kaitori_price_max')
+        if not series or not capacity or not price:
+            continue
+        models_checked += 1
+
+        model = model_key(series, capacity)
+        previous_price = states.get(model, {}).get('price')
+        for alert in index.match(series, capacity, price, previous_price):
+            event = {
+                'alert_id': alert['id'],
+                'recipient': alert.get('recipient'),
+                'series': series,
+                'capacity': capacity,
+                'threshold': alert['threshold'],
+                'direction': alert['direction'],
+                'price': price,
+                'previous_price': previous_price,
+                'triggered_at': now,
+                'last_notified_at': alert.get('last_notified_at'),
+                'delivered': False
+            }
+            ref = db.collection(ALERT_EVENTS_COLLECTION).document()
+            triggered.append({**event, 'id': ref.id})
+            writes.append((ref, event))
+        for alert in index.new_alerts(series, capacity):
+            evaluated_writes.append((db.collection(ALERTS_COLLECTION).document(alert['id']), {'last_evaluated_at': now}))
+
+        if price != previous_price:
+            writes.append((
+                db.collection(ALERT_STATE_COLLECTION).document(model),
+                {'series': series, 'capacity': capacity, 'price': price, 'evaluated_at': now}
+            ))
+
+    if not dry_run:
+        _commit_in_batches(db, writes)
+        _commit_in_batches(db, evaluated_writes, merge=True)
+    return {
+        'models_checked': models_checked,
+        'alerts_active': len(index),
+        'alerts_triggered': len(triggered),
+        'events': triggered
+    }
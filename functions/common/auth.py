@@ -0,0 +1,17 @@
+"""
+管理用エンドポイント（ジョブの登録・価格チェックなど）の認証
+- Authorization: Bearer <共有シークレット> を環境変数の値と比較する
+- シークレットが未設定の場合は全てのリクエストを拒否する
+"""
+
+import hmac
+import os
+
+
+def has_bearer_secret(request, secret_env):
+    """Authorization: Bearer <環境変数 secret_env の値> のリクエストか"""
+    secret = os.getenv(secret_env)
+    if not secret:
+        return False
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), secret.encode())
@@ -0,0 +1,128 @@
+"""
+読み取り系エンドポイント用のインスタンス内キャッシュ
+- TTL付きでレスポンスの元データを保持する
+- 期限切れ時に同時に来たリクエストは1つだけがFirestoreを読み（single-flight）、
+  他のリクエストは同じ Future の完了を待つか、期限切れの値（stale）を返す
+- ヒット・ミス・合流（coalesced）などの件数を記録する
+
+Cloud Functions（gen1, --no-gen2）は1インスタンスで1リクエストずつ処理するため、
+インスタンス内で読み込みがまとまることはほとんどない。効果があるのは主に TTL 内の hit で、
+インスタンスをまたいだ期限切れ時の同時読み込み（stampede）は防げない。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from common.instrumentation import record_cache
+
+# 値の取得元
+HIT = 'hit'
+MISS = 'miss'
+COALESCED = 'coalesced'
+STALE = 'stale'
+
+_caches = {}
+
+
+class SingleFlightCache:
+    """TTL付きキャッシュ + 同一キーの読み込みを1回にまとめる single-flight
+
+    get(key, loader) の動作:
+    - 有効期限内の値があればそのまま返す（hit）
+    - なければ最初のリクエストが loader() を実行する（miss）
+    - 実行中に来たリクエストは、期限切れの値があればそれを返し（stale）、
+      なければ wait_timeout 秒まで同じ結果を待つ（coalesced）
+    """
+
+    def __init__(self, name, ttl_seconds, wait_timeout=10.0, max_entries=256):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.wait_timeout = wait_timeout
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (値, 取得時刻 time.monotonic())
+        self._inflight = {}  # key -> Future
+        self._stats = {HIT: 0, MISS: 0, COALESCED: 0, STALE: 0, 'timeouts': 0, 'errors': 0}
+        _caches[name] = self
+
+    def get(self, key, loader):
+        """キャッシュから値を取得する（取得元は現在のリクエストの計測にも記録する）
+
+        Returns:
+            (値, 取得元) のタプル。取得元は hit / miss / coalesced / stale
+
+        Raises:
+            TimeoutError: 他のリクエストの読み込みが wait_timeout 秒以内に終わらず、期限切れの値もない場合
+            loader() が送出した例外
+        """
+        value, source = self._get(key, loader)
+        record_cache(source)
+        return value, source
+
+    def _get(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._stats[HIT] += 1
+                return entry[0], HIT
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self._stats[MISS] += 1
+            elif entry is not None:
+                self._stats[STALE] += 1
+                return entry[0], STALE
+            else:
+                self._stats[COALESCED] += 1
+
+        if not leader:
+            try:
+                return future.result(timeout=self.wait_timeout), COALESCED
+            except FutureTimeoutError:
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise TimeoutError(f"Timed out waiting for in-flight load of {self.name}:{key}")
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._inflight[key]
+        future.set_result(value)
+        return value, MISS
+
+    def is_fresh(self, key):
+        """有効期限内の値があるか（Firestoreを読まずに返せるか）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() - entry[1] < self.ttl_seconds
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries), 'inflight': len(self._inflight)}
+
+
+def get_cache_stats():
+    """このインスタンスの全キャッシュの統計を返す"""
+    return {name: cache.stats() for name, cache in _caches.items()}
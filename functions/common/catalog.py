@@ -0,0 +1,192 @@
+"""
+カタログID（シリーズ・容量・色）の共通モジュール
+
+シリーズ名・容量・色名に小さな整数IDを割り当て、catalog/ids ドキュメントに保存する。
+IDは追加のみで変更・再利用しないため、一度割り当てたIDはずっと同じ名前を指す。
+
+price_history は名前の代わりにIDで保存する:
+    {'model_id': '<シリーズID>:<容量ID>', 'colors': {'<色ID>': 価格}, ...}
+get_price_history は通常はIDを名前に戻して返し、format=compact ではIDのまま返す。
+IDと名前の対応は get_catalog エンドポイント（辞書）で取得できる。
+"""
+
+import os
+from datetime import datetime
+
+from common.cache import SingleFlightCache
+from common.instrumentation import record_reads
+
+CATALOG_COLLECTION = 'catalog'
+CATALOG_IDS_ID = 'ids'
+
+# IDを割り当てる種類
+KINDS = ('series', 'capacities', 'colors')
+
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv('CATALOG_CACHE_TTL_SECONDS', '300'))
+_catalog_cache = SingleFlightCache('catalog', CATALOG_CACHE_TTL_SECONDS)
+
+
+class CatalogRegistry:
+    """名前とIDの対応（種類ごと）"""
+
+    def __init__(self, ids=None, version=0):
+        self.ids = {kind: dict((ids or {}).get(kind) or {}) for kind in KINDS}
+        self.names = {kind: {id_: name for name, id_ in self.ids[kind].items()} for kind in KINDS}
+        self.version = version
+
+    def id_of(self, kind, name):
+        return self.ids[kind].get(name)
+
+    def name_of(self, kind, id_):
+        """IDの名前（未登録・数値でないIDの場合は None）"""
+        try:
+            return self.names[kind].get(int(id_))
+        except (TypeError, ValueError):
+            return None
+
+    def assign(self, kind, name):
+        """名前のIDを返す（未登録の場合は次のIDを割り当てる）
+
+        Returns:
+            (ID, 新しく割り当てたかどうか)
+        """
+        id_ = self.ids[kind].get(name)
+        if id_ is not None:
+            return id_, False
+        id_ = max(self.names[kind], default=-1) + 1
+        self.ids[kind][name] = id_
+        self.names[kind][id_] = name
+        return id_, True
+
+    def model_id(self, series, capacity):
+        """(series, capacity) のID（未登録の場合は None）"""
+        series_id = self.id_of('series', series)
+        capacity_id = self.id_of('capacities', capacity)
+        if series_id is None or capacity_id is None:
+            return None
+        return f"{series_id}:{capacity_id}"
+
+    def model_names(self, model_id):
+        """model_id の (series, capacity)（未登録・不正なIDを含む場合は None）"""
+        series_id, _, capacity_id = str(model_id).partition(':')
+        series = self.name_of('series', series_id)
+        capacity = self.name_of('capacities', capacity_id)
+        if series is None or capacity is None:
+            return None
+        return series, capacity
+
+    def dictionary(self):
+        """辞書エンドポイント用（ID → 名前）"""
+        return {
+            'version': self.version,
+            **{kind: {str(id_): name for id_, name in sorted(self.names[kind].items())} for kind in KINDS}
+        }
+
+    def to_dict(self):
+        return {
+            **{kind: dict(self.ids[kind]) for kind in KINDS},
+            'version': self.version,
+            'updated_at': datetime.now().isoformat()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data, data.get('version', 0))
+
+
+def load_catalog(db):
+    """catalog/ids を読み込む（未作成の場合は空のカタログ）"""
+    snapshot = db.collection(CATALOG_COLLECTION).document(CATALOG_IDS_ID).get()
+    return CatalogRegistry.from_dict(snapshot.to_dict()) if snapshot.exists else CatalogRegistry()
+
+
+def cached_catalog(db, refresh=False):
+    """インスタンス内でキャッシュしたカタログ（未知のIDに出会った場合は refresh=True で読み直す）"""
+    def load():
+        record_reads(1)
+        return load_catalog(db)
+
+    if refresh:
+        _catalog_cache.clear()
+    catalog, _ = _catalog_cache.get('', load)
+    return catalog
+
+
+def is_catalog_cached():
+    """インスタンス内のキャッシュが有効かどうか（Firestore を読まずに返せるか）"""
+    return _catalog_cache.is_fresh('')
+
+
+def register_catalog(db, records):
+    """PriceRecord のシリーズ・容量・色にIDを割り当てて保存する（書き込み側で保存前に呼び出す）"""
+    from google.cloud import firestore
+
+    records = list(records)
+    ref = db.collection(CATALOG_COLLECTION).document(CATALOG_IDS_ID)
+
+    @firestore.transactional
+    def register_in_transaction(transaction):
+        snapshot = ref.get(transaction=transaction)
+        catalog = CatalogRegistry.from_dict(snapshot.to_dict()) if snapshot.exists else CatalogRegistry()
+        added = False
+        for record in records:
+            added |= catalog.assign('series', record.series)[1]
+            added |= catalog.assign('capacities', record.capacity)[1]
+            for color, _ in record.colors:
+                added |= catalog.assign('colors', color)[1]
+        if added:
+            catalog.version += 1
+            transaction.set(ref, catalog.to_dict())
+        return catalog
+
+    return register_in_transaction(db.transaction())
+
+
+def expand_history_doc(data, catalog):
+    """IDで保存した price_history のドキュメントを名前のドキュメントに戻す
+
+    未登録・不正なIDを含む場合は None を返す。名前で保存された古いドキュメントはそのまま返す。
+    """
+    model_id = data.get('model_id')
+    if model_id is None:
+        return data
+    names = catalog.model_names(model_id)
+    if names is None:
+        return None
+    series, capacity = names
+    colors = {}
+    for color_id, price in (data.get('colors') or {}).items():
+        color = catalog.name_of('colors', color_id)
+        if color is None:
+            return None
+        colors[color] = price
+    timestamp = data.get('timestamp', 0)
+    return {
+        'model': f"{series}_{capacity}",
+        'timestamp': timestamp,
+        'series': series,
+        'capacity': capacity,
+        'colors': colors,
+        'kaitori_price_min': data.get('kaitori_price_min'),
+        'kaitori_price_max': data.get('kaitori_price_max'),
+        'source': data.get('source'),
+        'date': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d'),
+        'expiration_time': data.get('expiration_time')
+    }
+
+
+def compact_history(history):
+    """price_history のドキュメントの配列を列ごとの配列にする（format=compact 用）
+
+    colors は色IDごとの価格の配列で、その時点に価格がない色は null。
+    """
+    color_ids = sorted({color_id for data in history for color_id in (data.get('colors') or {})}, key=int)
+    return {
+        'timestamp': [data.get('timestamp') for data in history],
+        'kaitori_price_min': [data.get('kaitori_price_min') for data in history],
+        'kaitori_price_max': [data.get('kaitori_price_max') for data in history],
+        'colors': {
+            color_id: [(data.get('colors') or {}).get(color_id) for data in history]
+            for color_id in color_ids
+        }
+    }
@@ -7,7 +7,10 @@ def get_cors_headers():
     return {
         'Access-Control-Allow-Origin': '*',
         'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+        'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-API-Key',
+        'Access-Control-Expose-Headers': 'Retry-After, X-Cache, Server-Timing',
+        # ブラウザの Resource Timing API から Server-Timing を読めるようにする
+        'Timing-Allow-Origin': '*',
         'Access-Control-Max-Age': '3600'
     }
 
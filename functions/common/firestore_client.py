@@ -0,0 +1,18 @@
+"""
+Firestoreクライアントの共通モジュール
+
+google.cloud.firestore の読み込みはコールドスタートで最も重いため、
+Firestoreを使うリクエストが最初に来たときまで遅延させる。
+"""
+
+# ウォームインスタンスではリクエスト間で同じクライアントを再利用する
+_client = None
+
+
+def get_firestore_client():
+    """共有のFirestoreクライアントを取得する"""
+    global _client
+    if _client is None:
+        from google.cloud import firestore
+        _client = firestore.Client()
+    return _client
@@ -0,0 +1,268 @@
+"""
+価格履歴の統計（移動平均・ボラティリティ）の共通モジュール
+
+price_history に1点書き込むたびに (series, capacity) ごとの統計をオンラインで更新し、
+price_stats/<model> に小さなドキュメントとして保存する。get_price_stats は
+このドキュメントを読むだけで、履歴を走査せずに 7/14/30日の傾向を返す。
+
+各期間（ウィンドウ）の統計:
+- 平均・分散: Welford 法（期間外になった点は逆向きの更新で取り除く）
+- EWMA: 時間減衰の指数移動平均（半減期は期間の半分）
+- 最小・最大: 単調デックによるスライディングウィンドウ
+"""
+
+import math
+from collections import deque
+from datetime import datetime
+
+from common.price_record import model_key
+
+PRICE_STATS_COLLECTION = 'price_stats'
+
+# 統計を保持する期間（日）
+STATS_WINDOW_DAYS = (7, 14, 30)
+
+# 統計の対象とする履歴の値
+STATS_FIELD = 'kaitori_price_max'
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+class RollingWindow:
+    """1期間分のオンライン統計
+
+    期間内の点はモデル全体の点の列の末尾 count 件にあたるため、
+    点そのものは ModelStats が1つの列で保持する。
+    """
+
+    def __init__(self, days):
+        self.days = days
+        self.seconds = days * DAY_SECONDS
+        self.half_life = self.seconds / 2
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = None
+        self.ewma_at = None
+        # (timestamp, value) の単調デック（min は値の昇順、max は値の降順）
+        self.min_deque = deque()
+        self.max_deque = deque()
+
+    def push(self, timestamp, value):
+        # Welford 法
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        # 時間減衰の EWMA（点の間隔が不規則でも半減期どおりに減衰させる）
+        if self.ewma is None:
+            self.ewma = float(value)
+        else:
+            alpha = 1.0 - 0.5 ** ((timestamp - self.ewma_at) / self.half_life)
+            self.ewma += alpha * (value - self.ewma)
+        self.ewma_at = timestamp
+
+        while self.min_deque and self.min_deque[-1][1] >= value:
+            self.min_deque.pop()
+        self.min_deque.append((timestamp, value))
+        while self.max_deque and self.max_deque[-1][1] <= value:
+            self.max_deque.pop()
+        self.max_deque.append((timestamp, value))
+
+    def _remove(self, value):
+        if self.count <= 1:
+            self.count = 0
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.count -= 1
+        self.mean -= delta / self.count
+        self.m2 = max(0.0, self.m2 - delta * (value - self.mean))
+
+    def expire(self, points, now):
+        """期間外になった点を取り除く（points はモデル全体の (timestamp, value) の列）"""
+        cutoff = now - self.seconds
+        while self.count and points[-self.count][0] < cutoff:
+            self._remove(points[-self.count][1])
+        while self.min_deque and self.min_deque[0][0] < cutoff:
+            self.min_deque.popleft()
+        while self.max_deque and self.max_deque[0][0] < cutoff:
+            self.max_deque.popleft()
+
+    def summary(self, points):
+        if not self.count:
+            return {'days': self.days, 'count': 0}
+        first = points[-self.count][1]
+        last = points[-1][1]
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return {
+            'days': self.days,
+            'count': self.count,
+            'mean': round(self.mean, 1),
+            'std': round(std, 1),
+            'volatility': round(std / self.mean, 4) if self.mean else None,
+            'ewma': round(self.ewma, 1),
+            'min': self.min_deque[0][1],
+            'max': self.max_deque[0][1],
+            'first': first,
+            'last': last,
+            'change': last - first,
+            'change_rate': round((last - first) / first, 4) if first else None
+        }
+
+    def to_dict(self):
+        # Firestore は配列の入れ子を保存できないため、デックは timestamp の配列で保存する
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'ewma': self.ewma,
+            'ewma_at': self.ewma_at,
+            'min_timestamps': [timestamp for timestamp, _ in self.min_deque],
+            'max_timestamps': [timestamp for timestamp, _ in self.max_deque]
+        }
+
+    @classmethod
+    def from_dict(cls, days, data, values_by_timestamp):
+        window = cls(days)
+        window.count = data.get('count', 0)
+        window.mean = data.get('mean', 0.0)
+        window.m2 = data.get('m2', 0.0)
+        window.ewma = data.get('ewma')
+        window.ewma_at = data.get('ewma_at')
+        window.min_deque = deque(
+            (timestamp, values_by_timestamp[timestamp])
+            for timestamp in data.get('min_timestamps', [])
+            if timestamp in values_by_timestamp
+        )
+        window.max_deque = deque(
+            (timestamp, values_by_timestamp[timestamp])
+            for timestamp in data.get('max_timestamps', [])
+            if timestamp in values_by_timestamp
+        )
+        return window
+
+
+class ModelStats:
+    """(series, capacity) ごとの全期間の統計"""
+
+    def __init__(self, series, capacity, window_days=STATS_WINDOW_DAYS):
+        self.series = series
+        self.capacity = capacity
+        self.windows = [RollingWindow(days) for days in sorted(window_days)]
+        # 最長の期間内の (timestamp, value)（古い順）
+        self.points = deque()
+
+    @property
+    def last_timestamp(self):
+        return self.points[-1][0] if self.points else None
+
+    def add(self, timestamp, value):
+        """1点を追加する（最後の点以前の timestamp は重複として無視し False を返す）"""
+        if value is None or (self.points and timestamp <= self.points[-1][0]):
+            return False
+        self.points.append((timestamp, value))
+        for window in self.windows:
+            window.push(timestamp, value)
+        self.expire(timestamp)
+        return True
+
+    def expire(self, now):
+        for window in self.windows:
+            window.expire(self.points, now)
+        longest = self.windows[-1]
+        while len(self.points) > longest.count:
+            self.points.popleft()
+
+    def summary(self, now=None):
+        """期間ごとの統計（now を指定するとその時点で期間外の点を除いて計算する）"""
+        if now is not None:
+            self.expire(now)
+        return {str(window.days): window.summary(self.points) for window in self.windows}
+
+    def to_dict(self):
+        return {
+            'series': self.series,
+            'capacity': self.capacity,
+            'model': model_key(self.series, self.capacity),
+            'last_timestamp': self.last_timestamp,
+            'timestamps': [timestamp for timestamp, _ in self.points],
+            'values': [value for _, value in self.points],
+            'windows': {str(window.days): window.to_dict() for window in self.windows},
+            'summary': self.summary(),
+            'updated_at': datetime.now().isoformat()
+        }
+
+    @classmethod
+    def from_dict(cls, data, window_days=STATS_WINDOW_DAYS):
+        stats = cls(data['series'], data['capacity'], window_days)
+        stats.points = deque(zip(data.get('timestamps', []), data.get('values', [])))
+        values_by_timestamp = dict(stats.points)
+        saved = data.get('windows', {})
+        stats.windows = [
+            RollingWindow.from_dict(window.days, saved[str(window.days)], values_by_timestamp)
+            if str(window.days) in saved else window
+            for window in stats.windows
+        ]
+        return stats
+
+
+def record_history_point(db, series, capacity, timestamp, value):
+    """価格履歴の1点を統計に反映して保存する（price_history への書き込みと合わせて呼び出す）
+
+    Returns:
+        統計を更新した場合 True（既に反映済みの timestamp の場合 False）
+    """
+    from google.cloud import firestore
+
+    ref = db.collection(PRICE_STATS_COLLECTION).document(model_key(series, capacity))
+
+    @firestore.transactional
+    def update_in_transaction(transaction):
+        snapshot = ref.get(transaction=transaction)
+        stats = ModelStats.from_dict(snapshot.to_dict()) if snapshot.exists else ModelStats(series, capacity)
+        if not stats.add(timestamp, value):
+            return False
+        transaction.set(ref, stats.to_dict())
+        return True
+
+    return update_in_transaction(db.transaction())
+
+
+def build_model_stats(history_docs, catalog):
+    """価格履歴のドキュメントから (series, capacity) ごとの統計を作り直す（初回の移行用）
+
+    catalog: IDで保存された履歴を名前に戻すためのカタログ（common/catalog.py）
+    """
+    from common.catalog import expand_history_doc
+
+    points = {}
+    for data in history_docs:
+        data = expand_history_doc(data, catalog)
+        if data is None:
+            continue
+        series = data.get('series')
+        capacity = data.get('capacity')
+        value = data.get(STATS_FIELD)
+        if not series or not capacity or not isinstance(value, (int, float)):
+            continue
+        points.setdefault((series, capacity), []).append((data.get('timestamp', 0), value))
+
+    results = {}
+    for (series, capacity), model_points in points.items():
+        stats = ModelStats(series, capacity)
+        for timestamp, value in sorted(model_points):
+            stats.add(timestamp, value)
+        results[model_key(series, capacity)] = stats
+    return results
+
+
+def load_price_stats(db, series, capacity=None):
+    """保存済みの統計（capacity 省略時はシリーズの全容量）"""
+    collection = db.collection(PRICE_STATS_COLLECTION)
+    if capacity:
+        snapshot = collection.document(model_key(series, capacity)).get()
+        return [snapshot.to_dict()] if snapshot.exists else []
+    return [doc.to_dict() for doc in collection.where('series', '==', series).stream()]
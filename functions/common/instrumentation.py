@@ -0,0 +1,169 @@
+"""
+リクエストごとの計測
+- 処理のフェーズ（Firestoreの読み込み・集計・JSONエンコードなど）ごとの時間を
+  Server-Timing ヘッダーで返す
+- 1リクエストにつき1行の構造化ログ（JSON）を出力する
+  （読み取りドキュメント数・レスポンスのバイト数・キャッシュのヒット/ミス・コールドスタートか）
+
+Cloud Functions では標準出力のJSON行は jsonPayload として記録されるため、
+ログだけでコストの高いエンドポイントを特定できる。
+"""
+
+import contextvars
+import functools
+import json
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from common.cors import get_cors_headers
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+_cold_start_lock = threading.Lock()
+_cold_start = True
+
+
+class RequestMetrics:
+    """1リクエスト分の計測値（スレッドプールから記録されてもよいようにロックで保護する）"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self._lock = threading.Lock()
+        self.phases = {}  # フェーズ名 -> 合計ミリ秒（記録順を保持）
+        self.documents_read = 0
+        self.cache = Counter()
+
+    def add_phase(self, name, duration_ms):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration_ms
+
+    def add_reads(self, count):
+        with self._lock:
+            self.documents_read += count
+
+    def add_cache(self, status):
+        with self._lock:
+            self.cache[status] += 1
+
+
+@contextmanager
+def phase(name):
+    """with phase('firestore'): ... の範囲の時間を現在のリクエストに記録する（計測外では何もしない）"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_phase(name, (time.perf_counter() - start) * 1000)
+
+
+def record_reads(count):
+    """Firestoreから読み込んだドキュメント数を現在のリクエストに記録する"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_reads(count)
+
+
+def record_cache(status):
+    """キャッシュの取得元（hit / miss / coalesced / stale）を現在のリクエストに記録する"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_cache(status)
+
+
+def submit_with_context(executor, fn, *args):
+    """現在のリクエストの計測を引き継いでスレッドプールで実行する"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _take_cold_start():
+    """このインスタンスの最初のリクエストなら True（2回目以降は False）"""
+    global _cold_start
+    with _cold_start_lock:
+        cold_start, _cold_start = _cold_start, False
+    return cold_start
+
+
+def _server_timing(metrics, total_ms, cold_start):
+    entries = [f"{name};dur={duration:.1f}" for name, duration in metrics.phases.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    if metrics.cache:
+        entries.append(f'cache;desc="{",".join(sorted(metrics.cache))}"')
+    if cold_start:
+        entries.append('cold-start')
+    return ', '.join(entries)
+
+
+def _response_size(body):
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, bytes):
+        return len(body)
+    return None
+
+
+def instrumented(endpoint):
+    """ハンドラーに Server-Timing ヘッダーと構造化ログを追加するデコレーター
+
+    ハンドラーは (body, status, headers) のタプルか flask.Response を返すこと。
+    ストリーミングのレスポンスではバイト数・読み取り数は記録せず、時間はレスポンス作成までを計測する。
+    スレッドプールで並行して実行されたフェーズは各スレッドの時間の合計になる（total を超えることがある）。
+    ハンドラーが例外を送出した場合も、500 のレスポンスに Server-Timing を付け、ログ（ERROR）を出力する。
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(request):
+            cold_start = _take_cold_start()
+            metrics = RequestMetrics(endpoint)
+            token = _current.set(metrics)
+            start = time.perf_counter()
+            error = None
+            try:
+                response = handler(request)
+            except Exception:
+                error = traceback.format_exc()
+                response = (json.dumps({'error': 'Internal Server Error'}), 500, {
+                    'Content-Type': 'application/json',
+                    **get_cors_headers()
+                })
+            finally:
+                _current.reset(token)
+            total_ms = (time.perf_counter() - start) * 1000
+            server_timing = _server_timing(metrics, total_ms, cold_start)
+
+            if isinstance(response, tuple):
+                body, status = response[0], response[1]
+                headers = dict(response[2]) if len(response) > 2 else {}
+                headers['Server-Timing'] = server_timing
+                response = (body, status, headers)
+                size = _response_size(body)
+            else:
+                response.headers['Server-Timing'] = server_timing
+                status = response.status_code
+                size = None if response.is_streamed else response.calculate_content_length()
+
+            record = {
+                'severity': 'ERROR' if error else 'INFO',
+                'message': f"{request.method} /{endpoint} {status}",
+                'endpoint': endpoint,
+                'method': request.method,
+                'status': status,
+                'duration_ms': round(total_ms, 1),
+                'phases_ms': {name: round(duration, 1) for name, duration in metrics.phases.items()},
+                'documents_read': metrics.documents_read,
+                'response_bytes': size,
+                'cache': dict(metrics.cache),
+                'cold_start': cold_start
+            }
+            if error:
+                record['error'] = error
+            print(json.dumps(record, ensure_ascii=False))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,159 @@
+"""
+購入チャネル別の利益（買取価格 - 実質購入価格）計算エンジン
+
+カタログを (シリーズ × 容量 × 色) の NumPy 配列で表し、全チャネル・全SKUの
+利益を1回のベクトル演算で計算する。
+
+チャネルの実質購入価格:
+    支払額 = 公式価格 × (1 - discount_rate) - discount_amount - coupon
+    実質購入価格 = 支払額 × (1 - point_rate)   （付与ポイントを値引きとみなす）
+
+numpy はコールドスタートを遅くしないよう、計算時に遅延読み込みする。
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+
+
+@dataclass(frozen=True)
+class PurchaseChannel:
+    """購入チャネル（ポイント還元率・キャリア割引・クーポン）"""
+    name: str
+    label: str
+    point_rate: float = 0.0
+    discount_rate: float = 0.0
+    discount_amount: int = 0
+    coupon: int = 0
+
+
+DEFAULT_CHANNELS = (
+    PurchaseChannel('official', 'Apple公式'),
+    PurchaseChannel('rakuten', '楽天モバイル（ポイント10%）', point_rate=0.1),
+)
+
+
+def load_channels():
+    """チャネル設定を読み込む（MARGIN_CHANNELS に JSON 配列があればそれを使う）
+
+    例: MARGIN_CHANNELS='[{"name": "docomo", "label": "ドコモ", "discount_amount": 22000}]'
+    """
+    raw = os.getenv('MARGIN_CHANNELS')
+    if not raw:
+        return DEFAULT_CHANNELS
+    return tuple(PurchaseChannel(**channel) for channel in json.loads(raw))
+
+
+class MarginCatalog:
+    """(シリーズ × 容量 × 色) の公式価格・買取価格の配列（該当SKUがない要素は NaN）"""
+
+    def __init__(self, series, capacities, colors, official, kaitori):
+        self.series = series
+        self.capacities = capacities
+        self.colors = colors
+        self.official = official
+        self.kaitori = kaitori
+
+    @property
+    def shape(self):
+        return self.kaitori.shape
+
+    @classmethod
+    def from_prices(cls, kaitori_data, official_data, by_color=True):
+        """get_prices の集計データから配列を作成する
+
+        kaitori_data: {series: {capacity: {'kaitori_price_max': ..., 'colors': {color: price}}}}
+        official_data: {series: {capacity: {'colors': {color: price}, 'stats': {...}}}}
+
+        by_color=True の場合は色ごとのSKUで、買取価格は色別、公式価格は同じ色があれば
+        その価格、なければ容量の平均価格を使う。
+        by_color=False の場合は容量ごとに1要素で、買取価格は最大値、公式価格は平均価格を使う。
+        """
+        import numpy as np
+        from common.official_prices import capacity_stats
+
+        series = sorted(kaitori_data)
+        capacities = sorted({capacity for capacities in kaitori_data.values() for capacity in capacities})
+        if by_color:
+            colors = sorted({
+                color
+                for capacities in kaitori_data.values()
+                for info in capacities.values()
+                for color in (info.get('colors') or {})
+            })
+        else:
+            colors = ['*']
+
+        shape = (len(series), len(capacities), len(colors))
+        official = np.full(shape, np.nan)
+        kaitori = np.full(shape, np.nan)
+        capacity_index = {capacity: i for i, capacity in enumerate(capacities)}
+        color_index = {color: i for i, color in enumerate(colors)}
+
+        for s, series_name in enumerate(series):
+            for capacity, info in kaitori_data[series_name].items():
+                c = capacity_index[capacity]
+                official_capacity = official_data.get(series_name, {}).get(capacity)
+                stats = capacity_stats(official_capacity) if official_capacity else None
+                if not stats:
+                    continue
+                if not by_color:
+                    kaitori[s, c, 0] = info.get('kaitori_price_max') or np.nan
+                    official[s, c, 0] = stats['avg']
+                    continue
+                official_colors = official_capacity.get('colors') or {}
+                for color, price in (info.get('colors') or {}).items():
+                    if not isinstance(price, (int, float)) or price <= 0:
+                        continue
+                    k = color_index[color]
+                    kaitori[s, c, k] = price
+                    official[s, c, k] = official_colors.get(color, stats['avg'])
+
+        return cls(series, capacities, colors, official, kaitori)
+
+
+class MarginResult:
+    """チャネル × シリーズ × 容量 × 色 の実質購入価格・利益・利益率"""
+
+    def __init__(self, channels, catalog, cost, margin, margin_rate):
+        self.channels = channels
+        self.catalog = catalog
+        self.cost = cost
+        self.margin = margin
+        self.margin_rate = margin_rate
+
+    def channel_values(self, s, c, k=0):
+        """1SKU分のチャネル別の値（JSONにそのまま出力できる型）"""
+        return {
+            channel.name: {
+                'effective_price': int(round(float(self.cost[i, s, c, k]))),
+                'margin': int(round(float(self.margin[i, s, c, k]))),
+                'margin_rate': round(float(self.margin_rate[i, s, c, k]), 4)
+            }
+            for i, channel in enumerate(self.channels)
+        }
+
+
+def compute_margins(catalog, channels=None):
+    """全チャネル・全SKUの利益を1回のベクトル演算で計算する"""
+    import numpy as np
+
+    channels = tuple(channels or load_channels())
+    # チャネルのパラメータを (チャネル, 1, 1, 1) の配列にしてカタログの配列とブロードキャストする
+    params = np.array(
+        [[ch.point_rate, ch.discount_rate, ch.discount_amount, ch.coupon] for ch in channels],
+        dtype=float
+    ).reshape(len(channels), 4, 1, 1, 1)
+    point_rate, discount_rate, discount_amount, coupon = (params[:, i] for i in range(4))
+
+    paid = catalog.official * (1.0 - discount_rate) - discount_amount - coupon
+    cost = paid * (1.0 - point_rate)
+    margin = catalog.kaitori - cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin_rate = np.where(cost > 0, margin / cost, np.nan)
+    return MarginResult(channels, catalog, cost, margin, margin_rate)
+
+
+def channels_config(channels=None):
+    """レスポンスに含めるチャネル設定"""
+    return [asdict(channel) for channel in (channels or load_channels())]
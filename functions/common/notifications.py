@@ -0,0 +1,216 @@
+"""
+価格アラート通知の共通モジュール
+- 発火したアラートを受信者ごとにまとめて1通にする
+- クールダウン期間内に通知済みのアラートは再通知しない
+- 差し替え可能なトランスポートでバッチ送信（Slack / 標準出力 / ファイル）
+"""
+
+import json
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+NOTIFICATION_COOLDOWN_SECONDS = int(os.getenv('ALERT_NOTIFICATION_COOLDOWN_SECONDS', str(6 * 60 * 60)))
+NOTIFICATION_BATCH_SIZE = 20
+
+DIRECTION_LABELS = {'above': '以上', 'below': '以下'}
+
+
+def format_event(event):
+    """1件の発火を1行のテキストにする"""
+    direction = DIRECTION_LABELS.get(event['direction'], event['direction'])
+    return (
+        f"{event['series']} {event['capacity']}: ¥{event['price']:,} "
+        f"(しきい値 ¥{event['threshold']:,} {direction})"
+    )
+
+
+class StdoutTransport:
+    """ローカル・テスト用: 通知を1行1件のJSONで標準出力に書き出す"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, messages):
+        for message in messages:
+            self.stream.write(json.dumps(message, ensure_ascii=False, default=str) + '\n')
+        self.stream.flush()
+
+
+class FileTransport:
+    """ローカル・テスト用: 通知を1行1件のJSONでファイルに追記する"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, messages):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for message in messages:
+                f.write(json.dumps(message, ensure_ascii=False, default=str) + '\n')
+
+
+class SlackTransport:
+    """本番用: Slack Incoming Webhook に1バッチを1メッセージ（受信者ごとのattachment）として送信"""
+
+    def __init__(self, webhook_url, timeout=10):
+        self.webhook_url = webhook_url
+        self.timeout = timeout
+
+    def send(self, messages):
+        import requests
+
+        attachments = []
+        for message in messages:
+            attachments.append({
+                "color": "#36a64f",
+                "title": f"Price Alert: {message['recipient']}",
+                "text": "\n".join(format_event(event) for event in message['events']),
+                "fields": [
+                    {
+                        "title": "Alerts",
+                        "value": str(len(message['events'])),
+                        "short": True
+                    },
+                    {
+                        "title": "Timestamp",
+                        "value": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "short": True
+                    }
+                ]
+            })
+        response = requests.post(
+            self.webhook_url,
+            json={
+                "text": f"💰 価格アラート: {len(messages)}件の通知",
+                "attachments": attachments
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+def get_transport():
+    """環境変数からトランスポートを選択する
+
+    NOTIFICATION_TRANSPORT: slack / file / stdout
+    （未指定の場合は SLACK_WEBHOOK_URL があれば slack、なければ stdout）
+    """
+    webhook_url = os.getenv('SLACK_WEBHOOK_URL')
+    name = os.getenv('NOTIFICATION_TRANSPORT', 'slack' if webhook_url else 'stdout')
+    if name == 'slack':
+        if not webhook_url:
+            raise ValueError("SLACK_WEBHOOK_URL is required for the slack transport")
+        return SlackTransport(webhook_url)
+    if name == 'file':
+        return FileTransport(os.getenv('NOTIFICATION_FILE', 'alert_notifications.jsonl'))
+    if name == 'stdout':
+        return StdoutTransport()
+    raise ValueError(f"Unknown notification transport: {name}")
+
+
+class NotificationDispatcher:
+    """発火したアラートをまとめてバッチ送信する通知ワーカー
+
+    enqueue() で受け取ったイベントは flush() 時に以下の順で処理する:
+    1. 同じアラートの重複イベントは最新の1件にまとめる
+    2. last_notified_at がクールダウン期間内のアラートは抑制する
+    3. 受信者ごとに1通のメッセージにまとめる
+    4. batch_size 通ずつトランスポートで送信する
+
+    イベントに id（alert_events のドキュメントID）があれば、送信の成否を
+    delivered_event_ids / failed_event_ids で返す（失敗したイベントは次回の flush で再送する）。
+    """
+
+    def __init__(self, transport, cooldown_seconds=NOTIFICATION_COOLDOWN_SECONDS,
+                 batch_size=NOTIFICATION_BATCH_SIZE):
+        self.transport = transport
+        self.cooldown_seconds = cooldown_seconds
+        self.batch_size = batch_size
+        self._queue = deque()
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    def enqueue(self, events):
+        self._queue.extend(events)
+
+    def _in_cooldown(self, event, now):
+        last_notified_at = event.get('last_notified_at')
+        if not last_notified_at:
+            return False
+        try:
+            elapsed = (now - datetime.fromisoformat(last_notified_at)).total_seconds()
+        except (TypeError, ValueError):
+            return False
+        return elapsed < self.cooldown_seconds
+
+    def _coalesce(self, now):
+        latest = {}
+        # アラートごとにまとめたイベントのID（まとめた古いイベントも送信の成否を同じにする）
+        event_ids = {}
+        while self._queue:
+            event = self._queue.popleft()
+            latest[event['alert_id']] = event
+            if event.get('id'):
+                event_ids.setdefault(event['alert_id'], []).append(event['id'])
+
+        messages = {}
+        suppressed_ids = []
+        for alert_id, event in latest.items():
+            if self._in_cooldown(event, now):
+                suppressed_ids.extend(event_ids.get(alert_id, []))
+                continue
+            messages.setdefault(event['recipient'], []).append(event)
+        messages = [{'recipient': recipient, 'events': events} for recipient, events in messages.items()]
+        return messages, len(latest) - sum(len(m['events']) for m in messages), event_ids, suppressed_ids
+
+    def flush(self):
+        """キューを処理して送信し、統計を返す
+
+        Returns:
+            queue_depth（処理前のキューの長さ）、送信数、抑制数、失敗数、スループット、
+            通知したアラートIDのリスト（notified_alert_ids）、
+            送信済み（抑制を含む）・送信に失敗したイベントIDのリスト
+            （delivered_event_ids / failed_event_ids）を含む辞書
+        """
+        start = time.perf_counter()
+        queue_depth = len(self._queue)
+        messages, suppressed, event_ids, delivered_event_ids = self._coalesce(datetime.now())
+
+        sent_messages = 0
+        sent_events = 0
+        failed_messages = 0
+        notified_alert_ids = []
+        failed_event_ids = []
+        for i in range(0, len(messages), self.batch_size):
+            batch = messages[i:i + self.batch_size]
+            batch_alert_ids = [event['alert_id'] for message in batch for event in message['events']]
+            batch_event_ids = [event_id for alert_id in batch_alert_ids for event_id in event_ids.get(alert_id, [])]
+            try:
+                self.transport.send(batch)
+            except Exception as e:
+                print(f"Notification batch failed: {e}")  # Log for debugging
+                failed_messages += len(batch)
+                failed_event_ids.extend(batch_event_ids)
+                continue
+            sent_messages += len(batch)
+            sent_events += len(batch_alert_ids)
+            notified_alert_ids.extend(batch_alert_ids)
+            delivered_event_ids.extend(batch_event_ids)
+
+        elapsed = time.perf_counter() - start
+        return {
+            'queue_depth': queue_depth,
+            'messages_sent': sent_messages,
+            'events_sent': sent_events,
+            'suppressed': suppressed,
+            'failed': failed_messages,
+            'elapsed_ms': elapsed * 1000,
+            'messages_per_second': sent_messages / elapsed if elapsed > 0 else None,
+            'notified_alert_ids': notified_alert_ids,
+            'delivered_event_ids': delivered_event_ids,
+            'failed_event_ids': failed_event_ids
+        }
@@ -0,0 +1,40 @@
+"""
+公式価格の共通モジュール
+
+official_prices/<series> のドキュメントは容量ごとに色別の価格を持つ:
+    {'price': {'256GB': {'colors': {...}, 'stats': {'min': ..., 'avg': ..., 'max': ...}}}}
+
+stats は書き込み時に計算して保存し、読み取り側（get_prices など）では
+リクエストごとに色別の価格を集計しない。
+"""
+
+
+def price_stats(colors):
+    """色別の価格から min / avg / max を計算する（avg は小数点以下切り捨て）"""
+    prices = [price for price in colors.values() if isinstance(price, (int, float))]
+    if not prices:
+        return None
+    return {
+        'min': int(min(prices)),
+        'avg': int(sum(prices) / len(prices)),
+        'max': int(max(prices)),
+    }
+
+
+def with_price_stats(price_data):
+    """容量ごとの価格データに stats を付けたコピーを返す（書き込み前に使う）"""
+    result = {}
+    for capacity, capacity_data in price_data.items():
+        capacity_data = dict(capacity_data)
+        stats = price_stats(capacity_data.get('colors', {}))
+        if stats:
+            capacity_data['stats'] = stats
+        else:
+            capacity_data.pop('stats', None)
+        result[capacity] = capacity_data
+    return result
+
+
+def capacity_stats(capacity_data):
+    """1容量分の価格データの stats（保存されていない古いドキュメントはその場で計算する）"""
+    return capacity_data.get('stats') or price_stats(capacity_data.get('colors', {}))
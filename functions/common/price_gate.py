@@ -0,0 +1,209 @@
+"""
+スクレイピング結果の外れ値ゲート
+
+スクレイピングと保存の間で、SKU（シリーズ・容量・色）ごとの直近の買取価格と比べて
+パースミスなどによる異常な価格を保存前に取り除く。
+
+- 直近の価格は SKU ごとに固定長のリングバッファ（array）で保持し、
+  全SKU分を price_gate/windows ドキュメント1件にまとめて保存する（1回の実行で読み書き各1回）
+- 中央値 ± PRICE_GATE_K × 1.4826 × MAD（最小幅は中央値の PRICE_GATE_MIN_BAND）を外れた価格は quarantine
+- 中央値の PRICE_GATE_REJECT_RATIO 倍を超える（または 1/倍 を下回る）価格や範囲外の価格は reject
+- 同じ SKU で quarantine が PRICE_GATE_PROMOTE_AFTER 回続き、それらが互いに近い値なら
+  価格帯が変わったとみなしてウィンドウを入れ替えて受け入れる
+"""
+
+import os
+from array import array
+from datetime import datetime
+
+PRICE_GATE_COLLECTION = 'price_gate'
+PRICE_GATE_WINDOWS_ID = 'windows'
+PRICE_QUARANTINE_COLLECTION = 'price_quarantine'
+
+WINDOW_SIZE = int(os.getenv('PRICE_GATE_WINDOW_SIZE', '20'))
+MIN_SAMPLES = int(os.getenv('PRICE_GATE_MIN_SAMPLES', '5'))
+PRICE_GATE_K = float(os.getenv('PRICE_GATE_K', '4'))
+PRICE_GATE_MIN_BAND = float(os.getenv('PRICE_GATE_MIN_BAND', '0.08'))
+PRICE_GATE_REJECT_RATIO = float(os.getenv('PRICE_GATE_REJECT_RATIO', '3'))
+PRICE_GATE_PROMOTE_AFTER = int(os.getenv('PRICE_GATE_PROMOTE_AFTER', '3'))
+
+# 1回の実行で price_quarantine に保存する行の上限（バッチ書き込みの上限 500 からウィンドウ分を除く）
+MAX_QUARANTINE_WRITES = 499
+
+# 履歴がなくても適用する価格の範囲（円）
+MIN_PRICE = 1000
+MAX_PRICE = 2000000
+
+# MAD を標準偏差相当にする係数（正規分布の場合）
+MAD_SCALE = 1.4826
+
+ACCEPT = 'accept'
+QUARANTINE = 'quarantine'
+REJECT = 'reject'
+
+
+def _median(sorted_values):
+    n = len(sorted_values)
+    middle = n // 2
+    if n % 2:
+        return float(sorted_values[middle])
+    return (sorted_values[middle - 1] + sorted_values[middle]) / 2
+
+
+class PriceWindow:
+    """1SKU分の直近の価格（固定長のリングバッファ）"""
+
+    __slots__ = ('prices', 'head', 'count', 'pending')
+
+    def __init__(self, size=WINDOW_SIZE):
+        self.prices = array('l', [0] * size)
+        self.head = 0
+        self.count = 0
+        # 連続して quarantine になった価格
+        self.pending = []
+
+    def push(self, price):
+        self.prices[self.head] = price
+        self.head = (self.head + 1) % len(self.prices)
+        self.count = min(self.count + 1, len(self.prices))
+
+    def values(self):
+        """古い順の価格"""
+        size = len(self.prices)
+        start = (self.head - self.count) % size
+        return [self.prices[(start + i) % size] for i in range(self.count)]
+
+    def band(self):
+        """(中央値, 許容幅)。サンプルが足りない場合は None"""
+        if self.count < MIN_SAMPLES:
+            return None
+        values = sorted(self.values())
+        median = _median(values)
+        mad = _median(sorted(abs(value - median) for value in values))
+        width = max(PRICE_GATE_K * MAD_SCALE * mad, PRICE_GATE_MIN_BAND * median)
+        return median, width
+
+    def reset(self, prices):
+        self.head = 0
+        self.count = 0
+        for price in prices[-len(self.prices):]:
+            self.push(price)
+
+    def to_dict(self):
+        return {'prices': self.values(), 'pending': list(self.pending)}
+
+    @classmethod
+    def from_dict(cls, data, size=WINDOW_SIZE):
+        window = cls(size)
+        window.reset(data.get('prices', []))
+        window.pending = list(data.get('pending', []))[-PRICE_GATE_PROMOTE_AFTER:]
+        return window
+
+
+def sku_key(record):
+    """スクレイピング結果1行（PriceRecord）の SKU キー（series_capacity_color）"""
+    color = record.colors[0][0] if record.colors else '不明'
+    return f"{record.model}_{color}"
+
+
+class PriceGate:
+    """SKU ごとのウィンドウで価格を判定し、1回の実行分の結果を集計する"""
+
+    def __init__(self, windows=None):
+        self.windows = windows or {}
+        self.counts = {ACCEPT: 0, QUARANTINE: 0, REJECT: 0}
+        self.flagged = []
+
+    def check(self, sku, price):
+        """1件の価格を判定する（受け入れた価格はウィンドウに追加する）
+
+        Returns:
+            (判定, 詳細)。判定は accept / quarantine / reject
+        """
+        window = self.windows.get(sku)
+        if window is None:
+            window = self.windows[sku] = PriceWindow()
+
+        if not isinstance(price, int) or not MIN_PRICE <= price <= MAX_PRICE:
+            return self._flag(REJECT, sku, price, {'reason': 'out_of_range'})
+
+        band = window.band()
+        if band is None:
+            window.push(price)
+            return self._accept({'reason': 'warming_up'})
+
+        median, width = band
+        if median > 0 and not 1 / PRICE_GATE_REJECT_RATIO <= price / median <= PRICE_GATE_REJECT_RATIO:
+            return self._flag(REJECT, sku, price, {'reason': 'ratio', 'median': median})
+        if abs(price - median) <= width:
+            window.pending.clear()
+            window.push(price)
+            return self._accept({'median': median})
+
+        # 外れた価格が続き、それらが互いに近ければ価格帯の変化として受け入れる
+        window.pending.append(price)
+        pending = window.pending[-PRICE_GATE_PROMOTE_AFTER:]
+        if len(pending) >= PRICE_GATE_PROMOTE_AFTER:
+            pending_median = _median(sorted(pending))
+            if all(abs(p - pending_median) <= PRICE_GATE_MIN_BAND * pending_median for p in pending):
+                window.reset(pending)
+                window.pending.clear()
+                return self._accept({'reason': 'promoted', 'previous_median': median})
+        window.pending = pending
+        return self._flag(QUARANTINE, sku, price, {'reason': 'band', 'median': median, 'band': round(width, 1)})
+
+    def _accept(self, detail):
+        self.counts[ACCEPT] += 1
+        return ACCEPT, detail
+
+    def _flag(self, decision, sku, price, detail):
+        self.counts[decision] += 1
+        self.flagged.append({'decision': decision, 'sku': sku, 'price': price, **detail})
+        return decision, detail
+
+    def filter(self, records):
+        """スクレイピング結果（PriceRecord）から保存してよい行だけを返す
+
+        quarantine の行は price_quarantine 用のドキュメントとして quarantined に残す。
+        """
+        accepted = []
+        quarantined = []
+        for record in records:
+            decision, detail = self.check(sku_key(record), record.kaitori_price_max)
+            if decision == ACCEPT:
+                accepted.append(record)
+            elif decision == QUARANTINE:
+                quarantined.append({**record.to_kaitori_doc(), 'gate': detail})
+        return accepted, quarantined
+
+    def report(self):
+        """1回の実行分の判定結果（ジョブやログに記録する）"""
+        return {**self.counts, 'flagged': self.flagged}
+
+    @classmethod
+    def load(cls, db):
+        snapshot = db.collection(PRICE_GATE_COLLECTION).document(PRICE_GATE_WINDOWS_ID).get()
+        data = snapshot.to_dict() if snapshot.exists else {}
+        return cls({sku: PriceWindow.from_dict(window) for sku, window in data.get('skus', {}).items()})
+
+    def save(self, db, quarantined=(), job_id=None, run_id=None):
+        """ウィンドウと quarantine の行を保存する
+
+        run_id を指定すると quarantine の行のドキュメントIDを run_id と行の順番から決めるため、
+        同じ実行を保存し直しても行が重複しない。
+        """
+        now = datetime.now().isoformat()
+        batch = db.batch()
+        batch.set(db.collection(PRICE_GATE_COLLECTION).document(PRICE_GATE_WINDOWS_ID), {
+            'skus': {sku: window.to_dict() for sku, window in self.windows.items()},
+            'updated_at': now
+        })
+        for index, item in enumerate(list(quarantined)[:MAX_QUARANTINE_WRITES]):
+            doc_id = f"{run_id}_{index:03d}" if run_id else None
+            batch.set(db.collection(PRICE_QUARANTINE_COLLECTION).document(doc_id), {
+                **item,
+                'job_id': job_id,
+                'run_id': run_id,
+                'quarantined_at': now
+            })
+        batch.commit()
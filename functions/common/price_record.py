@@ -0,0 +1,189 @@
+"""
+買取価格レコードの共通モジュール
+
+スクレイピング（scrape_prices.py）・Cloud Storage からの同期・価格履歴の保存で
+同じ1件の買取価格を PriceRecord として受け渡し、Firestore との変換は
+このモジュールの codec（from_firestore / from_history_doc / to_kaitori_doc / to_history_doc）
+だけで行う。price_history はカタログID（common/catalog.py）で保存する。
+
+PriceRecord は __slots__ を持つ不変のデータクラスで、色別の価格は (色, 価格) の
+タプルで保持する（dict を持たないため1件あたりのメモリが小さい）。
+シリーズ・容量・色の文字列は sys.intern で共有する。
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+DEFAULT_SOURCE = 'kaitori-rudea'
+
+# price_history の保持期間（expiration_time の計算に使う）
+HISTORY_RETENTION_DAYS = 14
+
+# 買取サイトの表記揺れ（1TB が "1GB" として取得される）の補正
+_CAPACITY_ALIASES = {'1GB': '1TB', '2GB': '2TB'}
+
+
+def normalize_capacity(capacity):
+    return _CAPACITY_ALIASES.get(capacity, capacity)
+
+
+def model_key(series, capacity):
+    """(series, capacity) のキー（price_history の model フィールドと同じ形式）"""
+    return f"{series}_{capacity}"
+
+
+def _color_prices(colors, default_price):
+    """Firestore の colors（{色: 価格} または 色の配列）を (色, 価格) のタプルにする"""
+    if isinstance(colors, dict):
+        if len(colors) == 1:
+            # スクレイピング結果の1行（1色）は sorted を通さない
+            (color, price), = colors.items()
+            return ((sys.intern(str(color)), int(price)),)
+        items = colors.items()
+    else:
+        items = ((color, default_price) for color in colors or ())
+    return tuple(sorted((sys.intern(str(color)), int(price)) for color, price in items))
+
+
+@dataclass(frozen=True, slots=True)
+class PriceRecord:
+    """1モデル（シリーズ・容量）分の買取価格"""
+    series: str
+    capacity: str
+    kaitori_price_min: int
+    kaitori_price_max: int
+    colors: tuple = ()
+    timestamp: int = 0
+    source: str = DEFAULT_SOURCE
+
+    @property
+    def model(self):
+        return model_key(self.series, self.capacity)
+
+    @property
+    def color_prices(self):
+        return dict(self.colors)
+
+    @classmethod
+    def create(cls, series, capacity, colors, timestamp=None, source=DEFAULT_SOURCE):
+        """色別の価格（{色: 価格}）から作成する（min / max は色別の価格から計算）"""
+        color_prices = _color_prices(colors, 0)
+        prices = [price for _, price in color_prices]
+        return cls(
+            sys.intern(series),
+            sys.intern(normalize_capacity(capacity)),
+            min(prices) if prices else 0,
+            max(prices) if prices else 0,
+            color_prices,
+            int(time.time()) if timestamp is None else int(timestamp),
+            source
+        )
+
+    @classmethod
+    def from_firestore(cls, data, timestamp=None):
+        """kaitori_prices / price_history / Cloud Storage の JSON の1件から作成する
+
+        timestamp を指定しない場合はデータの timestamp（なければ updated_at）を使う。
+        series または capacity がない場合は None を返す。
+        """
+        series = data.get('series')
+        capacity = data.get('capacity')
+        if not series or not capacity:
+            return None
+        kaitori_price_min = int(data.get('kaitori_price_min') or 0)
+        kaitori_price_max = int(data.get('kaitori_price_max') or 0)
+        if timestamp is None:
+            timestamp = data.get('timestamp')
+        if timestamp is None and data.get('updated_at'):
+            timestamp = datetime.fromisoformat(data['updated_at']).timestamp()
+        return cls(
+            sys.intern(series),
+            sys.intern(normalize_capacity(capacity)),
+            kaitori_price_min,
+            kaitori_price_max,
+            # 色の配列だけの古い形式では、各色の価格を最小価格とみなす
+            _color_prices(data.get('colors'), kaitori_price_min),
+            int(timestamp or 0),
+            data.get('source') or DEFAULT_SOURCE
+        )
+
+    def merge(self, other):
+        """同じモデルの2件をまとめる（色別の価格は other を優先し、min / max は両方から計算）"""
+        colors = dict(self.colors)
+        colors.update(other.colors)
+        return PriceRecord(
+            self.series,
+            self.capacity,
+            min(self.kaitori_price_min, other.kaitori_price_min),
+            max(self.kaitori_price_max, other.kaitori_price_max),
+            tuple(sorted(colors.items())),
+            max(self.timestamp, other.timestamp),
+            self.source
+        )
+
+    def to_kaitori_doc(self):
+        """kaitori_prices のドキュメント"""
+        return {
+            'series': self.series,
+            'capacity': self.capacity,
+            'colors': self.color_prices,
+            'kaitori_price_min': self.kaitori_price_min,
+            'kaitori_price_max': self.kaitori_price_max,
+            'source': self.source,
+            'updated_at': datetime.fromtimestamp(self.timestamp).isoformat()
+        }
+
+    def to_history_doc(self, catalog, retention_days=HISTORY_RETENTION_DAYS):
+        """price_history のドキュメント（シリーズ・容量・色はカタログIDで保存する）
+
+        Raises:
+            KeyError: カタログに未登録の名前がある場合（先に register_catalog を呼び出す）
+        """
+        model_id = catalog.model_id(self.series, self.capacity)
+        if model_id is None:
+            raise KeyError(f"Model is not registered in the catalog: {self.model}")
+        colors = {}
+        for color, price in self.colors:
+            color_id = catalog.id_of('colors', color)
+            if color_id is None:
+                raise KeyError(f"Color is not registered in the catalog: {color}")
+            colors[str(color_id)] = price
+        return {
+            'model_id': model_id,
+            'timestamp': self.timestamp,
+            'colors': colors,
+            'kaitori_price_min': self.kaitori_price_min,
+            'kaitori_price_max': self.kaitori_price_max,
+            'source': self.source,
+            'expiration_time': int((datetime.fromtimestamp(self.timestamp) + timedelta(days=retention_days)).timestamp())
+        }
+
+    @classmethod
+    def from_history_doc(cls, data, catalog):
+        """price_history のドキュメントから作成する（IDで保存されていない古いドキュメントにも対応）
+
+        未登録のIDや series / capacity がない場合は None を返す。
+        """
+        from common.catalog import expand_history_doc
+
+        expanded = expand_history_doc(data, catalog)
+        return cls.from_firestore(expanded) if expanded else None
+
+
+def history_doc_id(history_doc):
+    """price_history のドキュメントID（to_history_doc の model_id と timestamp から決める）
+
+    同じ時刻の同じモデルは同じドキュメントになるため、保存し直しても履歴が重複しない。
+    """
+    return f"{history_doc['model_id']}_{history_doc['timestamp']}"
+
+
+def merge_by_model(records):
+    """同じモデルのレコードを1件にまとめる（入力の順序を保つ）"""
+    merged = {}
+    for record in records:
+        current = merged.get(record.model)
+        merged[record.model] = record if current is None else current.merge(record)
+    return list(merged.values())
@@ -0,0 +1,145 @@
+"""
+製品カタログ（シリーズ・容量・色）の共通モジュール
+
+対象のシリーズ・有効な容量・公式の色・参考価格は product_catalog.json にまとめ、
+スクレイピング・データ投入スクリプト・確認スクリプトはこのファイルから読み込む。
+新しいシリーズはJSONに追加するだけで対象になる。
+
+買取サイトの商品名の解析は、全シリーズの名前（語のトライ）・容量・色を1つの正規表現に
+まとめてコンパイルし、1回の走査でシリーズ・容量・色を取り出す。
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+
+PRODUCT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'product_catalog.json')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _series_key(text):
+    """一致した文字列からシリーズを引くためのキー（空白を除いた小文字）"""
+    return _WHITESPACE.sub('', text).lower()
+
+
+def _token_guard(token):
+    """語の途中で終わらないようにする（"iPhone 16" が "iPhone 160" に、"iPhone 16 e" が "iPhone 16 eSIM" に一致しない）"""
+    return r'(?!\d)' if token[-1].isdigit() else r'(?![a-z])'
+
+
+def _series_trie_pattern(series_names):
+    """シリーズ名（小文字）の語のトライを正規表現にする
+
+    "iphone" → "17" → "pro" → "max" のように共通の語を1回だけ照合する。
+    同じ位置の選択肢は長い語から試し、続きのある語（"pro" の後の "max"）を先に試す。
+    """
+    root = {}
+    for name in series_names:
+        node = root
+        for token in name.lower().split():
+            node = node.setdefault(token, {})
+        node[None] = name
+
+    def build(node):
+        alternatives = []
+        for token in sorted((key for key in node if key is not None), key=len, reverse=True):
+            child = node[token]
+            pattern = re.escape(token)
+            children = build(child)
+            if children:
+                rest = r'\s*(?:' + '|'.join(children) + ')'
+                pattern += f'(?:{rest}|{_token_guard(token)})' if None in child else rest
+            else:
+                pattern += _token_guard(token)
+            alternatives.append(pattern)
+        return alternatives
+
+    return '|'.join(build(root))
+
+
+def compile_title_matcher(series_names, colors):
+    """シリーズ・容量・色の選択肢を1つにまとめた正規表現（小文字にした商品名に使う）
+
+    グループ名はシリーズが series、容量が capacity、色が color。
+
+    Returns:
+        (正規表現, {シリーズのキー: シリーズ名}, {小文字の色: 色})
+    """
+    alternatives = [f"(?P<series>{_series_trie_pattern(series_names)})", r'(?P<capacity>\d+\s*[gt]b)']
+    color_keys = {color.lower(): color for color in colors}
+    if color_keys:
+        alternatives.append(f"(?P<color>{'|'.join(re.escape(color) for color in color_keys)})")
+    series_keys = {_series_key(name): name for name in series_names}
+    return re.compile('|'.join(alternatives)), series_keys, color_keys
+
+
+class ProductCatalog:
+    """product_catalog.json の内容"""
+
+    def __init__(self, data):
+        self.series = {entry['name']: entry for entry in data.get('series', [])}
+        self.kaitori_colors = list(data.get('kaitori_colors', []))
+        self._matcher, self._series_keys, self._color_keys = compile_title_matcher(self.series, self.kaitori_colors)
+
+    def series_names(self, current=None):
+        """シリーズ名（current を指定すると現行 / 旧シリーズのみ）"""
+        return [
+            name for name, entry in self.series.items()
+            if current is None or bool(entry.get('current')) == current
+        ]
+
+    def capacities(self, series):
+        return list(self.series.get(series, {}).get('capacities', []))
+
+    def colors(self, series):
+        return list(self.series.get(series, {}).get('colors', []))
+
+    def reference_prices(self, kind):
+        """参考価格（kind: official / kaitori）を {シリーズ: {容量: {'colors': {色: 価格}}}} で返す
+
+        データ投入スクリプトで Firestore が空の場合の初期データに使う。
+        """
+        prices = {}
+        for name, entry in self.series.items():
+            by_capacity = entry.get('reference_prices', {}).get(kind)
+            if not by_capacity:
+                continue
+            prices[name] = {
+                capacity: {'colors': {color: price for color in entry.get('colors', [])}}
+                for capacity, price in by_capacity.items()
+            }
+        return prices
+
+    def parse_title(self, title):
+        """買取サイトの商品名からシリーズ・容量・色を1回の走査で取り出す
+
+        Returns:
+            (シリーズ, 容量, 色) のタプル。見つからない項目は None
+        """
+        series = capacity = color = None
+        for match in self._matcher.finditer(title.lower()):
+            group = match.lastgroup
+            if group == 'series':
+                if series is None:
+                    series = self._series_keys.get(_series_key(match.group(group)))
+            elif group == 'capacity':
+                if capacity is None:
+                    text = match.group(group).upper()
+                    capacity = text[:-2].strip() + text[-2:]
+            elif color is None:
+                color = self._color_keys[match.group(group)]
+            if series is not None and capacity is not None and color is not None:
+                break
+        return series, capacity, color
+
+    def identify_series(self, title):
+        """商品名からシリーズを特定する（見つからない場合は None）"""
+        return self.parse_title(title)[0]
+
+
+@lru_cache(maxsize=None)
+def load_product_catalog(path=PRODUCT_CATALOG_PATH):
+    with open(path, encoding='utf-8') as f:
+        return ProductCatalog(json.load(f))
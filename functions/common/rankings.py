@@ -0,0 +1,137 @@
+"""
+利益ランキングの共通モジュール
+
+取り込み後（check_prices）に全SKU × 購入チャネルの利益を計算し、上位のエントリーを
+rankings/margins ドキュメントに並び順付きで保存する。get_rankings は
+このドキュメント1件を読むだけで、上位N件を並び順のまま返す。
+保存するのは各指標の上位だけなので、絞り込んだ結果が件数に満たない場合は
+（上位から外れたエントリーがあれば）価格から全エントリーのランキングを作り直して返す。
+"""
+
+import heapq
+from datetime import datetime
+
+from common.margins import MarginCatalog, channels_config, compute_margins
+
+RANKINGS_COLLECTION = 'rankings'
+MARGIN_RANKING_ID = 'margins'
+
+# ランキングに保存する各指標の上位件数（ドキュメントサイズの上限 1MiB に収める）
+MAX_RANKING_ENTRIES = 500
+
+# 並び順の指標: margin（利益額）/ rate（利益率）
+RANKING_METRICS = ('margin', 'rate')
+
+
+def _load_catalog_data(db):
+    """kaitori_prices と official_prices から MarginCatalog.from_prices の入力と読み取り件数を作る"""
+    kaitori_docs = list(db.collection('kaitori_prices').stream())
+    official_docs = list(db.collection('official_prices').stream())
+    kaitori_data = {}
+    for doc in kaitori_docs:
+        data = doc.to_dict()
+        series = data.get('series')
+        capacity = data.get('capacity')
+        if not series or not capacity:
+            continue
+        kaitori_data.setdefault(series, {})[capacity] = {
+            'kaitori_price_max': data.get('kaitori_price_max', 0),
+            'colors': data.get('colors', {})
+        }
+    official_data = {doc.id: doc.to_dict().get('price', {}) for doc in official_docs}
+    return kaitori_data, official_data, len(kaitori_docs) + len(official_docs)
+
+
+def build_margin_ranking(kaitori_data, official_data, channels=None, max_entries=MAX_RANKING_ENTRIES):
+    """色ごとのSKU × チャネルの利益から、利益額順・利益率順の上位エントリーを作成する
+
+    max_entries が None の場合は全エントリーを残す。
+
+    Returns:
+        entries（利益額の降順）と rate_order（利益率の降順での entries の添字）、
+        candidate_count（上位に絞る前のエントリー数）を含むランキング
+    """
+    import numpy as np
+
+    catalog = MarginCatalog.from_prices(kaitori_data, official_data, by_color=True)
+    result = compute_margins(catalog, channels)
+
+    candidates = []
+    finite = np.isfinite(result.margin) & np.isfinite(result.margin_rate)
+    for i, s, c, k in zip(*np.nonzero(finite)):
+        candidates.append({
+            'series': catalog.series[s],
+            'capacity': catalog.capacities[c],
+            'color': catalog.colors[k],
+            'channel': result.channels[i].name,
+            'official_price': int(catalog.official[s, c, k]),
+            'kaitori_price': int(catalog.kaitori[s, c, k]),
+            'effective_price': int(round(float(result.cost[i, s, c, k]))),
+            'margin': int(round(float(result.margin[i, s, c, k]))),
+            'margin_rate': round(float(result.margin_rate[i, s, c, k]), 4)
+        })
+
+    # 各指標の上位だけを残す（heapq.nlargest は降順で返す）
+    keep = len(candidates) if max_entries is None else max_entries
+    by_margin = heapq.nlargest(keep, range(len(candidates)), key=lambda j: candidates[j]['margin'])
+    by_rate = heapq.nlargest(keep, range(len(candidates)), key=lambda j: candidates[j]['margin_rate'])
+    kept = sorted(set(by_margin) | set(by_rate), key=lambda j: -candidates[j]['margin'])
+    position = {j: p for p, j in enumerate(kept)}
+
+    return {
+        'entries': [candidates[j] for j in kept],
+        'rate_order': [position[j] for j in by_rate],
+        'candidate_count': len(candidates),
+        'channels': channels_config(result.channels),
+        'sku_count': int(np.count_nonzero(~np.isnan(catalog.kaitori))),
+        'updated_at': datetime.now().isoformat()
+    }
+
+
+def refresh_margin_ranking(db, channels=None):
+    """現在の価格からランキングを作り直して保存する（取り込み後に呼び出す）"""
+    kaitori_data, official_data, _ = _load_catalog_data(db)
+    ranking = build_margin_ranking(kaitori_data, official_data, channels)
+    db.collection(RANKINGS_COLLECTION).document(MARGIN_RANKING_ID).set(ranking)
+    return {'entries': len(ranking['entries']), 'sku_count': ranking['sku_count']}
+
+
+def build_full_margin_ranking(db, channels=None):
+    """現在の価格から全エントリーのランキングを作る（保存しない）。(ランキング, 読み取り件数) を返す"""
+    kaitori_data, official_data, reads = _load_catalog_data(db)
+    return build_margin_ranking(kaitori_data, official_data, channels, max_entries=None), reads
+
+
+def is_truncated(ranking):
+    """上位に絞ったために保存されていないエントリーがあるか"""
+    entries = ranking.get('entries', [])
+    return ranking.get('candidate_count', len(entries)) > len(entries)
+
+
+def load_margin_ranking(db):
+    """保存済みのランキング（未作成の場合は None）"""
+    snapshot = db.collection(RANKINGS_COLLECTION).document(MARGIN_RANKING_ID).get()
+    return snapshot.to_dict() if snapshot.exists else None
+
+
+def top_entries(ranking, limit, metric='margin', series=None, capacity=None, channel=None):
+    """ランキングの並び順のまま、条件に合う上位 limit 件を返す
+
+    ランキングが上位に絞られている場合（is_truncated）、絞り込んだ結果が limit 件に
+    満たなければ上位から外れたエントリーが漏れている可能性がある。
+    """
+    entries = ranking.get('entries', [])
+    order = ranking.get('rate_order', []) if metric == 'rate' else range(len(entries))
+    results = []
+    for position in order:
+        entry = entries[position]
+        if series and entry['series'] != series:
+            continue
+        if capacity and entry['capacity'] != capacity:
+            continue
+        if channel and entry['channel'] != channel:
+            continue
+        results.append(entry)
+        if len(results) >= limit:
+            break
+    return results
@@ -0,0 +1,188 @@
+"""
+公開エンドポイント用のクライアントごとのレート制限（トークンバケット）
+- クライアントは許可リストにある API キー（X-API-Key）、または信頼できるプロキシが付けた IP アドレスで識別する
+- バケットの保存先は差し替え可能（インスタンス内 / Firestore で共有）
+- 制限を超えたリクエストには 429 と Retry-After を返す
+"""
+
+import hashlib
+import hmac
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from common.cors import get_cors_headers
+
+RATE_LIMIT_PER_MINUTE = float(os.getenv('RATE_LIMIT_PER_MINUTE', '60'))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', '30'))
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'local')
+
+RATE_LIMITS_COLLECTION = 'rate_limits'
+
+API_KEY_HEADER = 'X-API-Key'
+# 個別のバケットを持つ API キー（カンマ区切り）。リストにないキーは IP で識別する
+RATE_LIMIT_API_KEYS = [key.strip() for key in os.getenv('RATE_LIMIT_API_KEYS', '').split(',') if key.strip()]
+# X-Forwarded-For を末尾から数えて何番目をクライアントIPとするか（信頼できるプロキシの段数）
+RATE_LIMIT_TRUSTED_HOPS = int(os.getenv('RATE_LIMIT_TRUSTED_HOPS', '1'))
+
+
+def _allowed_api_key(api_key, allowed_keys):
+    return any(hmac.compare_digest(api_key.encode(), allowed.encode()) for allowed in allowed_keys)
+
+
+def client_key(request, allowed_keys=None, trusted_hops=None):
+    """レート制限のキー（許可リストの API キーならそのキー、それ以外はクライアントIP）
+
+    X-API-Key や X-Forwarded-For の先頭はクライアントが自由に付けられるため、
+    任意のキーで新しいバケットを作れないよう、IP は信頼できるプロキシが末尾に追加した値を使う。
+    """
+    allowed_keys = RATE_LIMIT_API_KEYS if allowed_keys is None else allowed_keys
+    trusted_hops = RATE_LIMIT_TRUSTED_HOPS if trusted_hops is None else trusted_hops
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key and _allowed_api_key(api_key, allowed_keys):
+        # キーそのものを保存先やログに残さない
+        return f"key:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}"
+    forwarded_for = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+    if trusted_hops > 0 and len(forwarded_for) >= trusted_hops:
+        ip = forwarded_for[-trusted_hops]
+    else:
+        ip = request.remote_addr or 'unknown'
+    return f"ip:{ip}"
+
+
+def _refill(tokens, updated_at, now, rate, capacity):
+    """前回からの経過時間分のトークンを補充した残量"""
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+def _retry_after(tokens, cost, rate):
+    """トークンが cost 個たまるまでの秒数"""
+    return (cost - tokens) / rate if rate > 0 else math.inf
+
+
+class LocalBackend:
+    """インスタンス内のメモリにバケットを保持する（テスト・単一インスタンス用）
+
+    バケットは最後に使われた順に並べ、max_keys を超えたら最も古いものから捨てる
+    （捨てたクライアントは満タンのバケットからやり直しになる）。
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (残りトークン, 更新時刻)。古い順
+
+    def take(self, key, rate, capacity, cost=1, now=None):
+        """トークンを cost 個消費する
+
+        Returns:
+            消費できた場合は 0、できなかった場合は再試行までの秒数
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated_at, now, rate, capacity)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                retry_after = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = _retry_after(tokens, cost, rate)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+
+class FirestoreBackend:
+    """Firestoreの rate_limits コレクションでバケットを共有する（複数インスタンス間で制限を共有）
+
+    1リクエストごとにトランザクション1回分の読み書きが発生する。
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from common.firestore_client import get_firestore_client
+            self._db = get_firestore_client()
+        return self._db
+
+    def take(self, key, rate, capacity, cost=1, now=None):
+        from google.cloud import firestore
+
+        now = time.time() if now is None else now
+        ref = self.db.collection(RATE_LIMITS_COLLECTION).document(key.replace('/', '_'))
+
+        @firestore.transactional
+        def take_in_transaction(transaction):
+            snapshot = ref.get(transaction=transaction)
+            bucket = snapshot.to_dict() if snapshot.exists else {}
+            tokens = _refill(bucket.get('tokens', capacity), bucket.get('updated_at', now), now, rate, capacity)
+            if tokens >= cost:
+                transaction.set(ref, {'tokens': tokens - cost, 'updated_at': now})
+                return 0
+            transaction.set(ref, {'tokens': tokens, 'updated_at': now})
+            return _retry_after(tokens, cost, rate)
+
+        return take_in_transaction(self.db.transaction())
+
+
+def get_backend(name=RATE_LIMIT_BACKEND):
+    if name == 'local':
+        return LocalBackend()
+    if name == 'firestore':
+        return FirestoreBackend()
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+class RateLimiter:
+    """クライアントごとのトークンバケットによるレート制限
+
+    per_minute: 1分あたりに補充されるトークン数（定常的に許可するリクエスト数）
+    burst: バケットの容量（連続して許可するリクエスト数）
+    """
+
+    def __init__(self, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST, backend=None):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.backend = backend or LocalBackend()
+
+    def check(self, request, cost=1):
+        """リクエストを許可する場合は None、制限する場合は 429 のレスポンスを返す"""
+        key = client_key(request)
+        # バケットの容量を超えるコストは永久に許可されないため容量で頭打ちにする
+        cost = min(cost, self.capacity)
+        try:
+            retry_after = self.backend.take(key, self.rate, self.capacity, cost)
+        except Exception as e:
+            # 保存先の障害でエンドポイント全体を止めないよう、許可して続行する
+            print(f"Rate limit check failed: {e}")  # Log for debugging
+            return None
+        if not retry_after:
+            return None
+
+        print(f"Rate limited: {key}")  # Log for debugging
+        retry_after = max(1, math.ceil(retry_after))
+        headers = {
+            'Content-Type': 'application/json',
+            'Retry-After': str(retry_after),
+            **get_cors_headers()
+        }
+        return (json.dumps({"error": "Too Many Requests", "retry_after": retry_after}), 429, headers)
+
+
+_limiter = None
+
+
+def check_rate_limit(request, cost=1):
+    """環境変数の設定で作成した共通のリミッターでリクエストを確認する"""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(backend=get_backend())
+    return _limiter.check(request, cost)
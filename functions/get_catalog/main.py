@@ -0,0 +1,56 @@
+import json
+
+from common.catalog import cached_catalog, is_catalog_cached
+from common.cors import get_cors_headers, handle_cors_request
+from common.firestore_client import get_firestore_client
+from common.instrumentation import phase
+from common.rate_limit import check_rate_limit
+
+
+def _error_response(message, status):
+    headers = {
+        'Content-Type': 'application/json',
+        **get_cors_headers()
+    }
+    return (json.dumps({'error': message}), status, headers)
+
+
+def get_catalog(request):
+    """Cloud Functions用 カタログ辞書取得エンドポイント
+
+    price_history の format=compact で返すシリーズ・容量・色のIDと名前の対応を返す。
+    IDは追加のみで変わらないため、ETag（カタログの version）が同じなら 304 を返す。
+    """
+    # CORS preflight request handling
+    cors_response = handle_cors_request(request)
+    if cors_response:
+        return cors_response
+
+    # キャッシュから返せる（Firestoreを読まない）リクエストはレート制限の対象外
+    cached = is_catalog_cached()
+    if not cached:
+        rate_limited = check_rate_limit(request)
+        if rate_limited:
+            return rate_limited
+
+    db = get_firestore_client()
+    try:
+        with phase('firestore'):
+            catalog = cached_catalog(db)
+    except Exception as e:
+        return _error_response(f'Database query failed: {str(e)}', 500)
+
+    etag = f'"catalog-{catalog.version}"'
+    headers = {
+        'Content-Type': 'application/json',
+        'Cache-Control': 'public, max-age=3600',
+        'ETag': etag,
+        'X-Cache': 'HIT' if cached else 'MISS',
+        **get_cors_headers()
+    }
+    if request.headers.get('If-None-Match') == etag:
+        return ('', 304, headers)
+
+    with phase('encode'):
+        body = json.dumps(catalog.dictionary())
+    return (body, 200, headers)
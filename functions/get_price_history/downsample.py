@@ -0,0 +1,83 @@
+"""
+価格推移データのダウンサンプリング (Largest-Triangle-Three-Buckets)
+"""
+
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """LTTBアルゴリズムで残す点のインデックスを返す
+
+    先頭と末尾の点は必ず残し、残りを n_out - 2 個のバケットに分けて、
+    各バケットから「直前に選んだ点」と「次のバケットの平均点」と
+    作る三角形の面積が最大になる点を1つずつ選ぶ。
+
+    Args:
+        x: 時刻（昇順）
+        y: 値
+        n_out: 出力する点数
+
+    Returns:
+        昇順に並んだインデックスの配列
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # 先頭・末尾を除いた点を n_out - 2 個のバケットに分割
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    starts = edges[:-1]
+    ends = edges[1:]
+
+    # 累積和で全バケットの平均点を一括計算し、「次のバケットの平均」を作る
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    widths = ends - starts
+    avg_x = (cx[ends] - cx[starts]) / widths
+    avg_y = (cy[ends] - cy[starts]) / widths
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        bx = x[starts[i]:ends[i]]
+        by = y[starts[i]:ends[i]]
+        areas = np.abs(
+            (x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a])
+        )
+        a = starts[i] + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_history(history, max_points):
+    """価格履歴を max_points 点以下に間引く
+
+    kaitori_price_min と kaitori_price_max のそれぞれにLTTBを適用し、
+    選ばれた点の和集合を返すので、両方の系列の形が保たれる。
+    history は timestamp の昇順に並んでいること。
+    """
+    n = len(history)
+    if n <= max_points:
+        return history
+
+    x = np.fromiter((p.get('timestamp') or 0 for p in history), dtype=float, count=n)
+    price_min = np.fromiter((p.get('kaitori_price_min') or 0 for p in history), dtype=float, count=n)
+    price_max = np.fromiter((p.get('kaitori_price_max') or 0 for p in history), dtype=float, count=n)
+
+    half = max_points // 2
+    if half < 3:
+        # 点数が少なすぎて2系列に分けられない場合は中間値の系列で間引く
+        keep = lttb_indices(x, (price_min + price_max) / 2, max_points)
+    else:
+        keep = np.union1d(
+            lttb_indices(x, price_min, half),
+            lttb_indices(x, price_max, max_points - half)
+        )
+    return [history[i] for i in keep]
@@ -1,77 +1,456 @@
+import base64
 import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 
-from google.cloud import firestore
+from flask import Response
+from common.cache import SingleFlightCache
+from common.catalog import cached_catalog, compact_history, expand_history_doc
 from common.cors import get_cors_headers, handle_cors_request
+from common.firestore_client import get_firestore_client
+from common.instrumentation import phase, record_reads, submit_with_context
+from common.rate_limit import check_rate_limit
+
+# バッチモード（複数モデルの一括取得）の設定
+MAX_BATCH_MODELS = 20
+# 1回のバッチのモデルがプールの空きを待たずに同時に始まるよう、上限件数と同じ数にする
+BATCH_MAX_WORKERS = MAX_BATCH_MODELS
+BATCH_MODEL_TIMEOUT_SECONDS = float(os.getenv('HISTORY_BATCH_TIMEOUT_SECONDS', '10'))
+
+# max_points パラメータ（サーバー側ダウンサンプリング）の許容範囲
+MIN_MAX_POINTS = 3
+MAX_MAX_POINTS = 5000
+
+# カーソルページネーションの1ページあたりの最大件数
+MAX_PAGE_SIZE = 1000
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# format パラメータ: json（名前で返す）/ compact（カタログIDと列ごとの配列で返す）
+RESPONSE_FORMATS = ('json', 'compact')
+
+# 同じモデル・期間の履歴はインスタンス内でキャッシュし、期限切れ時の同時読み込みは1回にまとめる
+HISTORY_CACHE_TTL_SECONDS = float(os.getenv('HISTORY_CACHE_TTL_SECONDS', '60'))
+_history_cache = SingleFlightCache(
+    'get_price_history', HISTORY_CACHE_TTL_SECONDS, wait_timeout=BATCH_MODEL_TIMEOUT_SECONDS
+)
+
+# ウォームインスタンス間で再利用するスレッドプール
+# (タイムアウトしたクエリの完了を待たずにレスポンスを返すため、リクエストごとには作らない)
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS)
+
+
+def _error_response(message, status):
+    headers = {
+        'Content-Type': 'application/json',
+        **get_cors_headers()
+    }
+    return (json.dumps({'error': message}), status, headers)
+
+
+def _parse_models(raw):
+    """`series:capacity` をカンマ区切りで並べた models パラメータをパース"""
+    models = []
+    for item in raw.split(','):
+        series, sep, capacity = item.strip().rpartition(':')
+        if not sep or not series.strip() or not capacity.strip():
+            raise ValueError(f"Invalid model: {item}")
+        models.append((series.strip(), capacity.strip()))
+    # 重複指定は1回だけクエリする（順序は維持）
+    return list(dict.fromkeys(models))
+
+
+def _encode_page_token(snapshot):
+    """ページの最後のドキュメントから次ページ用のトークンを作成"""
+    cursor = {'timestamp': snapshot.get('timestamp'), 'id': snapshot.id}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def _decode_page_token(token):
+    """page_token をカーソル（timestamp とドキュメントID）に戻す"""
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if not isinstance(cursor.get('timestamp'), int) or not isinstance(cursor.get('id'), str):
+            raise ValueError("Malformed cursor")
+        return cursor
+    except Exception as e:
+        raise ValueError(f"Invalid page_token: {e}")
+
+
+def _history_query(db, model_id, start_date):
+    """1モデル分の価格履歴クエリを作成（履歴はカタログIDの model_id で保存されている）
+
+    並び順は timestamp 昇順（同一timestampはドキュメントID順）で、
+    Firestore側でソートされるためPython側でのソートは不要。
+    期間は start_date の日の0時以降（date フィールドでの絞り込みと同じ範囲）。
+    """
+    start_of_day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return (
+        db.collection('price_history')
+        .where('model_id', '==', model_id)
+        .where('timestamp', '>=', int(start_of_day.timestamp()))
+        .order_by('timestamp')
+        .order_by('__name__')  # ドキュメントID
+    )
+
+
+def _model_id(db, series, capacity):
+    """(series, capacity) のカタログID（カタログにないモデルは None）"""
+    with phase('firestore'):
+        return cached_catalog(db).model_id(series, capacity)
+
+
+def _expand_history(db, history):
+    """IDで保存された履歴を名前のドキュメントに戻す（未知のIDがあればカタログを読み直す）"""
+    catalog = cached_catalog(db)
+    expanded = [expand_history_doc(data, catalog) for data in history]
+    if any(data is None for data in expanded):
+        catalog = cached_catalog(db, refresh=True)
+        expanded = [expand_history_doc(data, catalog) for data in history]
+    return [data for data in expanded if data is not None]
+
+
+def _query_history(db, series, capacity, start_date, max_points=None):
+    """1モデル分の価格履歴をFirestoreのprice_historyコレクションから取得
+
+    Returns:
+        (履歴データ（IDで保存されたままのドキュメント）, ダウンサンプリング前の点数) のタプル
+    """
+    model_id = _model_id(db, series, capacity)
+    if model_id is None:
+        return [], 0
+    with phase('firestore'):
+        history = [doc.to_dict() for doc in _history_query(db, model_id, start_date).stream()]
+    original_count = len(history)
+    record_reads(original_count)
+    if max_points:
+        with phase('downsample'):
+            # numpy の読み込みは max_points 指定時まで遅延させる
+            from get_price_history.downsample import downsample_history
+            history = downsample_history(history, max_points)
+    return history, original_count
+
+
+def _cached_history(db, series, capacity, days, start_date, max_points=None):
+    """_query_history のキャッシュ付き版
+
+    Returns:
+        ((履歴データ, ダウンサンプリング前の点数), キャッシュの取得元) のタプル
+    """
+    return _history_cache.get(
+        (series, capacity, days, max_points),
+        lambda: _query_history(db, series, capacity, start_date, max_points)
+    )
+
+
+def _timed(started, model, fn, *args):
+    """クエリの開始時刻を記録してから実行する（モデルごとの timeout は開始時から数える）"""
+    started[model] = time.monotonic()
+    return fn(*args)
+
+
+def _wait_per_model(futures, started, submitted_at, timeout):
+    """各モデルのクエリを開始から timeout 秒まで待つ
+
+    プールの空きを待っている間は数えないが、submitted_at から timeout 秒以内に
+    始まらなかったモデルもタイムアウトとする。
+
+    Returns:
+        完了した future の集合
+    """
+    def deadline(future):
+        return started.get(futures[future], submitted_at) + timeout
+
+    done = set()
+    pending = set(futures)
+    while pending:
+        next_deadline = min(deadline(future) for future in pending)
+        finished, pending = wait(
+            pending, timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED
+        )
+        done |= finished
+        now = time.monotonic()
+        pending = {future for future in pending if deadline(future) > now}
+    return done
+
+
+def _query_history_batch(db, models, days, start_date, timeout, max_points=None, compact=False):
+    """複数モデルの価格履歴を並行して取得する
+
+    各モデルのクエリはスレッドプール上で同時に実行され、クエリの開始から timeout秒以内に
+    完了しなかったモデルは status='timeout' として返す（他のモデルの結果は返す）。
+    compact=True の場合は各モデルの履歴を列ごとの配列（カタログID）で返す。
+    """
+    started = {}
+    submitted_at = time.monotonic()
+    futures = {
+        submit_with_context(
+            _batch_executor, _timed, started, (series, capacity),
+            _cached_history, db, series, capacity, days, start_date, max_points
+        ): (series, capacity)
+        for series, capacity in models
+    }
+    done = _wait_per_model(futures, started, submitted_at, timeout)
+
+    results = []
+    for future, (series, capacity) in futures.items():
+        if compact:
+            entry = {'model_id': cached_catalog(db).model_id(series, capacity)}
+        else:
+            entry = {'series': series, 'capacity': capacity}
+        if future not in done:
+            future.cancel()
+            entry.update({'status': 'timeout', 'history': []})
+        elif future.exception() is not None:
+            entry.update({
+                'status': 'error',
+                'error': f'Database query failed: {str(future.exception())}',
+                'history': []
+            })
+        else:
+            (history, original_count), _ = future.result()
+            with phase('encode'):
+                history = compact_history(history) if compact else _expand_history(db, history)
+            entry.update({'status': 'ok', 'original_count': original_count, 'history': history})
+        results.append(entry)
+    return results
+
+
+def _query_history_page(db, series, capacity, start_date, page_size, cursor=None):
+    """価格履歴を1ページ分取得する
+
+    Returns:
+        (履歴データ, 次ページのトークン) のタプル。最終ページの場合トークンは None
+    """
+    model_id = _model_id(db, series, capacity)
+    if model_id is None:
+        return [], None
+    query = _history_query(db, model_id, start_date)
+    if cursor:
+        query = query.start_after({
+            'timestamp': cursor['timestamp'],
+            '__name__': db.collection('price_history').document(cursor['id'])
+        })
+    # 1件多く取得して次ページの有無を判定する
+    with phase('firestore'):
+        docs = list(query.limit(page_size + 1).stream())
+    record_reads(len(docs))
+    next_page_token = _encode_page_token(docs[page_size - 1]) if len(docs) > page_size else None
+    return _expand_history(db, [doc.to_dict() for doc in docs[:page_size]]), next_page_token
+
+
+def _stream_history_ndjson(db, series, capacity, start_date):
+    """Firestoreのストリームから届いた順に1行1件のNDJSONを出力するジェネレータ"""
+    try:
+        catalog = cached_catalog(db)
+        model_id = catalog.model_id(series, capacity)
+        if model_id is None:
+            return
+        for doc in _history_query(db, model_id, start_date).stream():
+            data = expand_history_doc(doc.to_dict(), catalog)
+            if data is None:
+                catalog = cached_catalog(db, refresh=True)
+                data = expand_history_doc(doc.to_dict(), catalog)
+            if data is not None:
+                yield json.dumps(data, default=str) + '\n'
+    except Exception as e:
+        # ストリーム開始後はステータスを変更できないため、エラー行を出力して終了する
+        print(f"Price history stream failed: {e}")
+        yield json.dumps({'error': f'Database query failed: {str(e)}'}) + '\n'
 
 
 def get_price_history(request):
-    """Cloud Functions用 価格推移データ取得エンドポイント (Firestore版)"""
+    """Cloud Functions用 価格推移データ取得エンドポイント (Firestore版)
+
+    通常は series と capacity で1モデル分を返す。
+    models=iPhone 17:256GB,iPhone 17 Pro:1TB のように指定した場合は
+    複数モデルの履歴を並行して取得し、1回のレスポンスでまとめて返す。
+    max_points を指定すると、各モデルの履歴をLTTBでその点数以下に間引く。
+
+    format=compact を指定すると、シリーズ・容量・色をカタログID（get_catalog で名前に変換）で、
+    履歴を列ごとの配列で返す。
+
+    1モデル指定時は以下も利用できる:
+    - page_size / page_token によるカーソルページネーション
+    - Accept: application/x-ndjson によるストリーミング（1行1件）
+    """
     # CORS preflight request handling
     cors_response = handle_cors_request(request)
     if cors_response:
         return cors_response
-    
+
     # Input validation
     series = request.args.get('series')
     capacity = request.args.get('capacity')
+    models_param = request.args.get('models')
 
-    if not series or not capacity:
-        headers = {
-            'Content-Type': 'application/json',
-            **get_cors_headers()
-        }
-        return (json.dumps({'error': 'series and capacity parameters are required'}), 400, headers)
+    models = None
+    if models_param:
+        try:
+            models = _parse_models(models_param)
+        except ValueError:
+            return _error_response('models parameter must be a comma-separated list of series:capacity', 400)
+        if len(models) > MAX_BATCH_MODELS:
+            return _error_response(f'models parameter accepts at most {MAX_BATCH_MODELS} entries', 400)
+    elif not series or not capacity:
+        return _error_response('series and capacity parameters are required', 400)
 
     try:
         days = int(request.args.get('days', 14))
         if days <= 0 or days > 365:
             raise ValueError("Days must be between 1 and 365")
     except (ValueError, TypeError):
+        return _error_response('days parameter must be a valid positive integer', 400)
+
+    max_points = request.args.get('max_points')
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+            if max_points < MIN_MAX_POINTS or max_points > MAX_MAX_POINTS:
+                raise ValueError(f"max_points must be between {MIN_MAX_POINTS} and {MAX_MAX_POINTS}")
+        except (ValueError, TypeError):
+            return _error_response(
+                f'max_points parameter must be an integer between {MIN_MAX_POINTS} and {MAX_MAX_POINTS}', 400
+            )
+
+    response_format = request.args.get('format', 'json')
+    if response_format not in RESPONSE_FORMATS:
+        return _error_response(f"format parameter must be one of {', '.join(RESPONSE_FORMATS)}", 400)
+    compact = response_format == 'compact'
+
+    page_size = request.args.get('page_size')
+    page_token = request.args.get('page_token')
+    stream = NDJSON_MIMETYPE in request.headers.get('Accept', '')
+    cursor = None
+    if page_size is not None or page_token:
+        try:
+            page_size = int(page_size if page_size is not None else MAX_PAGE_SIZE)
+            if page_size <= 0 or page_size > MAX_PAGE_SIZE:
+                raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+        except (ValueError, TypeError):
+            return _error_response(f'page_size parameter must be an integer between 1 and {MAX_PAGE_SIZE}', 400)
+        if page_token:
+            try:
+                cursor = _decode_page_token(page_token)
+            except ValueError:
+                return _error_response('page_token parameter is invalid', 400)
+    if (page_size is not None or stream) and (models is not None or max_points is not None):
+        return _error_response('pagination and streaming cannot be combined with models or max_points', 400)
+    if page_size is not None and stream:
+        return _error_response('pagination cannot be combined with streaming', 400)
+    if compact and (page_size is not None or stream):
+        return _error_response('format=compact cannot be combined with pagination or streaming', 400)
+
+    # キャッシュから返せる（Firestoreを読まない）モデルはレート制限の対象外
+    # バッチモードでは読み込みが必要なモデル数分のトークンを消費する
+    if page_size is not None or stream:
+        cost = 1
+    else:
+        cache_models = models if models is not None else [(series, capacity)]
+        cost = sum(
+            not _history_cache.is_fresh((model_series, model_capacity, days, max_points))
+            for model_series, model_capacity in cache_models
+        )
+    if cost:
+        rate_limited = check_rate_limit(request, cost)
+        if rate_limited:
+            return rate_limited
+
+    db = get_firestore_client()
+    end_date = datetime.now()  # Use local time to match data storage
+    start_date = end_date - timedelta(days=days)
+
+    if models is not None:
+        results = _query_history_batch(
+            db, models, days, start_date, BATCH_MODEL_TIMEOUT_SECONDS, max_points, compact=compact
+        )
+        complete = all(entry['status'] == 'ok' for entry in results)
+        result = {
+            'days': days,
+            'models': results
+        }
+        if compact:
+            result = {'format': 'compact', 'catalog_version': cached_catalog(db).version, **result}
         headers = {
             'Content-Type': 'application/json',
+            # 一部のモデルが欠けたレスポンスはキャッシュさせない
+            'Cache-Control': 'public, max-age=300' if complete else 'no-store',
             **get_cors_headers()
         }
-        return (json.dumps({'error': 'days parameter must be a valid positive integer'}), 400, headers)
+        with phase('encode'):
+            body = json.dumps(result, default=str)
+        return (body, 200, headers)
 
-    db = firestore.Client()
-    end_date = datetime.now()  # Use local time to match data storage
-    start_date = end_date - timedelta(days=days)
+    if stream:
+        headers = {
+            'Cache-Control': 'public, max-age=300',
+            **get_cors_headers()
+        }
+        return Response(
+            _stream_history_ndjson(db, series, capacity, start_date),
+            status=200,
+            headers=headers,
+            mimetype=NDJSON_MIMETYPE
+        )
 
-    try:
-        # Firestoreのprice_historyコレクションから該当データを取得
-        query = db.collection('price_history')
-        if series:
-            query = query.where('series', '==', series)
-        if capacity:
-            query = query.where('capacity', '==', capacity)
-        query = query.where('date', '>=', start_date.strftime('%Y-%m-%d'))
-        docs = query.stream()
-        history = [doc.to_dict() for doc in docs]
-        
-        # Sort by timestamp for consistent ordering
-        history.sort(key=lambda x: x.get('timestamp', 0))
-        
-    except Exception as e:
+    if page_size is not None:
+        try:
+            history, next_page_token = _query_history_page(db, series, capacity, start_date, page_size, cursor)
+        except Exception as e:
+            return _error_response(f'Database query failed: {str(e)}', 500)
+        result = {
+            'series': series,
+            'capacity': capacity,
+            'days': days,
+            'history': history,
+            'next_page_token': next_page_token
+        }
         headers = {
             'Content-Type': 'application/json',
+            'Cache-Control': 'public, max-age=300',
             **get_cors_headers()
         }
-        return (
-            json.dumps({'error': f'Database query failed: {str(e)}'}), 
-            500, 
-            headers
-        )
+        with phase('encode'):
+            body = json.dumps(result, default=str)
+        return (body, 200, headers)
 
-    result = {
-        'series': series,
-        'capacity': capacity,
-        'days': days,
-        'history': history
-    }
+    try:
+        (history, original_count), cache_status = _cached_history(db, series, capacity, days, start_date, max_points)
+    except TimeoutError:
+        return _error_response('Price history is being loaded, please retry', 503)
+    except Exception as e:
+        return _error_response(f'Database query failed: {str(e)}', 500)
+
+    if compact:
+        catalog = cached_catalog(db)
+        with phase('encode'):
+            history = compact_history(history)
+        result = {
+            'format': 'compact',
+            'catalog_version': catalog.version,
+            'model_id': catalog.model_id(series, capacity),
+            'days': days,
+            'original_count': original_count,
+            'history': history
+        }
+    else:
+        with phase('encode'):
+            history = _expand_history(db, history)
+        result = {
+            'series': series,
+            'capacity': capacity,
+            'days': days,
+            'original_count': original_count,
+            'history': history
+        }
     headers = {
         'Content-Type': 'application/json',
         'Cache-Control': 'public, max-age=300',
+        'X-Cache': cache_status.upper(),
         **get_cors_headers()
     }
-    return (json.dumps(result, default=str), 200, headers)
\ No newline at end of file
+    with phase('encode'):
+        body = json.dumps(result, default=str)
+    return (body, 200, headers)
@@ -0,0 +1,91 @@
+import json
+import os
+import time
+
+from common.cache import SingleFlightCache
+from common.cors import get_cors_headers, handle_cors_request
+from common.firestore_client import get_firestore_client
+from common.history_stats import STATS_WINDOW_DAYS, ModelStats, load_price_stats
+from common.instrumentation import phase, record_reads
+from common.rate_limit import check_rate_limit
+
+STATS_CACHE_TTL_SECONDS = float(os.getenv('HISTORY_CACHE_TTL_SECONDS', '60'))
+_stats_cache = SingleFlightCache('get_price_stats', STATS_CACHE_TTL_SECONDS)
+
+
+def _error_response(message, status):
+    headers = {
+        'Content-Type': 'application/json',
+        **get_cors_headers()
+    }
+    return (json.dumps({'error': message}), status, headers)
+
+
+def _load_stats(db, series, capacity):
+    with phase('firestore'):
+        docs = load_price_stats(db, series, capacity)
+    record_reads(max(1, len(docs)))
+    return docs
+
+
+def get_price_stats(request):
+    """Cloud Functions用 価格統計取得エンドポイント
+
+    履歴の書き込み時に更新される price_stats のドキュメントだけを読み、
+    (series, capacity) ごとの 7/14/30日の平均・EWMA・ボラティリティ・最小/最大・変化率を返す。
+    capacity を省略するとシリーズの全容量、days を指定するとその期間だけを返す。
+    """
+    # CORS preflight request handling
+    cors_response = handle_cors_request(request)
+    if cors_response:
+        return cors_response
+
+    series = request.args.get('series')
+    if not series:
+        return _error_response('series parameter is required', 400)
+    capacity = request.args.get('capacity')
+
+    days = request.args.get('days')
+    if days is not None:
+        if days not in {str(d) for d in STATS_WINDOW_DAYS}:
+            return _error_response(f"days parameter must be one of {', '.join(map(str, STATS_WINDOW_DAYS))}", 400)
+
+    cache_key = f"{series}|{capacity or ''}"
+    # キャッシュから返せる（Firestoreを読まない）リクエストはレート制限の対象外
+    if not _stats_cache.is_fresh(cache_key):
+        rate_limited = check_rate_limit(request)
+        if rate_limited:
+            return rate_limited
+
+    db = get_firestore_client()
+    try:
+        docs, cache_status = _stats_cache.get(cache_key, lambda: _load_stats(db, series, capacity))
+    except Exception as e:
+        return _error_response(f'Database query failed: {str(e)}', 500)
+    if not docs:
+        return _error_response('No stats found for the specified model', 404)
+
+    with phase('aggregate'):
+        # 保存後に書き込みがなくても、現在時刻で期間外になった点を除いて集計する
+        now = int(time.time())
+        stats = []
+        for doc in sorted(docs, key=lambda d: d.get('capacity', '')):
+            windows = ModelStats.from_dict(doc).summary(now=now)
+            if days is not None:
+                windows = {days: windows[days]}
+            stats.append({
+                'series': doc['series'],
+                'capacity': doc['capacity'],
+                'last_timestamp': doc.get('last_timestamp'),
+                'windows': windows
+            })
+    result = {'series': series, 'stats': stats}
+    with phase('encode'):
+        body = json.dumps(result, default=str)
+    headers = {
+        'Content-Type': 'application/json',
+        'Cache-Control': 'public, max-age=300',
+        'X-Cache': cache_status.upper(),
+        **get_cors_headers()
+    }
+    return (body, 200, headers)
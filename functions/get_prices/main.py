@@ -1,92 +1,84 @@
 import json
+import math
 import os
-from datetime import datetime
 
+from common.cache import SingleFlightCache
 from common.cors import get_cors_headers, handle_cors_request
-from google.cloud import firestore
+from common.firestore_client import get_firestore_client
+from common.instrumentation import phase, record_reads
+from common.margins import MarginCatalog, compute_margins
+from common.rate_limit import check_rate_limit
 
+# スクレイピング直後のアクセス集中でFirestoreの読み取りが重複しないよう、インスタンス内でキャッシュする
+PRICES_CACHE_TTL_SECONDS = float(os.getenv('PRICES_CACHE_TTL_SECONDS', '60'))
+_prices_cache = SingleFlightCache('get_prices', PRICES_CACHE_TTL_SECONDS)
 
-def get_prices(request):
-    """Cloud Functions用 価格データ取得エンドポイント (Firestore版)"""
-    # CORS preflight request handling
-    cors_response = handle_cors_request(request)
-    if cors_response:
-        return cors_response
-    
-    db = firestore.Client()
-    series = request.args.get('series')
-    
-    # 買取価格データを取得
-    kaitori_prices_ref = db.collection('kaitori_prices')
-    kaitori_query = kaitori_prices_ref
-    if series:
-        kaitori_query = kaitori_query.where('series', '==', series)
-    kaitori_docs = kaitori_query.stream()
-    
-    # 公式価格データを取得
-    official_prices_ref = db.collection('official_prices')
-    if series:
-        # シリーズ名でドキュメントIDを検索
-        doc_ref = official_prices_ref.document(series)
-        doc_snapshot = doc_ref.get()
-        print(f"Document exists: {doc_snapshot.exists}")
-        if doc_snapshot.exists:
-            print(f"Document data: {doc_snapshot.to_dict()}")
-        official_docs = [doc_snapshot] if doc_snapshot.exists else []
-    else:
-        official_docs = official_prices_ref.stream()
+
+def _load_prices(db, series):
+    """Firestoreから買取価格と公式価格を読み込み、レスポンスの形式に整形する"""
+    with phase('firestore'):
+        # 買取価格データを取得
+        kaitori_prices_ref = db.collection('kaitori_prices')
+        kaitori_query = kaitori_prices_ref
+        if series:
+            kaitori_query = kaitori_query.where('series', '==', series)
+        kaitori_docs = list(kaitori_query.stream())
+        
+        # 公式価格データを取得
+        official_prices_ref = db.collection('official_prices')
+        if series:
+            # シリーズ名でドキュメントIDを検索
+            doc_ref = official_prices_ref.document(series)
+            doc_snapshot = doc_ref.get()
+            official_docs = [doc_snapshot] if doc_snapshot.exists else []
+        else:
+            official_docs = list(official_prices_ref.stream())
+    record_reads(len(kaitori_docs) + len(official_docs))
     
+    with phase('aggregate'):
+        return _build_prices(series, kaitori_docs, official_docs)
+
+
+def _build_prices(series, kaitori_docs, official_docs):
+    """買取価格と公式価格のドキュメントからレスポンスの形式に整形する"""
     # データを整理
     kaitori_data = {}
     for doc in kaitori_docs:
         data = doc.to_dict()
         series_name = data.get('series')
+        capacity = data.get('capacity')
+        if not series_name or not capacity:
+            continue
         if series_name not in kaitori_data:
             kaitori_data[series_name] = {}
         
-        capacity = data.get('capacity')
         kaitori_data[series_name][capacity] = {
             'kaitori_price_min': data.get('kaitori_price_min', 0),
             'kaitori_price_max': data.get('kaitori_price_max', 0),
             'colors': data.get('colors', {})
         }
     
-    official_data = {}
-    for doc in official_docs:
-        data = doc.to_dict()
-        series_name = doc.id  # ドキュメントIDがシリーズ名
-        if series_name not in official_data:
-            official_data[series_name] = {}
-        
-        # データ構造: {'price': {'256GB': {'colors': {...}}}}
-        price_data = data.get('price', {})
-        for capacity, capacity_data in price_data.items():
-            # 各容量の色の価格から平均価格を計算
-            colors = capacity_data.get('colors', {})
-            if colors:
-                avg_price = sum(colors.values()) / len(colors)
-                official_data[series_name][capacity] = {
-                    'official_price': int(avg_price)
-                }
+    # データ構造: {'price': {'256GB': {'colors': {...}, 'stats': {'min', 'avg', 'max'}}}}
+    # ドキュメントIDがシリーズ名
+    official_data = {doc.id: doc.to_dict().get('price', {}) for doc in official_docs}
     
-    # デバッグ用ログ
-    print(f"Official data for {series}: {official_data}")
+    # 容量ごと（買取価格は最大値、公式価格は書き込み時に計算済みの平均価格）に全チャネルの利益を一括計算
+    catalog = MarginCatalog.from_prices(kaitori_data, official_data, by_color=False)
+    margins = compute_margins(catalog)
     
     # フロントエンドが期待する形式に変換
     result = {}
-    for series_name in kaitori_data:
-        if series_name not in result:
-            result[series_name] = {
-                'series': series_name,
-                'prices': {}
-            }
+    for s, series_name in enumerate(catalog.series):
+        result[series_name] = {
+            'series': series_name,
+            'prices': {}
+        }
         
         for capacity in kaitori_data[series_name]:
-            kaitori_info = kaitori_data[series_name][capacity]
-            official_info = official_data.get(series_name, {}).get(capacity, {})
-            
-            official_price = official_info.get('official_price', 0)
-            kaitori_price = kaitori_info.get('kaitori_price_max', 0)  # 最大買取価格を使用
+            c = catalog.capacities.index(capacity)
+            has_official = not math.isnan(catalog.official[s, c, 0])
+            official_price = int(catalog.official[s, c, 0]) if has_official else 0
+            kaitori_price = kaitori_data[series_name][capacity].get('kaitori_price_max', 0)  # 最大買取価格を使用
             price_diff = kaitori_price - official_price
             rakuten_diff = kaitori_price - (official_price * 0.9)
             
@@ -94,19 +86,51 @@ def get_prices(request):
                 'official_price': official_price,
                 'kaitori_price': kaitori_price,
                 'price_diff': price_diff,
-                'rakuten_diff': rakuten_diff
+                'rakuten_diff': rakuten_diff,
+                # 購入チャネル別の実質購入価格・利益・利益率
+                'channels': margins.channel_values(s, c) if has_official and kaitori_price else {}
             }
     
     # シリーズ指定の場合は単一オブジェクトを返す
     if series and series in result:
-        response_data = result[series]
-    else:
-        response_data = result
+        return result[series]
+    return result
+
+
+def get_prices(request):
+    """Cloud Functions用 価格データ取得エンドポイント (Firestore版)"""
+    # CORS preflight request handling
+    cors_response = handle_cors_request(request)
+    if cors_response:
+        return cors_response
+    
+    series = request.args.get('series')
+    cache_key = series or ''
+    
+    # キャッシュから返せる（Firestoreを読まない）リクエストはレート制限の対象外
+    if not _prices_cache.is_fresh(cache_key):
+        rate_limited = check_rate_limit(request)
+        if rate_limited:
+            return rate_limited
+    
+    db = get_firestore_client()
+    try:
+        response_data, cache_status = _prices_cache.get(cache_key, lambda: _load_prices(db, series))
+    except TimeoutError:
+        # 他のリクエストの読み込みを待ちきれなかった（期限切れの値もない）
+        return (json.dumps({'error': 'Price data is being loaded, please retry'}), 503, {
+            'Content-Type': 'application/json',
+            **get_cors_headers()
+        })
+    
+    with phase('encode'):
+        body = json.dumps(response_data, default=str)
     
     # CORSヘッダーを含むヘッダーを設定
     headers = {
         'Content-Type': 'application/json',
         'Cache-Control': 'public, max-age=300',
+        'X-Cache': cache_status.upper(),
         **get_cors_headers()
     }
-    return (json.dumps(response_data, default=str), 200, headers) 
\ No newline at end of file
+    return (body, 200, headers) 
\ No newline at end of file
@@ -0,0 +1,121 @@
+import json
+import os
+
+from common.cache import SingleFlightCache
+from common.cors import get_cors_headers, handle_cors_request
+from common.firestore_client import get_firestore_client
+from common.instrumentation import phase, record_reads
+from common.rankings import RANKING_METRICS, build_full_margin_ranking, is_truncated, load_margin_ranking, top_entries
+from common.rate_limit import check_rate_limit
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+RANKINGS_CACHE_TTL_SECONDS = float(os.getenv('PRICES_CACHE_TTL_SECONDS', '60'))
+_rankings_cache = SingleFlightCache('get_rankings', RANKINGS_CACHE_TTL_SECONDS)
+# 保存済みのランキングで絞り込み結果が足りない場合に、価格から作り直した全エントリーのランキング
+_full_rankings_cache = SingleFlightCache('get_rankings_full', RANKINGS_CACHE_TTL_SECONDS)
+
+
+def _error_response(message, status):
+    headers = {
+        'Content-Type': 'application/json',
+        **get_cors_headers()
+    }
+    return (json.dumps({'error': message}), status, headers)
+
+
+def _load_ranking(db):
+    with phase('firestore'):
+        ranking = load_margin_ranking(db)
+    record_reads(1)
+    return ranking
+
+
+def _load_full_ranking(db):
+    with phase('firestore'):
+        ranking, reads = build_full_margin_ranking(db)
+    record_reads(reads)
+    return ranking
+
+
+def get_rankings(request):
+    """Cloud Functions用 利益ランキング取得エンドポイント
+
+    check_prices が取り込み後に保存したランキング（rankings/margins）を1回読むだけで、
+    利益額（by=margin）または利益率（by=rate）の上位 limit 件を返す。
+    series / capacity / channel で絞り込みができる。
+    保存済みのランキングは上位だけなので、絞り込んだ結果が limit 件に満たず、
+    上位から外れたエントリーがある場合は価格から全エントリーのランキングを作り直して返す。
+    """
+    # CORS preflight request handling
+    cors_response = handle_cors_request(request)
+    if cors_response:
+        return cors_response
+
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+        if limit <= 0 or limit > MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    except (ValueError, TypeError):
+        return _error_response(f'limit parameter must be an integer between 1 and {MAX_LIMIT}', 400)
+
+    metric = request.args.get('by', 'margin')
+    if metric not in RANKING_METRICS:
+        return _error_response(f"by parameter must be one of {', '.join(RANKING_METRICS)}", 400)
+
+    # キャッシュから返せる（Firestoreを読まない）リクエストはレート制限の対象外
+    if not _rankings_cache.is_fresh(''):
+        rate_limited = check_rate_limit(request)
+        if rate_limited:
+            return rate_limited
+
+    db = get_firestore_client()
+    try:
+        ranking, cache_status = _rankings_cache.get('', lambda: _load_ranking(db))
+    except TimeoutError:
+        return _error_response('Ranking is being loaded, please retry', 503)
+    except Exception as e:
+        return _error_response(f'Database query failed: {str(e)}', 500)
+    if ranking is None:
+        # 未作成の状態はキャッシュせず、次のリクエストで読み直す
+        _rankings_cache.clear()
+        return _error_response('Ranking has not been generated yet', 404)
+
+    filters = {
+        'series': request.args.get('series'),
+        'capacity': request.args.get('capacity'),
+        'channel': request.args.get('channel')
+    }
+    with phase('aggregate'):
+        entries = top_entries(ranking, limit, metric=metric, **filters)
+
+    if len(entries) < limit and any(filters.values()) and is_truncated(ranking):
+        if not _full_rankings_cache.is_fresh(''):
+            rate_limited = check_rate_limit(request)
+            if rate_limited:
+                return rate_limited
+        try:
+            full_ranking, cache_status = _full_rankings_cache.get('', lambda: _load_full_ranking(db))
+        except TimeoutError:
+            return _error_response('Ranking is being loaded, please retry', 503)
+        except Exception as e:
+            return _error_response(f'Database query failed: {str(e)}', 500)
+        with phase('aggregate'):
+            entries = top_entries(full_ranking, limit, metric=metric, **filters)
+    result = {
+        'by': metric,
+        'limit': limit,
+        'entries': entries,
+        'channels': ranking.get('channels', []),
+        'updated_at': ranking.get('updated_at')
+    }
+    with phase('encode'):
+        body = json.dumps(result, default=str)
+    headers = {
+        'Content-Type': 'application/json',
+        'Cache-Control': 'public, max-age=300',
+        'X-Cache': cache_status.upper(),
+        **get_cors_headers()
+    }
+    return (body, 200, headers)
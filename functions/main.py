@@ -0,0 +1,107 @@
+"""
+Cloud Functions 統合ルーター
+
+functions/ をソースルートとしてデプロイし、パスの先頭セグメントで各関数の
+ハンドラーに振り分ける（例: /router/get_prices → get_prices）。
+各ハンドラーは最初に呼ばれたときに読み込まれ、common/ のクライアントや
+キャッシュはインスタンス内の全ハンドラーで共有される。
+
+従来の関数名（get_prices など）も同じソースからのエントリーポイントとして
+デプロイできるよう、ハンドラーへの薄いエイリアスを定義している。
+"""
+
+import importlib
+import json
+
+from common.cors import get_cors_headers, handle_cors_request
+from common.instrumentation import instrumented
+
+# ルーティング対象の関数（functions/<name>/main.py の <name> 関数）
+HANDLER_NAMES = (
+    'get_prices',
+    'get_price_history',
+    'api_prices',
+    'api_status',
+    'health',
+    'set_alert',
+    'check_prices',
+    'scrape_prices',
+    'get_rankings',
+    'get_price_stats',
+    'get_catalog',
+)
+
+_handlers = {}
+
+
+def _get_handler(name):
+    """ハンドラーを初回呼び出し時に読み込み、計測（Server-Timing・構造化ログ）を付けてキャッシュする"""
+    handler = _handlers.get(name)
+    if handler is None:
+        module = importlib.import_module(f'{name}.main')
+        handler = instrumented(name)(getattr(module, name))
+        _handlers[name] = handler
+    return handler
+
+
+def router(request):
+    """Cloud Functions用 統合エントリーポイント"""
+    name = request.path.strip('/').split('/', 1)[0]
+    if name not in HANDLER_NAMES:
+        cors_response = handle_cors_request(request)
+        if cors_response:
+            return cors_response
+        headers = {
+            'Content-Type': 'application/json',
+            **get_cors_headers()
+        }
+        return (json.dumps({
+            'error': f'Unknown endpoint: /{name}',
+            'endpoints': [f'/{handler_name}' for handler_name in HANDLER_NAMES]
+        }), 404, headers)
+    return _get_handler(name)(request)
+
+
+# 従来の関数名のエントリーポイント
+def get_prices(request):
+    return _get_handler('get_prices')(request)
+
+
+def get_price_history(request):
+    return _get_handler('get_price_history')(request)
+
+
+def api_prices(request):
+    return _get_handler('api_prices')(request)
+
+
+def api_status(request):
+    return _get_handler('api_status')(request)
+
+
+def health(request):
+    return _get_handler('health')(request)
+
+
+def set_alert(request):
+    return _get_handler('set_alert')(request)
+
+
+def check_prices(request):
+    return _get_handler('check_prices')(request)
+
+
+def scrape_prices(request):
+    return _get_handler('scrape_prices')(request)
+
+
+def get_rankings(request):
+    return _get_handler('get_rankings')(request)
+
+
+def get_price_stats(request):
+    return _get_handler('get_price_stats')(request)
+
+
+def get_catalog(request):
+    return _get_handler('get_catalog')(request)
@@ -0,0 +1,160 @@
+"""
+スクレイピングジョブの管理
+- 登録リクエストの認証（共有シークレット）
+- ジョブの登録（実行中のジョブがあればそれに合流する single-flight。完了直後は登録しない）
+- ジョブの状態取得
+- ワーカー（GitHub Actions のスクレイピングワークフロー）の起動
+"""
+
+import os
+from datetime import datetime
+
+from common.auth import has_bearer_secret
+
+SCRAPE_JOBS_COLLECTION = 'scrape_jobs'
+SCRAPE_JOB_LOCKS_COLLECTION = 'scrape_job_locks'
+SCRAPE_JOB_LOCK_ID = 'current'
+
+IN_FLIGHT_STATUSES = ('queued', 'running')
+
+# この時間更新がない実行中ジョブはワーカーが停止したとみなす（ワークフローのタイムアウトより長くする）
+JOB_STALE_SECONDS = int(os.getenv('SCRAPE_JOB_STALE_SECONDS', str(45 * 60)))
+
+# 前回のジョブの完了からこの時間は新しいジョブを登録しない
+JOB_MIN_INTERVAL_SECONDS = int(os.getenv('SCRAPE_JOB_MIN_INTERVAL_SECONDS', str(30 * 60)))
+
+# ジョブの登録（ワーカーの起動）に必要な共有シークレット。未設定の場合は登録を受け付けない
+SCRAPE_TRIGGER_SECRET_ENV = 'SCRAPE_TRIGGER_SECRET'
+
+GITHUB_API_URL = 'https://api.github.com'
+SCRAPE_WORKFLOW_FILE = 'scrape_prices.yml'
+
+
+def is_stale(job, now=None):
+    """実行中のジョブが JOB_STALE_SECONDS 以上更新されていないか"""
+    now = now or datetime.now()
+    try:
+        updated_at = datetime.fromisoformat(job.get('updated_at'))
+    except (TypeError, ValueError):
+        return True
+    return (now - updated_at).total_seconds() >= JOB_STALE_SECONDS
+
+
+def is_authorized(request):
+    """Authorization: Bearer <SCRAPE_TRIGGER_SECRET> のリクエストか"""
+    return has_bearer_secret(request, SCRAPE_TRIGGER_SECRET_ENV)
+
+
+def seconds_until_next_run(job, now=None):
+    """完了したジョブから JOB_MIN_INTERVAL_SECONDS が経つまでの秒数（経っていれば 0）"""
+    if job.get('status') != 'completed':
+        return 0
+    now = now or datetime.now()
+    try:
+        finished_at = datetime.fromisoformat(job.get('finished_at'))
+    except (TypeError, ValueError):
+        return 0
+    return max(0, JOB_MIN_INTERVAL_SECONDS - (now - finished_at).total_seconds())
+
+
+def enqueue_scrape_job(db, source='api'):
+    """スクレイピングジョブを登録する
+
+    実行中（queued / running）のジョブがあれば新しいジョブは作らずにそれに合流する。
+    最新のジョブの完了から JOB_MIN_INTERVAL_SECONDS 経っていなければ登録しない。
+    ロック用ドキュメントをトランザクションで読み書きするため、同時に呼ばれても
+    ジョブは1つしか作られない。
+
+    Returns:
+        (job_id, job, coalesced, retry_after) のタプル。
+        登録しなかった場合は最新のジョブと、登録できるまでの秒数（retry_after > 0）
+    """
+    from google.cloud import firestore
+
+    lock_ref = db.collection(SCRAPE_JOB_LOCKS_COLLECTION).document(SCRAPE_JOB_LOCK_ID)
+    jobs_ref = db.collection(SCRAPE_JOBS_COLLECTION)
+
+    @firestore.transactional
+    def enqueue(transaction):
+        now = datetime.now()
+        lock = lock_ref.get(transaction=transaction)
+        current_job_id = lock.get('job_id') if lock.exists else None
+        if current_job_id:
+            current_ref = jobs_ref.document(current_job_id)
+            current = current_ref.get(transaction=transaction)
+            job = current.to_dict() if current.exists else None
+            retry_after = seconds_until_next_run(job, now) if job else 0
+            if retry_after:
+                return current_job_id, job, False, retry_after
+            if job and job.get('status') in IN_FLIGHT_STATUSES:
+                if not is_stale(job, now):
+                    job['requested_count'] = job.get('requested_count', 1) + 1
+                    transaction.update(current_ref, {'requested_count': job['requested_count']})
+                    return current_job_id, job, True, 0
+                transaction.update(current_ref, {
+                    'status': 'abandoned',
+                    'error': 'No progress from worker',
+                    'updated_at': now.isoformat()
+                })
+
+        job_ref = jobs_ref.document()
+        job = {
+            'status': 'queued',
+            'source': source,
+            'requested_count': 1,
+            'urls_total': None,
+            'urls_done': 0,
+            'items_scraped': 0,
+            'items_written': 0,
+            'created_at': now.isoformat(),
+            'updated_at': now.isoformat()
+        }
+        transaction.set(job_ref, job)
+        transaction.set(lock_ref, {'job_id': job_ref.id, 'updated_at': now.isoformat()})
+        return job_ref.id, job, False, 0
+
+    return enqueue(db.transaction())
+
+
+def get_scrape_job(db, job_id=None):
+    """ジョブの状態を取得する（job_id 省略時は最新のジョブ）
+
+    Returns:
+        (job_id, job) のタプル。見つからない場合は (job_id, None)
+    """
+    if not job_id:
+        lock = db.collection(SCRAPE_JOB_LOCKS_COLLECTION).document(SCRAPE_JOB_LOCK_ID).get()
+        job_id = lock.get('job_id') if lock.exists else None
+        if not job_id:
+            return None, None
+    snapshot = db.collection(SCRAPE_JOBS_COLLECTION).document(job_id).get()
+    return job_id, snapshot.to_dict() if snapshot.exists else None
+
+
+def dispatch_worker(job_id):
+    """GitHub Actions のスクレイピングワークフローを job_id 付きで起動する
+
+    GITHUB_TOKEN / GITHUB_REPOSITORY が未設定の場合は起動せず、
+    ジョブは次回の定期実行でワーカーに取得される。
+
+    Returns:
+        起動した場合 True
+    """
+    token = os.getenv('GITHUB_TOKEN')
+    repository = os.getenv('GITHUB_REPOSITORY')
+    if not token or not repository:
+        return False
+
+    import requests
+
+    response = requests.post(
+        f"{GITHUB_API_URL}/repos/{repository}/actions/workflows/{SCRAPE_WORKFLOW_FILE}/dispatches",
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/vnd.github+json'
+        },
+        json={'ref': os.getenv('GITHUB_REF', 'main'), 'inputs': {'job_id': job_id}},
+        timeout=10
+    )
+    response.raise_for_status()
+    return True
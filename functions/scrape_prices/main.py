@@ -1,35 +1,81 @@
 import json
+import math
 from datetime import datetime
 
+from common.firestore_client import get_firestore_client
+from scrape_prices.jobs import dispatch_worker, enqueue_scrape_job, get_scrape_job, is_authorized
+
 
 def scrape_prices(request):
-    """Cloud Functions用 価格スクレイピングエンドポイント"""
-def scrape_prices(request):
-    """Cloud Functions用 価格スクレイピングエンドポイント"""
-    # Add authentication check here
-    # auth_header = request.headers.get('Authorization')
-    # if not validate_auth(auth_header):
-    #     return (json.dumps({"error": "Unauthorized"}), 401, {'Content-Type': 'application/json'})
-    if request.method != 'POST':
+    """Cloud Functions用 価格スクレイピングエンドポイント
+
+    POST: スクレイピングジョブを登録してすぐにジョブIDを返す（202）。
+          実行中のジョブがある場合は新しいジョブを作らずにそのジョブIDを返す。
+          Authorization: Bearer <SCRAPE_TRIGGER_SECRET> が必要（なければ 401）。
+          前回のジョブの完了直後は登録せずに 429 と Retry-After を返す。
+    GET:  ジョブの状態（進捗・処理済みURL数・書き込み件数）を返す。
+          job_id 省略時は最新のジョブ。
+    """
+    headers = {
+        'Content-Type': 'application/json',
+        'Cache-Control': 'no-store'
+    }
+    if request.method not in ('GET', 'POST'):
         return (json.dumps({
             "error": "Method Not Allowed",
-            "message": "Only POST method is supported",
+            "message": "Only GET and POST methods are supported",
             "timestamp": datetime.now().isoformat()
-        }), 405, {'Content-Type': 'application/json'})
-    # TODO: Implement actual scraping logic
-    # For now, return a clear message that this is not implemented
-    if True:  # Replace with actual implementation
-        return (
-            json.dumps({"error": "Scraping functionality not yet implemented"}),
-            501,
-            {'Content-Type': 'application/json'}
-        )
+        }), 405, headers)
+
+    # ジョブの登録はワーカー（GitHub Actions）を起動するため共有シークレットを持つ呼び出し元に限る
+    if request.method == 'POST' and not is_authorized(request):
+        return (json.dumps({"error": "Unauthorized"}), 401, {**headers, 'WWW-Authenticate': 'Bearer'})
+
+    db = get_firestore_client()
+
+    if request.method == 'GET':
+        try:
+            job_id, job = get_scrape_job(db, request.args.get('job_id'))
+        except Exception as e:
+            return (json.dumps({"error": f"Failed to get scrape job: {str(e)}"}), 500, headers)
+        if job is None:
+            return (json.dumps({"error": "Scrape job not found"}), 404, headers)
+        urls_total = job.get('urls_total')
+        result = {
+            "job_id": job_id,
+            **job,
+            "progress": job.get('urls_done', 0) / urls_total if urls_total else None
+        }
+        return (json.dumps(result, default=str), 200, headers)
+
+    try:
+        job_id, job, coalesced, retry_after = enqueue_scrape_job(db)
+    except Exception as e:
+        return (json.dumps({"error": f"Failed to enqueue scrape job: {str(e)}"}), 500, headers)
+    if retry_after:
+        retry_after = math.ceil(retry_after)
+        return (json.dumps({
+            "error": "Too Many Requests",
+            "message": "Price scraping completed recently",
+            "job_id": job_id,
+            "retry_after": retry_after
+        }), 429, {**headers, 'Retry-After': str(retry_after)})
+
+    dispatched = False
+    if not coalesced:
+        try:
+            dispatched = dispatch_worker(job_id)
+        except Exception as e:
+            # 起動に失敗してもジョブは次回の定期実行で処理される
+            print(f"Failed to dispatch scrape worker: {e}")
+
     result = {
-        "message": "Price scraping initiated",
+        "message": "Price scraping already in progress" if coalesced else "Price scraping queued",
+        "job_id": job_id,
+        "status": job.get('status'),
+        "coalesced": coalesced,
+        "worker_dispatched": dispatched,
+        "status_url": f"?job_id={job_id}",
         "timestamp": datetime.now().isoformat()
     }
-    headers = {
-        'Content-Type': 'application/json',
-        'Cache-Control': 'no-store'
-    }
-    return (json.dumps(result, default=str), 200, headers) 
\ No newline at end of file
+    return (json.dumps(result, default=str), 202, headers)
@@ -1,9 +1,15 @@
 import json
 from datetime import datetime
 
+from common.alerts import ALERTS_COLLECTION, validate_alert
+from common.firestore_client import get_firestore_client
+
 
 def set_alert(request):
-    """Cloud Functions用 価格アラート設定エンドポイント"""
+    """Cloud Functions用 価格アラート設定エンドポイント
+
+    リクエストボディ: {"series", "capacity", "threshold", "direction": "above"|"below", "recipient"}
+    """
     # CORS headers for frontend integration
     headers = {
         'Content-Type': 'application/json',
@@ -28,9 +34,22 @@ def set_alert(request):
     except Exception:
         return (json.dumps({"error": "Invalid JSON"}), 400, headers)
 
-    # ここで実際のアラート設定処理を呼び出す（ダミー実装）
+    try:
+        alert = validate_alert(request_data)
+    except ValueError as e:
+        return (json.dumps({"error": str(e)}), 400, headers)
+
+    # (series, capacity) をキーとしてアラートを保存
+    try:
+        doc_ref = get_firestore_client().collection(ALERTS_COLLECTION).document()
+        doc_ref.set(alert)
+    except Exception as e:
+        return (json.dumps({"error": f"Failed to save alert: {str(e)}"}), 500, headers)
+
     result = {
         "message": "Alert set successfully",
+        "alert_id": doc_ref.id,
+        "alert": alert,
         "timestamp": datetime.now().isoformat()
     }
 
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+価格アラート判定エンジンのベンチマークスクリプト
+- 合成したアラート（デフォルト10万件）からインデックスを作成
+- 価格変化ごとの判定時間を、インデックス（二分探索）と全件走査で比較
+- 両者の判定結果が一致することを確認
+
+使用方法: python scripts/benchmark_alert_engine.py [--alerts 100000] [--changes 1000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.alerts import AlertIndex  # noqa: E402
+from common.price_record import model_key  # noqa: E402
+
+SERIES = ["iPhone 17", "iPhone 17 Air", "iPhone 17 Pro", "iPhone 17 Pro Max"]
+CAPACITIES = ["256GB", "512GB", "1TB", "2TB"]
+
+
+def generate_alerts(count, rng):
+    alerts = []
+    for i in range(count):
+        series = rng.choice(SERIES)
+        capacity = rng.choice(CAPACITIES)
+        alerts.append({
+            'id': f'alert{i}',
+            'series': series,
+            'capacity': capacity,
+            'model': model_key(series, capacity),
+            'threshold': rng.randrange(100000, 350000, 100),
+            'direction': rng.choice(('above', 'below')),
+            'recipient': f'user{rng.randrange(count // 10 or 1)}@example.com',
+            # 判定済みのアラート（しきい値を跨いだときだけ発火する）として比較する
+            'last_evaluated_at': '2026-01-01T00:00:00'
+        })
+    return alerts
+
+
+def generate_changes(count, rng):
+    changes = []
+    for _ in range(count):
+        previous_price = rng.randrange(100000, 350000, 100)
+        price = previous_price + rng.randrange(-5000, 5001, 100)
+        changes.append((rng.choice(SERIES), rng.choice(CAPACITIES), price, previous_price))
+    return changes
+
+
+def linear_match(alerts, series, capacity, price, previous_price):
+    """比較用: 全アラートを走査して判定"""
+    model = model_key(series, capacity)
+    matched = []
+    for alert in alerts:
+        if alert['model'] != model:
+            continue
+        threshold = alert['threshold']
+        if alert['direction'] == 'above' and previous_price < threshold <= price:
+            matched.append(alert)
+        elif alert['direction'] == 'below' and price <= threshold < previous_price:
+            matched.append(alert)
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='価格アラート判定エンジンのベンチマーク')
+    parser.add_argument('--alerts', type=int, default=100000, help='合成するアラート数')
+    parser.add_argument('--changes', type=int, default=1000, help='判定する価格変化の数')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    alerts = generate_alerts(args.alerts, rng)
+    changes = generate_changes(args.changes, rng)
+
+    start = time.perf_counter()
+    index = AlertIndex.build(alerts)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    indexed_results = [index.match(*change) for change in changes]
+    indexed_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    linear_results = [linear_match(alerts, *change) for change in changes]
+    linear_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = sum(
+        1 for a, b in zip(indexed_results, linear_results)
+        if sorted(x['id'] for x in a) != sorted(x['id'] for x in b)
+    )
+    triggered = sum(len(r) for r in indexed_results)
+
+    print(f"📊 アラート {args.alerts:,}件 / 価格変化 {args.changes:,}件（発火 {triggered:,}件）")
+    print("=" * 60)
+    print(f"インデックス作成:     {build_ms:10.1f}ms")
+    print(f"インデックス判定:     {indexed_ms:10.1f}ms  ({indexed_ms * 1000 / args.changes:8.1f}µs/変化)")
+    print(f"全件走査判定:         {linear_ms:10.1f}ms  ({linear_ms * 1000 / args.changes:8.1f}µs/変化)")
+    print(f"高速化:               {linear_ms / indexed_ms if indexed_ms else float('inf'):10.1f}x")
+
+    if mismatches:
+        print(f"❌ 判定結果が一致しません: {mismatches}件")
+        sys.exit(1)
+    print("✅ 判定結果は全件走査と一致しました")
+
+
+if __name__ == "__main__":
+    main()
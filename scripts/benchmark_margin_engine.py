@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+購入チャネル別利益計算エンジンのベンチマークスクリプト
+- 合成したカタログ（シリーズ × 容量 × 色）と複数の購入チャネルで利益を計算
+- ベクトル演算（compute_margins）と Python のループでの計算時間を比較
+- 両者の計算結果が一致することを確認
+
+使用方法: python scripts/benchmark_margin_engine.py [--series 60] [--colors 8] [--repeat 200]
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+import numpy as np  # noqa: E402
+
+from common.margins import MarginCatalog, PurchaseChannel, compute_margins  # noqa: E402
+
+CAPACITIES = ["128GB", "256GB", "512GB", "1TB", "2TB"]
+
+CHANNELS = (
+    PurchaseChannel('official', 'Apple公式'),
+    PurchaseChannel('rakuten', '楽天モバイル', point_rate=0.1),
+    PurchaseChannel('docomo', 'ドコモ', discount_amount=22000, point_rate=0.01),
+    PurchaseChannel('au', 'au', discount_rate=0.05, coupon=5000),
+    PurchaseChannel('softbank', 'ソフトバンク', discount_amount=21984, coupon=3000, point_rate=0.005),
+)
+
+
+def generate_catalog(series_count, color_count, rng):
+    """get_prices の集計データと同じ形式の合成データ"""
+    kaitori_data = {}
+    official_data = {}
+    colors = [f"Color {i}" for i in range(color_count)]
+    for s in range(series_count):
+        series = f"iPhone {s}"
+        kaitori_data[series] = {}
+        official_data[series] = {}
+        for c, capacity in enumerate(CAPACITIES):
+            base = 100000 + s * 1000 + c * 30000
+            official_colors = {color: base for color in colors}
+            official_data[series][capacity] = {
+                'colors': official_colors,
+                'stats': {'min': base, 'avg': base, 'max': base}
+            }
+            kaitori_colors = {color: int(base * rng.uniform(0.8, 1.1)) for color in colors}
+            kaitori_data[series][capacity] = {
+                'kaitori_price_max': max(kaitori_colors.values()),
+                'colors': kaitori_colors
+            }
+    return kaitori_data, official_data
+
+
+def loop_margins(kaitori_data, official_data, channels):
+    """比較用: SKUごと・チャネルごとに Python のループで計算"""
+    results = {}
+    for series, capacities in kaitori_data.items():
+        for capacity, info in capacities.items():
+            official_colors = official_data[series][capacity]['colors']
+            for color, kaitori in info['colors'].items():
+                official = official_colors[color]
+                for channel in channels:
+                    paid = official * (1 - channel.discount_rate) - channel.discount_amount - channel.coupon
+                    cost = paid * (1 - channel.point_rate)
+                    results[(channel.name, series, capacity, color)] = kaitori - cost
+    return results
+
+
+def time_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='購入チャネル別利益計算エンジンのベンチマーク')
+    parser.add_argument('--series', type=int, default=60, help='合成するシリーズ数')
+    parser.add_argument('--colors', type=int, default=8, help='容量ごとの色数')
+    parser.add_argument('--repeat', type=int, default=200, help='計測の繰り返し回数')
+    parser.add_argument('--budget-ms', type=float, default=1.0, help='ベクトル演算の中央値の予算（超えると終了コード1）')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    kaitori_data, official_data = generate_catalog(args.series, args.colors, rng)
+
+    start = time.perf_counter()
+    catalog = MarginCatalog.from_prices(kaitori_data, official_data)
+    build_ms = (time.perf_counter() - start) * 1000
+    skus = int(np.count_nonzero(~np.isnan(catalog.kaitori)))
+
+    vector_median, vector_min = time_ms(lambda: compute_margins(catalog, CHANNELS), args.repeat)
+    loop_median, loop_min = time_ms(lambda: loop_margins(kaitori_data, official_data, CHANNELS), max(1, args.repeat // 10))
+
+    # 結果の一致を確認
+    result = compute_margins(catalog, CHANNELS)
+    expected = loop_margins(kaitori_data, official_data, CHANNELS)
+    mismatches = 0
+    for (channel_name, series, capacity, color), margin in expected.items():
+        i = [channel.name for channel in CHANNELS].index(channel_name)
+        value = result.margin[
+            i,
+            catalog.series.index(series),
+            catalog.capacities.index(capacity),
+            catalog.colors.index(color)
+        ]
+        if not math.isclose(value, margin, abs_tol=1e-6):
+            mismatches += 1
+
+    print(f"📊 SKU {skus:,}件 × チャネル {len(CHANNELS)}件（配列 {catalog.shape}）")
+    print("=" * 60)
+    print(f"カタログ配列の作成:   {build_ms:10.3f}ms")
+    print(f"ベクトル演算:         {vector_median:10.3f}ms  (最小 {vector_min:.3f}ms)")
+    print(f"Pythonループ:         {loop_median:10.3f}ms  (最小 {loop_min:.3f}ms)")
+    print(f"高速化:               {loop_median / vector_median if vector_median else float('inf'):10.1f}x")
+
+    if mismatches:
+        print(f"❌ 計算結果が一致しません: {mismatches}件")
+        sys.exit(1)
+    print("✅ 計算結果はPythonループと一致しました")
+    if vector_median > args.budget_ms:
+        print(f"❌ ベクトル演算が予算 {args.budget_ms}ms を超えました")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
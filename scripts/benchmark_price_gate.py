@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+外れ値ゲートのベンチマークスクリプト
+- 合成したSKUの価格系列（ランダムウォーク）にパースミス相当の外れ値を混ぜる
+  （桁の欠落・余分な桁・隣の数字の連結）
+- 1行あたりの判定時間と、外れ値の検出率・正常値の誤検出率を計測
+
+使用方法: python scripts/benchmark_price_gate.py [--skus 200] [--runs 60] [--outlier-rate 0.02]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.price_gate import ACCEPT, PriceGate  # noqa: E402
+
+
+def corrupt(price, rng):
+    """パースミス相当の外れ値"""
+    kind = rng.choice(['drop_digit', 'extra_digit', 'concat', 'shift'])
+    text = str(price)
+    if kind == 'drop_digit':
+        return int(text[:-1])
+    if kind == 'extra_digit':
+        return int(text + str(rng.randint(0, 9)))
+    if kind == 'concat':
+        return int(text[:3] + str(rng.randint(10000, 99999)))
+    return int(price * rng.choice([0.5, 1.6]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='外れ値ゲートのベンチマーク')
+    parser.add_argument('--skus', type=int, default=200, help='SKU数')
+    parser.add_argument('--runs', type=int, default=60, help='スクレイピングの実行回数')
+    parser.add_argument('--outlier-rate', type=float, default=0.02, help='外れ値を混ぜる割合')
+    parser.add_argument('--budget-us', type=float, default=50.0, help='1行あたりの判定時間の予算（超えると終了コード1）')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    prices = {f"iPhone {i}_256GB_黒": rng.randint(60000, 250000) for i in range(args.skus)}
+    gate = PriceGate()
+
+    rows = 0
+    elapsed = 0.0
+    outliers = detected = 0
+    normal = false_positives = 0
+    for _ in range(args.runs):
+        for sku in prices:
+            # 正常な値動き（1回あたり ±1.5%）
+            prices[sku] = int(prices[sku] * rng.uniform(0.985, 1.015))
+            is_outlier = rng.random() < args.outlier_rate
+            price = corrupt(prices[sku], rng) if is_outlier else prices[sku]
+
+            start = time.perf_counter()
+            decision, _ = gate.check(sku, price)
+            elapsed += time.perf_counter() - start
+            rows += 1
+
+            if is_outlier:
+                outliers += 1
+                detected += decision != ACCEPT
+            else:
+                normal += 1
+                false_positives += decision != ACCEPT
+
+    per_row_us = elapsed / rows * 1e6
+    report = gate.report()
+    print(f"📊 SKU {args.skus}件 × {args.runs}回 = {rows:,}行（外れ値 {outliers}件）")
+    print("=" * 60)
+    print(f"1行あたりの判定時間:   {per_row_us:8.2f}µs")
+    print(f"accept / quarantine / reject: {report['accept']} / {report['quarantine']} / {report['reject']}")
+    print(f"外れ値の検出率:       {detected / outliers if outliers else 1:8.1%}")
+    print(f"正常値の誤検出率:     {false_positives / normal if normal else 0:8.2%}")
+
+    if per_row_us > args.budget_us:
+        print(f"❌ 判定時間が予算 {args.budget_us}µs を超えました")
+        sys.exit(1)
+    print("✅ 予算内で判定できました")
+
+
+if __name__ == "__main__":
+    main()
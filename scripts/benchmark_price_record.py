@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+PriceRecord のメモリベンチマークスクリプト
+- 合成した1回分のスクレイピング結果（デフォルト100万行）を
+  従来の dict の行と PriceRecord で保持した場合のメモリ・作成時間を比較
+- 行の文字列（シリーズ・容量・色）はパース結果と同様に行ごとに新しく作成する
+
+使用方法: python scripts/benchmark_price_record.py [--rows 1000000]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.price_record import PriceRecord  # noqa: E402
+
+SERIES = ["iPhone 16", "iPhone 16 Plus", "iPhone 16 Pro", "iPhone 16 Pro Max", "iPhone 16 e"]
+CAPACITIES = ["128GB", "256GB", "512GB", "1TB"]
+COLORS = ["黒", "白", "桃", "緑", "青", "金", "灰"]
+
+
+def parsed_rows(count, seed):
+    """パース結果相当の (series, capacity, color, price)。文字列は行ごとに別オブジェクト"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield (
+            ''.join(rng.choice(SERIES)),
+            ''.join(rng.choice(CAPACITIES)),
+            ''.join(rng.choice(COLORS)),
+            rng.randint(50000, 250000)
+        )
+
+
+def as_dict(series, capacity, color, price):
+    """従来の scrape_url の行"""
+    return {
+        "id": f"{series}_{capacity}",
+        "series": series,
+        "capacity": capacity,
+        "colors": [color],
+        "kaitori_price_min": price,
+        "kaitori_price_max": price
+    }
+
+
+def as_record(series, capacity, color, price):
+    return PriceRecord.create(series, capacity, {color: price}, timestamp=0)
+
+
+def measure(factory, rows, seed):
+    """行をすべて保持したときのメモリ（バイト）と作成時間（秒）"""
+    # 作成時間は tracemalloc のオーバーヘッドを含めずに計測する
+    gc.collect()
+    start = time.perf_counter()
+    kept = [factory(*row) for row in parsed_rows(rows, seed)]
+    elapsed = time.perf_counter() - start
+    del kept
+
+    gc.collect()
+    tracemalloc.start()
+    kept = [factory(*row) for row in parsed_rows(rows, seed)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    gc.collect()
+    return current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PriceRecord のメモリベンチマーク')
+    parser.add_argument('--rows', type=int, default=1000000, help='合成する行数')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    dict_bytes, dict_seconds = measure(as_dict, args.rows, args.seed)
+    record_bytes, record_seconds = measure(as_record, args.rows, args.seed)
+
+    print(f"📊 {args.rows:,}行")
+    print("=" * 60)
+    print(f"dict:         {dict_bytes / 2**20:8.1f}MiB  ({dict_bytes / args.rows:6.1f} B/行)  作成 {dict_seconds:6.2f}s")
+    print(f"PriceRecord:  {record_bytes / 2**20:8.1f}MiB  ({record_bytes / args.rows:6.1f} B/行)  作成 {record_seconds:6.2f}s")
+    print(f"削減率:       {1 - record_bytes / dict_bytes:8.1%}")
+
+    if record_bytes >= dict_bytes:
+        print("❌ PriceRecord のメモリが dict 以上です")
+        sys.exit(1)
+    print("✅ PriceRecord のメモリは dict より小さくなりました")
+
+
+if __name__ == "__main__":
+    main()
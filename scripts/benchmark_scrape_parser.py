@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+スクレイピングの解析処理のベンチマークスクリプト
+- scrape_prices.py --record で保存したHTML（--fixtures DIR）、または
+  買取ルデアのページ構造を模した合成HTMLを kaitori_parser で解析する
+- 全体の行/秒と、段階（dom / select / title / price / record）ごとの時間を計測
+  （段階ごとの時間は各段階だけを同じ入力で繰り返して計測する）
+- --workers を指定すると、scrape_prices.py と同じプロセスプールでページを並列に解析した行/秒も計測
+
+使用方法: python scripts/benchmark_scrape_parser.py [--fixtures DIR] [--pages 40] [--rows-per-page 150] [--repeat 3] [--workers 4]
+"""
+
+import argparse
+import html
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.price_record import PriceRecord  # noqa: E402
+from common.product_catalog import load_product_catalog  # noqa: E402
+from kaitori_parser import (  # noqa: E402
+    build_records,
+    create_parse_pool,
+    extract_rows,
+    normalize_price,
+    parse_document,
+    parse_price_html
+)
+from scrape_fixtures import load_fixtures  # noqa: E402
+
+
+def synthetic_page(catalog, rng, rows):
+    """買取ルデアのページ構造（.tr / .ttl h2 / .td.td2 .td2wrap）を模したHTML"""
+    items = []
+    for _ in range(rows):
+        series = rng.choice(list(catalog.series))
+        capacity = rng.choice(catalog.capacities(series))
+        color = rng.choice(catalog.kaitori_colors)
+        price = rng.randint(60000, 330000)
+        items.append(
+            '<div class="tr">'
+            f'<div class="td td1"><div class="ttl"><h2>{html.escape(series)} {capacity} {color} 新品未開封</h2></div></div>'
+            f'<div class="td td2"><div class="td2wrap"><span>{price:,}</span>円</div></div>'
+            '<div class="td td3"><a href="#">買取申込</a></div>'
+            '</div>'
+        )
+    return (
+        '<html><head><title>買取ルデア</title></head><body>'
+        '<header><nav>' + '<a href="#">メニュー</a>' * 50 + '</nav></header>'
+        f'<div class="table">{"".join(items)}</div>'
+        '<footer>' + '<p>注意事項</p>' * 30 + '</footer></body></html>'
+    )
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='スクレイピングの解析処理のベンチマーク')
+    parser.add_argument('--fixtures', help='scrape_prices.py --record で保存したディレクトリ（省略時は合成HTML）')
+    parser.add_argument('--pages', type=int, default=40, help='合成するページ数')
+    parser.add_argument('--rows-per-page', type=int, default=150, help='合成するページあたりの行数')
+    parser.add_argument('--repeat', type=int, default=3, help='計測の繰り返し回数（最良値を使う）')
+    parser.add_argument('--workers', type=int, default=0, help='プロセスプールのプロセス数（0 の場合は計測しない）')
+    parser.add_argument('--min-rows-per-sec', type=float, default=0, help='全体の行/秒の下限（下回ると終了コード1）')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # 未知のモデル名などの警告は計測の邪魔になるため出さない
+    logging.disable(logging.WARNING)
+
+    catalog = load_product_catalog()
+    if args.fixtures:
+        pages = [page_html for _, page_html in load_fixtures(args.fixtures)]
+        source = f"フィクスチャ {args.fixtures}"
+    else:
+        rng = random.Random(args.seed)
+        pages = [synthetic_page(catalog, rng, args.rows_per_page) for _ in range(args.pages)]
+        source = "合成HTML"
+    total_bytes = sum(len(page_html.encode('utf-8')) for page_html in pages)
+
+    # 全体（scrape_url と同じ処理）
+    total, records = best_of(args.repeat, lambda: [
+        record for page_html in pages for record in build_records(extract_rows(parse_document(page_html)), catalog)
+    ])
+
+    # 段階ごと
+    dom_time, documents = best_of(args.repeat, lambda: [parse_document(page_html) for page_html in pages])
+    select_time, page_rows = best_of(args.repeat, lambda: [extract_rows(document) for document in documents])
+    rows = [row for page in page_rows for row in page]
+    title_time, parsed = best_of(args.repeat, lambda: [catalog.parse_title(title) for title, _ in rows])
+    price_time, prices = best_of(args.repeat, lambda: [normalize_price(price_text) for _, price_text in rows])
+    valid = [
+        (series, capacity, color, price)
+        for (series, capacity, color), price in zip(parsed, prices)
+        if series and capacity and price
+    ]
+    record_time, _ = best_of(args.repeat, lambda: [
+        PriceRecord.create(series, capacity, {color or "不明": price}) for series, capacity, color, price in valid
+    ])
+
+    rows_per_sec = len(rows) / total if total else 0
+    print(f"📊 {source}: {len(pages)}ページ / {len(rows):,}行 / {total_bytes / 1024:,.0f}KiB → {len(records):,}件")
+    print("=" * 60)
+    print(f"全体:      {total * 1000:8.1f}ms  {rows_per_sec:10,.0f}行/秒  {total / len(pages) * 1000:6.2f}ms/ページ")
+    stages = [
+        ('dom', dom_time),
+        ('select', select_time),
+        ('title', title_time),
+        ('price', price_time),
+        ('record', record_time),
+    ]
+    stage_total = sum(elapsed for _, elapsed in stages)
+    for name, elapsed in stages:
+        share = elapsed / stage_total if stage_total else 0
+        per_row_us = elapsed / len(rows) * 1e6 if rows else 0
+        print(f"  {name:<8} {elapsed * 1000:8.1f}ms  {per_row_us:8.2f}µs/行  {share:6.1%}")
+
+    if args.workers:
+        with create_parse_pool(args.workers) as pool:
+            # プロセスの起動とカタログの読み込みは計測に含めない
+            list(pool.map(parse_price_html, pages[:args.workers]))
+            pool_time, _ = best_of(args.repeat, lambda: list(pool.map(parse_price_html, pages)))
+        pool_rows_per_sec = len(rows) / pool_time if pool_time else 0
+        print(
+            f"プロセスプール（{args.workers}）: {pool_time * 1000:8.1f}ms  {pool_rows_per_sec:10,.0f}行/秒"
+            f"  {pool_rows_per_sec / rows_per_sec if rows_per_sec else 0:5.2f}x"
+        )
+
+    if args.min_rows_per_sec and rows_per_sec < args.min_rows_per_sec:
+        print(f"❌ 行/秒が下限を下回りました: {rows_per_sec:,.0f} < {args.min_rows_per_sec:,.0f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+商品名パーサーのベンチマークスクリプト
+- 買取サイトの表記揺れ（空白の有無・大文字小文字・語順・未知のモデル）を含む商品名を合成する
+- シリーズごとの正規表現を順に試す従来の方法と、製品カタログの1つの正規表現（語のトライ）で
+  1回だけ走査する方法の1件あたりの時間を比べ、結果が一致することを確認する
+
+使用方法: python scripts/benchmark_title_parser.py [--titles 5000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.product_catalog import load_product_catalog  # noqa: E402
+
+UNKNOWN_MODELS = ["iPhone 15", "iPhone 15 Pro", "iPhone SE", "iPad Pro 11"]
+NOISE = ["新品未開封", "SIMフリー", "国内版", "eSIM", "Apple", "【買取】"]
+
+
+def legacy_parser(catalog):
+    """シリーズごとの正規表現を順に re.search で試し、容量・色はそれぞれ別に検索する（従来の scrape_prices.py の方法）"""
+    ordered = sorted(catalog.series, key=lambda name: (len(name.split()), len(name)), reverse=True)
+    patterns = {}
+    for name in ordered:
+        tokens = name.split()
+        guard = r'(?!\d)' if tokens[-1][-1].isdigit() else r'(?![A-Za-z])'
+        patterns[name] = r'\s*'.join(re.escape(token) for token in tokens) + guard
+    colors = '|'.join(re.escape(color) for color in catalog.kaitori_colors)
+
+    def parse(title):
+        series = None
+        for name, pattern in patterns.items():
+            if re.search(pattern, title, re.IGNORECASE):
+                series = name
+                break
+        capacity_match = re.search(r'(\d+)\s*([GT]B)', title, re.IGNORECASE)
+        color_match = re.search(f'({colors})', title)
+        capacity = f"{capacity_match.group(1)}{capacity_match.group(2).upper()}" if capacity_match else None
+        return series, capacity, color_match.group(1) if color_match else None
+
+    return parse
+
+
+def make_title(catalog, rng):
+    if rng.random() < 0.05:
+        series = rng.choice(UNKNOWN_MODELS)
+        capacity = rng.choice(["128GB", "256GB"])
+    else:
+        series = rng.choice(list(catalog.series))
+        capacity = rng.choice(catalog.capacities(series))
+    name = series.replace(' ', rng.choice([' ', '', ' ']))
+    if rng.random() < 0.2:
+        name = name.lower()
+    capacity = capacity.replace('GB', rng.choice(['GB', ' GB', 'gb'])).replace('TB', rng.choice(['TB', ' TB']))
+    parts = [name, capacity]
+    if rng.random() < 0.9:
+        parts.append(rng.choice(catalog.kaitori_colors))
+    if rng.random() < 0.5:
+        parts.insert(rng.randint(0, len(parts)), rng.choice(NOISE))
+    return ' '.join(parts)
+
+
+def measure(parse, titles, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for title in titles:
+            parse(title)
+        best = min(best, time.perf_counter() - start)
+    return best / len(titles) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='商品名パーサーのベンチマーク')
+    parser.add_argument('--titles', type=int, default=5000, help='商品名の件数')
+    parser.add_argument('--repeat', type=int, default=5, help='計測の繰り返し回数（最良値を使う）')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = load_product_catalog()
+    titles = [make_title(catalog, rng) for _ in range(args.titles)]
+    legacy = legacy_parser(catalog)
+
+    mismatches = [title for title in titles if legacy(title) != catalog.parse_title(title)]
+    identified = sum(catalog.parse_title(title)[0] is not None for title in titles)
+
+    legacy_us = measure(legacy, titles, args.repeat)
+    catalog_us = measure(catalog.parse_title, titles, args.repeat)
+
+    print(f"📊 商品名 {len(titles):,}件（シリーズ {len(catalog.series)}件、特定できた商品名 {identified:,}件）")
+    print("=" * 60)
+    print(f"従来（シリーズごとに re.search）:{legacy_us:8.2f}µs / 件")
+    print(f"カタログ（1回の走査）:         {catalog_us:8.2f}µs / 件")
+    print(f"高速化:                       {legacy_us / catalog_us:8.2f}x")
+
+    if mismatches:
+        print(f"❌ 結果が一致しない商品名: {len(mismatches)}件（例: {mismatches[0]!r}）")
+        sys.exit(1)
+    print("✅ 全件で結果が一致しました")
+
+
+if __name__ == "__main__":
+    main()
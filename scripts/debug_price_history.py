@@ -4,10 +4,16 @@
 """
 
 import json
+import os
+import sys
 
 from google.cloud import firestore
 from google.oauth2 import service_account
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.catalog import expand_history_doc, load_catalog  # noqa: E402
+
 
 def debug_price_history():
     credentials = service_account.Credentials.from_service_account_file('key.json')
@@ -26,16 +32,16 @@ def debug_price_history():
         print(f"  Data: {json.dumps(data, indent=2, ensure_ascii=False)}")
         print()
     
-    # 特定のシリーズと容量の履歴を取得
+    # 特定のシリーズと容量の履歴を取得（履歴はカタログIDで保存されている）
+    catalog = load_catalog(db)
     query = (
         db.collection('price_history')
-        .filter('series', '==', 'iPhone 16 Pro')
-        .filter('capacity', '==', '1TB')
+        .filter('model_id', '==', catalog.model_id('iPhone 16 Pro', '1TB'))
     )
     
     docs = query.stream()
     for doc in docs:
-        data = doc.to_dict()
+        data = expand_history_doc(doc.to_dict(), catalog)
         print(f"iPhone 16 Pro 1TB:")
         print(f"  Data: {json.dumps(data, indent=2, ensure_ascii=False)}")
         print()
@@ -23,8 +23,9 @@ echo "リージョン: $REGION"
 echo "ランタイム: $RUNTIME"
 echo ""
 
-# 関数一覧
+# 関数一覧（router は全ハンドラーをパスで振り分ける統合エントリーポイント）
 FUNCTIONS=(
+    "router"
     "get_prices"
     "get_price_history"
     "api_prices"
@@ -33,6 +34,9 @@ FUNCTIONS=(
     "scrape_prices"
     "set_alert"
     "check_prices"
+    "get_rankings"
+    "get_price_stats"
+    "get_catalog"
 )
 
 # 各関数をデプロイ
@@ -48,18 +52,12 @@ if ! gcloud auth list --filter=status:ACTIVE --format="value(account)" | grep -q
     exit 1
 fi
 
-# 各関数をデプロイ
+# 各関数をデプロイ（全関数 functions/ をソースとし、functions/main.py のエントリーポイントを使用）
 for func in "${FUNCTIONS[@]}"; do
     echo "📦 $func をデプロイ中..."
 
-    if [ ! -d "functions/$func" ]; then
-        echo "❌ Function directory functions/$func not found"
-        continue
-    fi
-
-    cd "functions/$func"
-
     if gcloud functions deploy "$func" \
+        --source functions \
         --runtime "$RUNTIME" \
         --trigger-http \
         --allow-unauthenticated \
@@ -72,8 +70,6 @@ for func in "${FUNCTIONS[@]}"; do
     fi
 
     echo ""
-
-    cd ../..
 done
 
 echo "🎉 全Cloud Functionsのデプロイが完了しました！"
@@ -0,0 +1,133 @@
+"""
+買取ルデアのページHTMLの解析
+- PriceScraper.scrape_url（ライブ）とフィクスチャの再生（scrape_prices.py --replay）、
+  ベンチマーク（benchmark_scrape_parser.py）で同じ解析処理を使う
+- ブラウザには依存せず、取得済みのHTML文字列だけを lxml で解析する
+
+解析の段階:
+1. dom: HTML文字列をパース
+2. select: 価格行（.tr）ごとに商品名（.ttl h2）と価格（.td.td2 .td2wrap）のテキストを取り出す
+3. build: 商品名からシリーズ・容量・色、価格テキストから価格を取り出して PriceRecord にする
+
+解析はCPUを使うため、scrape_prices.py ではブラウザのイベントループとは別に
+create_parse_pool のプロセスプールで parse_price_html を実行する。
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from lxml import etree
+from lxml import html as lxml_html
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.price_record import PriceRecord, normalize_capacity  # noqa: E402
+from common.product_catalog import load_product_catalog  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+_PRICE_PATTERN = re.compile(r'(\d+(?:,\d+)*)')
+
+
+def _has_class(name: str) -> str:
+    """XPath で class 属性に name を含む要素の条件（CSS の .name 相当）"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# 価格行（CSSセレクター .tr）のXPath（事前にコンパイルしておく）
+ROW_XPATH = etree.XPath(f"//*[{_has_class('tr')}]")
+
+
+def _classes(element):
+    value = element.get('class')
+    return value.split() if value else ()
+
+
+def normalize_price(price: str) -> Optional[int]:
+    """価格テキスト（"123,456円" など）を整数にする"""
+    match = _PRICE_PATTERN.search(price)
+    if not match:
+        return None
+    return int(match.group(1).replace(',', ''))
+
+
+def parse_document(page_html: str):
+    """dom: HTML文字列をパースする"""
+    return lxml_html.fromstring(page_html)
+
+
+def extract_rows(document) -> List[Tuple[str, str]]:
+    """select: 価格行ごとの (商品名, 価格テキスト)。どちらかがない行は除く
+
+    商品名は .ttl h2、価格は .td.td2 .td2wrap の最初の要素のテキスト。
+    行ごとに相対XPathを評価するより速いため、行の中の要素を1回たどって探す。
+    """
+    rows = []
+    for row in ROW_XPATH(document):
+        title = price_text = None
+        for element in row.iter():
+            classes = _classes(element)
+            if not classes:
+                continue
+            if title is None and 'ttl' in classes:
+                heading = element.find('.//h2')
+                if heading is not None:
+                    title = heading.text_content().strip()
+            elif price_text is None and 'td' in classes and 'td2' in classes:
+                wrap = next((child for child in element.iter() if 'td2wrap' in _classes(child)), None)
+                if wrap is not None:
+                    price_text = wrap.text_content().strip()
+            if title is not None and price_text is not None:
+                break
+        if title and price_text:
+            rows.append((title, price_text))
+    return rows
+
+
+def build_records(rows: List[Tuple[str, str]], product_catalog=None) -> List[PriceRecord]:
+    """build: (商品名, 価格テキスト) から PriceRecord を作る（シリーズ・容量・価格が取れない行、カタログにない容量の行は除く）"""
+    product_catalog = product_catalog or load_product_catalog()
+    records = []
+    for title, price_text in rows:
+        series, capacity, color = product_catalog.parse_title(title)
+        if not series:
+            logger.warning(f"未知のモデル名: {title}")
+            continue
+        if not capacity:
+            logger.warning(f"容量が見つかりません: {title}")
+            continue
+        valid_capacities = product_catalog.capacities(series)
+        if normalize_capacity(capacity) not in valid_capacities:
+            logger.warning(f"無効な容量の組み合わせ: {series} {capacity} (有効な容量: {valid_capacities})")
+            continue
+        price = normalize_price(price_text)
+        if not price:
+            logger.warning(f"無効な価格: {price_text}")
+            continue
+        records.append(PriceRecord.create(series, capacity, {color or "不明": price}))
+    return records
+
+
+def parse_price_html(page_html: str, product_catalog=None) -> List[PriceRecord]:
+    """1ページ分のHTMLから価格データを取り出す"""
+    if not page_html or not page_html.strip():
+        return []
+    return build_records(extract_rows(parse_document(page_html)), product_catalog)
+
+
+def create_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """parse_price_html 用のプロセスプール
+
+    ブラウザ（Playwright）のスレッドを引き継がないよう spawn で起動し、
+    各プロセスで製品カタログ（正規表現のコンパイル）を最初に1回だけ読み込む。
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=load_product_catalog
+    )
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Cloud Functions 負荷試験スクリプト
+- エンドポイントごとに指定した並列数でリクエストを送信
+- レイテンシの p50/p95/p99、スループット、ステータスコードの内訳を集計
+- ローカルハーネス（scripts/local_functions_harness.py）に対しては
+  /__stats の差分から1リクエストあたりのFirestore読み取り数も集計
+
+使用方法:
+  python scripts/load_test_functions.py --local                 # ハーネスを内部で起動して試験
+  python scripts/load_test_functions.py --base-url http://127.0.0.1:8080 -c 32 -n 500
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# 試験対象のエンドポイント (名前, パス)
+DEFAULT_ENDPOINTS = [
+    ('health', '/health'),
+    ('api_status', '/api_status'),
+    ('get_prices', '/get_prices'),
+    ('get_prices_series', '/get_prices?series=iPhone%2017'),
+    ('api_prices', '/api_prices'),
+    ('get_price_history', '/get_price_history?series=iPhone%2017&capacity=256GB&days=14'),
+    ('get_price_history_batch', '/get_price_history?models=iPhone%2017:256GB,iPhone%2017%20Pro:512GB&days=14'),
+    ('get_price_stats', '/get_price_stats?series=iPhone%2017'),
+    ('get_catalog', '/get_catalog'),
+]
+
+
+def percentile(sorted_values, percent):
+    """ソート済みの値から最近傍順位法でパーセンタイルを求める"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def get_reads(session, base_url):
+    """ハーネスの読み取り数（ハーネス以外の場合は None）"""
+    try:
+        response = session.get(f"{base_url}/__stats", timeout=5)
+        return response.json()['reads'] if response.ok else None
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+
+def run_endpoint(base_url, path, total, concurrency, timeout):
+    """1つのエンドポイントに total 件のリクエストを concurrency 並列で送信する"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    def request_once(_):
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{path}", timeout=timeout)
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        return (time.perf_counter() - start) * 1000, status
+
+    reads_before = get_reads(session, base_url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request_once, range(total)))
+    elapsed = time.perf_counter() - start
+    reads_after = get_reads(session, base_url)
+
+    latencies = sorted(latency for latency, _ in results)
+    reads = reads_after - reads_before if reads_before is not None and reads_after is not None else None
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'statuses': dict(Counter(str(status) for _, status in results)),
+        'throughput_rps': total / elapsed if elapsed > 0 else None,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1] if latencies else None,
+        'firestore_reads': reads,
+        'reads_per_request': reads / total if reads is not None else None,
+    }
+
+
+def format_ms(value):
+    return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cloud Functions のエンドポイントに並列でリクエストを送信して計測')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--base-url', default='http://127.0.0.1:8080', help='試験対象のベースURL')
+    target.add_argument('--local', action='store_true', help='ローカルハーネスを内部で起動して試験する')
+    parser.add_argument('-n', '--requests', type=int, default=200, help='エンドポイントごとのリクエスト数')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='並列数')
+    parser.add_argument('--timeout', type=float, default=30, help='1リクエストのタイムアウト秒数')
+    parser.add_argument('--endpoint', action='append', help='試験するエンドポイント名（複数指定可、省略時は全て）')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+    args = parser.parse_args()
+
+    endpoints = DEFAULT_ENDPOINTS
+    if args.endpoint:
+        unknown = set(args.endpoint) - {name for name, _ in DEFAULT_ENDPOINTS}
+        if unknown:
+            parser.error(f"unknown endpoint: {', '.join(sorted(unknown))}")
+        endpoints = [(name, path) for name, path in DEFAULT_ENDPOINTS if name in args.endpoint]
+
+    base_url = args.base_url
+    server = None
+    if args.local:
+        from local_functions_harness import serve_in_background
+        server, base_url = serve_in_background()
+
+    try:
+        results = {}
+        for name, path in endpoints:
+            if not args.json:
+                print(f"⏱️  {name}: {args.requests} requests x {args.concurrency} concurrent", file=sys.stderr)
+            results[name] = run_endpoint(base_url, path, args.requests, args.concurrency, args.timeout)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.json:
+        print(json.dumps({'base_url': base_url, 'endpoints': results}, indent=2))
+        return
+
+    print(f"\n📊 {base_url}")
+    print(f"{'endpoint':<26}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'reads/req':>11}  statuses")
+    for name, result in results.items():
+        reads = f"{result['reads_per_request']:11.2f}" if result['reads_per_request'] is not None else f"{'-':>11}"
+        print(
+            f"{name:<26}{result['throughput_rps']:9.1f}"
+            f"{format_ms(result['p50_ms'])}{format_ms(result['p95_ms'])}{format_ms(result['p99_ms'])}"
+            f"{reads}  {result['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
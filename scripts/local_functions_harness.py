@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Cloud Functions ローカル実行ハーネス
+- functions/ の全ハンドラーを router 経由で1つのWSGIアプリにマウント
+- Firestoreの代わりにインメモリのストアを使用し、合成データを投入
+- /__stats で読み取りドキュメント数を確認、/__reset でカウンターをリセット
+
+本番のFirestoreや認証情報なしで、エンドポイントの動作確認や負荷試験
+（scripts/load_test_functions.py）を行うためのもの。
+
+使用方法: python scripts/local_functions_harness.py [--port 8080] [--days 14]
+"""
+
+import argparse
+import copy
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions')
+
+# 合成データのモデル構成
+SYNTHETIC_CATALOG = {
+    "iPhone 17": ["256GB", "512GB"],
+    "iPhone 17 Air": ["256GB", "512GB", "1TB"],
+    "iPhone 17 Pro": ["256GB", "512GB", "1TB"],
+    "iPhone 17 Pro Max": ["256GB", "512GB", "1TB", "2TB"],
+    "iPhone 16": ["128GB", "256GB", "512GB"],
+    "iPhone 16 Pro": ["128GB", "256GB", "512GB", "1TB"],
+}
+SYNTHETIC_COLORS = ["ブラック", "ホワイト", "ブルー", "シルバー"]
+CAPACITY_PRICE_STEP = {"128GB": 0, "256GB": 15000, "512GB": 45000, "1TB": 75000, "2TB": 110000}
+
+
+# ===== インメモリFirestore =====
+
+class InMemorySnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field) if self._data is not None else None
+
+
+class InMemoryDocument:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self, transaction=None, **kwargs):
+        with self._client._lock:
+            data = self._client._docs(self._collection).get(self.id)
+            self._client.reads += 1
+            return InMemorySnapshot(self, copy.deepcopy(data))
+
+    def set(self, data, merge=False):
+        with self._client._lock:
+            docs = self._client._docs(self._collection)
+            if merge and self.id in docs:
+                docs[self.id].update(copy.deepcopy(data))
+            else:
+                docs[self.id] = copy.deepcopy(data)
+            self._client.writes += 1
+
+    def update(self, data):
+        with self._client._lock:
+            docs = self._client._docs(self._collection)
+            if self.id not in docs:
+                raise KeyError(f"No document to update: {self.path}")
+            docs[self.id].update(copy.deepcopy(data))
+            self._client.writes += 1
+
+    def delete(self):
+        with self._client._lock:
+            self._client._docs(self._collection).pop(self.id, None)
+            self._client.writes += 1
+
+    def collection(self, name):
+        return InMemoryQuery(self._client, f"{self.path}/{name}")
+
+
+def _matches(value, op, expected):
+    if op == '==':
+        return value == expected
+    if op == '!=':
+        return value != expected
+    if op == 'in':
+        return value in expected
+    if op == 'array_contains':
+        return isinstance(value, list) and expected in value
+    if value is None:
+        return False
+    return {
+        '<': lambda: value < expected,
+        '<=': lambda: value <= expected,
+        '>': lambda: value > expected,
+        '>=': lambda: value >= expected,
+    }[op]()
+
+
+class InMemoryQuery:
+    """コレクション参照とクエリ（where / order_by / limit / start_after）"""
+
+    def __init__(self, client, collection, filters=(), orders=(), limit=None, cursor=None):
+        self._client = client
+        self._collection = collection
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        params = {
+            'filters': self._filters, 'orders': self._orders,
+            'limit': self._limit, 'cursor': self._cursor
+        }
+        params.update(changes)
+        return InMemoryQuery(self._client, self._collection, **params)
+
+    def document(self, doc_id=None):
+        return InMemoryDocument(self._client, self._collection, doc_id or self._client._new_id())
+
+    def where(self, field=None, op=None, value=None, filter=None):
+        if filter is not None:
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction='ASCENDING'):
+        return self._copy(orders=self._orders + [(field, direction)])
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, values):
+        return self._copy(cursor=values)
+
+    def _sort_key(self, doc_id, data):
+        key = []
+        for field, _ in self._orders:
+            key.append(doc_id if field == '__name__' else data.get(field))
+        return key
+
+    def _cursor_key(self):
+        key = []
+        for field, _ in self._orders:
+            value = self._cursor.get(field)
+            key.append(value.id if field == '__name__' and hasattr(value, 'id') else value)
+        return key
+
+    def stream(self, transaction=None, **kwargs):
+        with self._client._lock:
+            items = [
+                (doc_id, copy.deepcopy(data))
+                for doc_id, data in self._client._docs(self._collection).items()
+                if all(_matches(data.get(f), op, v) for f, op, v in self._filters)
+            ]
+            # Firestoreと同様に指定フィールド順、その後ドキュメントID順
+            items.sort(key=lambda item: item[0])
+            for field, direction in reversed(self._orders):
+                items.sort(
+                    key=lambda item: item[0] if field == '__name__' else item[1].get(field),
+                    reverse=direction == 'DESCENDING'
+                )
+            if self._cursor is not None:
+                cursor = self._cursor_key()
+                items = [item for item in items if self._sort_key(*item) > cursor]
+            if self._limit is not None:
+                items = items[:self._limit]
+            # 結果が0件のクエリも1回分の読み取りとして課金される
+            self._client.reads += max(1, len(items))
+        for doc_id, data in items:
+            yield InMemorySnapshot(InMemoryDocument(self._client, self._collection, doc_id), data)
+
+    def get(self, transaction=None, **kwargs):
+        return list(self.stream())
+
+
+class InMemoryBatch:
+    def __init__(self, client):
+        self._client = client
+        self._operations = []
+
+    def set(self, reference, data, merge=False):
+        self._operations.append(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference, data):
+        self._operations.append(lambda: reference.update(data))
+
+    def delete(self, reference):
+        self._operations.append(reference.delete)
+
+    def commit(self):
+        with self._client._lock:
+            for operation in self._operations:
+                operation()
+        self._operations = []
+
+
+class InMemoryTransaction(InMemoryBatch):
+    """インメモリのトランザクション（書き込みは関数が正常に終わったときにまとめて反映する）
+
+    google.cloud.firestore.transactional の内部APIには依存せず、install_fake_transactional で
+    差し替えた transactional から実行する。
+    """
+
+
+_original_transactional = None
+
+
+def _fake_transactional(to_wrap):
+    """google.cloud.firestore.transactional の代わり
+
+    InMemoryTransaction の場合はストア全体をロックして1回だけ実行し（同時実行は直列化される）、
+    例外が出た場合は書き込みを反映しない。それ以外のトランザクションは元の transactional で実行する。
+    """
+    original = _original_transactional(to_wrap)
+
+    def wrapper(transaction, *args, **kwargs):
+        if not isinstance(transaction, InMemoryTransaction):
+            return original(transaction, *args, **kwargs)
+        with transaction._client._lock:
+            try:
+                result = to_wrap(transaction, *args, **kwargs)
+            except Exception:
+                transaction._operations = []
+                raise
+            transaction.commit()
+        return result
+
+    return wrapper
+
+
+def install_fake_transactional():
+    """google.cloud.firestore.transactional をインメモリのトランザクション対応のものに差し替える
+
+    ハンドラーは呼び出し時に firestore.transactional を参照するため、最初のリクエストより前に呼び出す。
+    """
+    global _original_transactional
+    from google.cloud import firestore
+
+    if _original_transactional is None:
+        _original_transactional = firestore.transactional
+        firestore.transactional = _fake_transactional
+
+
+class InMemoryFirestore:
+    """ハンドラーが使う範囲の google.cloud.firestore.Client 互換のインメモリストア"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._ids = itertools.count(1)
+        self.reads = 0
+        self.writes = 0
+
+    def _docs(self, collection):
+        return self._collections.setdefault(collection, {})
+
+    def _new_id(self):
+        return f"local{next(self._ids):012d}"
+
+    def collection(self, name):
+        return InMemoryQuery(self, name)
+
+    def batch(self):
+        return InMemoryBatch(self)
+
+    def transaction(self, **kwargs):
+        return InMemoryTransaction(self)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'reads': self.reads,
+                'writes': self.writes,
+                'documents': {name: len(docs) for name, docs in self._collections.items()}
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.reads = 0
+            self.writes = 0
+
+
+# ===== 合成データ =====
+
+def seed_synthetic_data(db, days=14, runs_per_day=2, seed=0):
+    """公式価格・買取価格・価格履歴・アラートの合成データを投入する"""
+    if FUNCTIONS_DIR not in sys.path:
+        sys.path.insert(0, FUNCTIONS_DIR)
+    from common.catalog import register_catalog
+    from common.history_stats import record_history_point
+    from common.official_prices import with_price_stats
+    from common.price_record import PriceRecord, history_doc_id
+    from common.rankings import refresh_margin_ranking
+
+    install_fake_transactional()
+    rng = random.Random(seed)
+    now = datetime.now()
+    # 全モデル・全色のカタログIDを先に割り当てる
+    catalog = register_catalog(db, [
+        PriceRecord.create(series, capacity, {color: 1 for color in SYNTHETIC_COLORS})
+        for series, capacities in SYNTHETIC_CATALOG.items()
+        for capacity in capacities
+    ])
+    for index, (series, capacities) in enumerate(SYNTHETIC_CATALOG.items()):
+        base_price = 120000 + index * 20000
+        official = {}
+        for capacity in capacities:
+            price = base_price + CAPACITY_PRICE_STEP[capacity]
+            official[capacity] = {'colors': {color: price for color in SYNTHETIC_COLORS}}
+            kaitori = int(price * rng.uniform(0.85, 1.05))
+
+            # 価格履歴（古い順にランダムウォーク）
+            for step in range(days * runs_per_day, -1, -1):
+                at = now - timedelta(hours=step * 24 / runs_per_day)
+                kaitori = max(10000, kaitori + rng.randint(-1500, 1500))
+                colors = {color: kaitori - rng.randint(0, 3000) for color in SYNTHETIC_COLORS}
+                record = PriceRecord.create(series, capacity, colors, timestamp=at.timestamp(), source='synthetic')
+                history = record.to_history_doc(catalog)
+                db.collection('price_history').document(history_doc_id(history)).set(history)
+                record_history_point(db, series, capacity, record.timestamp, record.kaitori_price_max)
+
+            db.collection('kaitori_prices').document().set(record.to_kaitori_doc())
+            db.collection('price_alerts').document().set({
+                'series': series,
+                'capacity': capacity,
+                'model': f"{series}_{capacity}",
+                'threshold': kaitori + rng.randint(-5000, 5000),
+                'direction': rng.choice(['above', 'below']),
+                'recipient': f"user{index}@example.com",
+                'active': True,
+                'created_at': now.isoformat()
+            })
+        db.collection('official_prices').document(series).set({'price': with_price_stats(official)})
+    # get_rankings が返す利益ランキング（本番では check_prices が作り直す）
+    refresh_margin_ranking(db)
+    db.reset_stats()
+    return db
+
+
+# ===== WSGIアプリ =====
+
+def create_app(db=None, days=14):
+    """全ハンドラーをマウントしたFlaskアプリを作成する"""
+    # 負荷試験では全リクエストが同じIPから来るため、明示的な指定がなければレート制限を緩める
+    os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '1000000')
+    os.environ.setdefault('RATE_LIMIT_BURST', '1000000')
+    if FUNCTIONS_DIR not in sys.path:
+        sys.path.insert(0, FUNCTIONS_DIR)
+
+    import flask
+    import common.firestore_client as firestore_client
+    import main as functions_main
+
+    install_fake_transactional()
+    db = db or seed_synthetic_data(InMemoryFirestore(), days=days)
+    firestore_client._client = db
+
+    app = flask.Flask('local_functions_harness')
+    app.config['FIRESTORE'] = db
+
+    @app.route('/__stats', methods=['GET'])
+    def stats():
+        return flask.jsonify(db.stats())
+
+    @app.route('/__reset', methods=['POST'])
+    def reset():
+        db.reset_stats()
+        return flask.jsonify(db.stats())
+
+    @app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+    @app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+    def dispatch(path):
+        return flask.make_response(functions_main.router(flask.request))
+
+    return app
+
+
+def serve_in_background(host='127.0.0.1', port=0, days=14):
+    """別スレッドでハーネスを起動し、(サーバー, ベースURL) を返す"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        # 負荷試験中のアクセスログは出力しない
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(host, port, create_app(days=days), threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, name='local-functions-harness', daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cloud Functions をインメモリFirestoreでローカル実行')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--days', type=int, default=14, help='合成する価格履歴の日数')
+    args = parser.parse_args()
+
+    from werkzeug.serving import run_simple
+
+    start = time.perf_counter()
+    app = create_app(days=args.days)
+    print(f"🧪 合成データを投入しました ({(time.perf_counter() - start) * 1000:.0f}ms): {app.config['FIRESTORE'].stats()['documents']}")
+    print(f"🚀 http://{args.host}:{args.port}/<endpoint> で起動します（読み取り数: /__stats）")
+    run_simple(args.host, args.port, app, threaded=True, use_reloader=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+price_history のカタログID移行スクリプト
+- 名前（series / capacity / 色名）で保存された price_history を、
+  カタログID（model_id・色ID）で保存する形式にドキュメントIDはそのままで書き換える
+- 既に model_id を持つドキュメントは対象外（何度実行してもよい）
+- 移行しなくても get_price_history は古い形式を読めるが、model_id での検索には含まれない
+
+使用方法: python scripts/migrate_price_history_ids.py [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from google.cloud import firestore
+from google.oauth2 import service_account
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.catalog import load_catalog, register_catalog  # noqa: E402
+from common.price_record import PriceRecord  # noqa: E402
+
+# Firestoreのバッチ書き込みの上限
+MAX_BATCH_WRITES = 500
+
+
+def _json_size(data):
+    return len(json.dumps(data, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def migrate_price_history(db, dry_run=False):
+    legacy = []
+    for doc in db.collection('price_history').stream():
+        data = doc.to_dict()
+        if 'model_id' in data:
+            continue
+        record = PriceRecord.from_firestore(data)
+        if record is None:
+            print(f"⚠️ series / capacity がないためスキップ: {doc.id}")
+            continue
+        legacy.append((doc.reference, data, record))
+    print(f"📥 移行対象の price_history: {len(legacy)}件")
+    if not legacy:
+        return 0
+
+    records = [record for _, _, record in legacy]
+    if dry_run:
+        # カタログは保存せず、割り当て結果だけを確認する
+        catalog = load_catalog(db)
+        for record in records:
+            catalog.assign('series', record.series)
+            catalog.assign('capacities', record.capacity)
+            for color, _ in record.colors:
+                catalog.assign('colors', color)
+    else:
+        catalog = register_catalog(db, records)
+
+    before = 0
+    after = 0
+    batch = db.batch()
+    pending = 0
+    for ref, data, record in legacy:
+        document = record.to_history_doc(catalog)
+        if data.get('expiration_time') is not None:
+            # TTL は元のドキュメントのまま
+            document['expiration_time'] = data['expiration_time']
+        before += _json_size(data)
+        after += _json_size(document)
+        if dry_run:
+            continue
+        batch.set(ref, document)
+        pending += 1
+        if pending >= MAX_BATCH_WRITES:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+    saved = before - after
+    print(f"📦 JSONサイズ: {before:,} → {after:,} bytes（{saved:,} bytes / {saved / before:.1%} 削減）")
+    action = "確認のみ（書き込みなし）" if dry_run else "移行しました"
+    print(f"✅ {len(legacy)}件を{action}（カタログ version {catalog.version}）")
+    return len(legacy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='price_history をカタログIDで保存する形式に移行する')
+    parser.add_argument('--dry-run', action='store_true', help='書き込まずに対象件数とサイズの削減量を表示する')
+    args = parser.parse_args()
+
+    credentials = service_account.Credentials.from_service_account_file('key.json')
+    db = firestore.Client(credentials=credentials)
+    migrate_price_history(db, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,19 @@
 
 import json
 import logging
+import os
+import sys
 from datetime import datetime, timedelta
 
 from google.cloud import firestore
 from google.oauth2 import service_account
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.catalog import load_catalog, register_catalog  # noqa: E402
+from common.history_stats import record_history_point  # noqa: E402
+from common.price_record import PriceRecord, history_doc_id  # noqa: E402
+
 # ログ設定
 logging.basicConfig(
     level=logging.INFO,
@@ -25,42 +33,30 @@ class PriceHistoryManager:
         credentials = service_account.Credentials.from_service_account_file('key.json')
         self.db = firestore.Client(credentials=credentials)
         
-    def save_price_history(self, series, capacity, kaitori_price_min, kaitori_price_max, colors):
+    def save_price_history(self, record, catalog=None):
         """
         価格履歴を保存
         
         Args:
-            series: iPhoneシリーズ名
-            capacity: 容量
-            kaitori_price_min: 最小買取価格
-            kaitori_price_max: 最大買取価格
-            colors: 色別価格
+            record: 保存する買取価格（PriceRecord。timestamp が履歴の時刻になる）
+            catalog: record の名前を登録済みのカタログ（省略時はここで登録する）
         """
         try:
-            # 現在のタイムスタンプ
-            current_timestamp = int(datetime.now().timestamp())
-            
-            # 2週間後の削除予定日
-            expiration_time = int((datetime.now() + timedelta(days=14)).timestamp())
-            
-            # 履歴データを作成
-            history_data = {
-                'series': series,
-                'capacity': capacity,
-                'kaitori_price_min': kaitori_price_min,
-                'kaitori_price_max': kaitori_price_max,
-                'colors': colors,
-                'timestamp': current_timestamp,
-                'date': datetime.now().strftime('%Y-%m-%d'),
-                'expiration_time': expiration_time,
-                'source': 'kaitori-rudea'
-            }
-            
-            # Firestoreに保存
-            doc_ref = self.db.collection('price_history').document()
-            doc_ref.set(history_data)
+            if catalog is None:
+                catalog = register_catalog(self.db, [record])
+
+            # Firestoreに保存（シリーズ・容量・色はカタログIDで保存。IDはスクレイピングと同じ形式）
+            history_data = record.to_history_doc(catalog)
+            self.db.collection('price_history').document(history_doc_id(history_data)).set(history_data)
             
-            logger.info(f"Saved price history: {series} {capacity} - min: {kaitori_price_min}, max: {kaitori_price_max}")
+            logger.info(f"Saved price history: {record.series} {record.capacity} - min: {record.kaitori_price_min}, max: {record.kaitori_price_max}")
+
+            try:
+                record_history_point(
+                    self.db, record.series, record.capacity, record.timestamp, record.kaitori_price_max
+                )
+            except Exception as e:
+                logger.warning(f"Failed to update price stats: {record.series} {record.capacity}: {e}")
             
         except Exception as e:
             logger.error(f"Error saving price history: {str(e)}")
@@ -82,11 +78,17 @@ class PriceHistoryManager:
             # 指定日数前のタイムスタンプ
             start_timestamp = int((datetime.now() - timedelta(days=days)).timestamp())
             
+            # 履歴はカタログIDで保存されている
+            catalog = load_catalog(self.db)
+            model_id = catalog.model_id(series, capacity)
+            if model_id is None:
+                logger.info(f"No catalog entry for {series} {capacity}")
+                return []
+
             # クエリ実行（インデックスを避けるため、シンプルなクエリに変更）
             query = (
                 self.db.collection('price_history')
-                .filter('series', '==', series)
-                .filter('capacity', '==', capacity)
+                .filter('model_id', '==', model_id)
             )
             
             docs = query.stream()
@@ -94,23 +96,16 @@ class PriceHistoryManager:
             # グラフ用データに変換（クライアント側でフィルタリング）
             graph_data = []
             for doc in docs:
-                data = doc.to_dict()
-                timestamp = data.get('timestamp', 0)
+                record = PriceRecord.from_history_doc(doc.to_dict(), catalog)
                 
                 # 指定日数以内のデータのみをフィルタリング
-                if timestamp >= start_timestamp:
-                    # dateフィールドが存在しない場合はtimestampから生成
-                    date_str = data.get('date')
-                    if not date_str and timestamp:
-                        from datetime import datetime
-                        date_str = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
-                    
+                if record and record.timestamp >= start_timestamp:
                     graph_data.append({
-                        'date': date_str or 'Unknown',
-                        'timestamp': timestamp,
-                        'price_min': data['kaitori_price_min'],
-                        'price_max': data['kaitori_price_max'],
-                        'price_avg': (data['kaitori_price_min'] + data['kaitori_price_max']) // 2
+                        'date': datetime.fromtimestamp(record.timestamp).strftime('%Y-%m-%d') if record.timestamp else 'Unknown',
+                        'timestamp': record.timestamp,
+                        'price_min': record.kaitori_price_min,
+                        'price_max': record.kaitori_price_max,
+                        'price_avg': (record.kaitori_price_min + record.kaitori_price_max) // 2
                     })
             
             # タイムスタンプでソート
@@ -158,20 +153,18 @@ class PriceHistoryManager:
             # 現在の買取価格を取得
             kaitori_docs = self.db.collection('kaitori_prices').stream()
             
+            current_timestamp = int(datetime.now().timestamp())
+            records = [
+                record
+                for record in (PriceRecord.from_firestore(doc.to_dict(), timestamp=current_timestamp) for doc in kaitori_docs)
+                if record and record.kaitori_price_min > 0
+            ]
+            catalog = register_catalog(self.db, records)
+
             saved_count = 0
-            for doc in kaitori_docs:
-                data = doc.to_dict()
-                series = data.get('series')
-                capacity = data.get('capacity')
-                kaitori_price_min = data.get('kaitori_price_min', 0)
-                kaitori_price_max = data.get('kaitori_price_max', 0)
-                colors = data.get('colors', {})
-                
-                if series and capacity and kaitori_price_min > 0:
-                    self.save_price_history(
-                        series, capacity, kaitori_price_min, kaitori_price_max, colors
-                    )
-                    saved_count += 1
+            for record in records:
+                self.save_price_history(record, catalog)
+                saved_count += 1
             
             logger.info(f"Saved {saved_count} price history records")
             
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Cloud Functions コールドスタート計測スクリプト
+- 各エントリーポイントを新しいPythonプロセスで起動し、モジュールごとの読み込み時間を計測（-X importtime）
+- 読み込み開始から最初のレスポンスまでの時間を計測
+- 予算（--budget-ms）を超えたエントリーポイント、または計測用リクエストが5xxを返した
+  エントリーポイントがあれば終了コード1で終了
+
+各エントリーポイントにはDBを参照する実際のリクエスト（GETなど）を送り、遅延読み込みの
+モジュールも計測に含める。Firestoreの代わりに local_functions_harness のインメモリの
+クライアントに合成データを入れて使う（google.cloud.firestore の読み込みは本番と同じく計測に含める）。
+
+使用方法: python scripts/profile_cold_start.py [--budget-ms 1000] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from local_functions_harness import InMemoryFirestore, seed_synthetic_data
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FUNCTIONS_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'functions')
+
+# エントリーポイントごとの計測用リクエスト (method, path, JSONボディ)
+# モデルは local_functions_harness の合成データにあるもの
+ENTRY_POINTS = {
+    'router': ('GET', '/get_prices', None),
+    'get_prices': ('GET', '/', None),
+    'get_price_history': ('GET', '/?series=iPhone%2017&capacity=256GB', None),
+    'api_prices': ('GET', '/', None),
+    'api_status': ('GET', '/', None),
+    'health': ('GET', '/', None),
+    'set_alert': ('POST', '/', {
+        'series': 'iPhone 17', 'capacity': '256GB', 'threshold': 100000,
+        'direction': 'above', 'recipient': 'cold-start@example.com'
+    }),
+    'check_prices': ('POST', '/', None),
+    'scrape_prices': ('GET', '/', None),
+    'get_rankings': ('GET', '/', None),
+    'get_price_stats': ('GET', '/?series=iPhone%2017&capacity=256GB', None),
+    'get_catalog': ('GET', '/', None),
+}
+
+# 認証が必要なエントリーポイントに付けるヘッダー（シークレットは子プロセスの環境変数に設定する）
+COLD_START_SECRET = 'cold-start'
+ENTRY_POINT_HEADERS = {
+    'check_prices': {'Authorization': f'Bearer {COLD_START_SECRET}'},
+}
+
+IMPORT_MARKER = '--- cold start ---'
+
+# 子プロセスで実行するコード
+# functions-framework が先に読み込む flask、テスト用リクエストとインメモリのデータの準備は計測対象から除外する
+CHILD_CODE = """
+import json, sys, time
+import flask
+sys.path.insert(0, {functions_dir!r})
+# scripts/ の scrape_prices.py などがハンドラーのパッケージより優先されないよう末尾に追加する
+sys.path.append({scripts_dir!r})
+from local_functions_harness import InMemoryFirestore, install_fake_transactional
+db = InMemoryFirestore()
+with open({seed_path!r}, encoding='utf-8') as f:
+    db._collections = json.load(f)
+import common.firestore_client as firestore_client
+def get_firestore_client():
+    # 本番と同じく google.cloud.firestore の読み込みは最初の呼び出しで行う（接続だけをインメモリにする）
+    install_fake_transactional()
+    return db
+firestore_client.get_firestore_client = get_firestore_client
+app = flask.Flask('cold_start_probe')
+context = app.test_request_context({path!r}, method={method!r}, headers={headers!r}, json={body!r})
+sys.stderr.write({marker!r} + '\\n')
+sys.stderr.flush()
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+with context:
+    response = getattr(main, {target!r})(flask.request)
+done = time.perf_counter()
+status = response[1] if isinstance(response, tuple) else response.status_code
+print(json.dumps({{'import_ms': (imported - start) * 1000, 'first_response_ms': (done - start) * 1000, 'status': status}}))
+"""
+
+
+def parse_importtime(stderr):
+    """-X importtime の出力をパースして (モジュール名, self[us], cumulative[us]) のリストを返す"""
+    lines = stderr.splitlines()
+    if IMPORT_MARKER in lines:
+        lines = lines[lines.index(IMPORT_MARKER) + 1:]
+    modules = []
+    for line in lines:
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return modules
+
+
+def write_seed(directory, days):
+    """合成データを入れたインメモリのFirestoreの内容をJSONに保存し、パスを返す"""
+    db = seed_synthetic_data(InMemoryFirestore(), days=days)
+    path = os.path.join(directory, 'firestore_seed.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(db._collections, f, ensure_ascii=False)
+    return path
+
+
+def measure(target, seed_path):
+    """1つのエントリーポイントを新しいプロセスで起動して計測"""
+    method, path, body = ENTRY_POINTS[target]
+    code = CHILD_CODE.format(
+        functions_dir=FUNCTIONS_DIR, scripts_dir=SCRIPTS_DIR, seed_path=seed_path,
+        marker=IMPORT_MARKER, path=path, method=method, body=body, target=target,
+        headers=ENTRY_POINT_HEADERS.get(target, {})
+    )
+    env = dict(os.environ)
+    # Cloud Storage のプローブ（api_status）は外部に接続しないよう未設定にする
+    env.pop('BUCKET_NAME', None)
+    # アラートの通知は標準出力にのみ書き出す（Slack には送らない）
+    env['NOTIFICATION_TRANSPORT'] = 'stdout'
+    env.pop('SLACK_WEBHOOK_URL', None)
+    env['CHECK_PRICES_SECRET'] = COLD_START_SECRET
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=FUNCTIONS_DIR, timeout=120, env=env
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{target} の起動に失敗しました:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['modules'] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cloud Functions のコールドスタート時間を計測')
+    parser.add_argument('--budget-ms', type=float, default=1000.0,
+                        help='最初のレスポンスまでの許容時間（ミリ秒、中央値で判定。google.cloud.firestore の読み込みを含む）')
+    parser.add_argument('--repeat', type=int, default=3, help='エントリーポイントごとの計測回数')
+    parser.add_argument('--top', type=int, default=5, help='表示する重いモジュールの数')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+    parser.add_argument('--days', type=int, default=14, help='合成する価格履歴の日数')
+    parser.add_argument('targets', nargs='*', help='計測するエントリーポイント（省略時は全て）')
+    args = parser.parse_args()
+
+    targets = args.targets or list(ENTRY_POINTS)
+    unknown = [target for target in targets if target not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"未知のエントリーポイント: {', '.join(unknown)}")
+
+    report = {}
+    with tempfile.TemporaryDirectory(prefix='cold-start-') as directory:
+        seed_path = write_seed(directory, args.days)
+        runs_by_target = {target: [measure(target, seed_path) for _ in range(args.repeat)] for target in targets}
+    for target, runs in runs_by_target.items():
+        # モジュール別の時間は最後の計測結果を使う
+        top_modules = sorted(runs[-1]['modules'], key=lambda m: m[2], reverse=True)[:args.top]
+        report[target] = {
+            'status': runs[-1]['status'],
+            'import_ms': statistics.median(run['import_ms'] for run in runs),
+            'first_response_ms': statistics.median(run['first_response_ms'] for run in runs),
+            'modules_imported': len(runs[-1]['modules']),
+            'top_modules': [
+                {'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+                for name, self_us, cumulative_us in top_modules
+            ],
+        }
+
+    over_budget = [
+        target for target, result in report.items() if result['first_response_ms'] > args.budget_ms
+    ]
+    # 5xx の場合は遅延読み込みの途中で失敗しており、計測値が実際のコールドスタートを表さない
+    failed = [target for target, result in report.items() if result['status'] >= 500]
+
+    if args.json:
+        print(json.dumps({
+            'budget_ms': args.budget_ms, 'results': report, 'over_budget': over_budget, 'failed': failed
+        }, indent=2))
+    else:
+        print(f"🧊 コールドスタート計測（{args.repeat}回の中央値、予算 {args.budget_ms:.0f}ms）")
+        print("=" * 60)
+        for target, result in report.items():
+            mark = '❌' if target in over_budget or target in failed else '✅'
+            print(f"{mark} {target}: import {result['import_ms']:.1f}ms, "
+                  f"first response {result['first_response_ms']:.1f}ms "
+                  f"(HTTP {result['status']}, {result['modules_imported']} modules)")
+            for module in result['top_modules']:
+                print(f"    {module['cumulative_ms']:8.1f}ms  {module['module']}")
+
+    if failed:
+        print(f"\n❌ 計測用リクエストが失敗: {', '.join(failed)}")
+    if over_budget:
+        print(f"\n❌ 予算超過: {', '.join(over_budget)}")
+    if failed or over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+価格統計（price_stats）の再作成スクリプト
+- price_history を1回走査して (series, capacity) ごとの統計を作り直す
+- 統計の導入時や、統計の更新が失敗した後の復旧に使う
+  （通常は履歴の書き込み時に record_history_point で更新される）
+
+使用方法: python scripts/rebuild_price_stats.py [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from google.cloud import firestore
+from google.oauth2 import service_account
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.catalog import load_catalog  # noqa: E402
+from common.history_stats import PRICE_STATS_COLLECTION, build_model_stats  # noqa: E402
+
+# Firestoreのバッチ書き込みの上限
+MAX_BATCH_WRITES = 500
+
+
+def rebuild_price_stats(db, dry_run=False):
+    history_docs = [doc.to_dict() for doc in db.collection('price_history').stream()]
+    print(f"📥 price_history: {len(history_docs)}件")
+    stats_by_model = build_model_stats(history_docs, load_catalog(db))
+
+    batch = db.batch()
+    pending = 0
+    for model, stats in sorted(stats_by_model.items()):
+        document = stats.to_dict()
+        print(f"  {model}: {json.dumps(document['summary'].get('7', {}), ensure_ascii=False)}")
+        if dry_run:
+            continue
+        batch.set(db.collection(PRICE_STATS_COLLECTION).document(model), document)
+        pending += 1
+        if pending >= MAX_BATCH_WRITES:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+    action = "確認のみ（書き込みなし）" if dry_run else "保存しました"
+    print(f"✅ {len(stats_by_model)}モデルの統計を{action}")
+    return stats_by_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='価格統計（price_stats）を price_history から作り直す')
+    parser.add_argument('--dry-run', action='store_true', help='書き込まずに統計を表示する')
+    args = parser.parse_args()
+
+    credentials = service_account.Credentials.from_service_account_file('key.json')
+    db = firestore.Client(credentials=credentials)
+    rebuild_price_stats(db, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 import json
+import os
+import sys
 
 from google.cloud import firestore
 from google.oauth2 import service_account
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.product_catalog import load_product_catalog  # noqa: E402
+
 
 def get_current_kaitori_prices():
     """現在のFirestoreから買取価格データを取得"""
@@ -44,151 +50,16 @@ def reset_and_reload_kaitori_prices():
     if not current_data:
         print("No current data found, using dummy data...")
         current_data = {
-            "iPhone 17": {
-                "256GB": {
-                    "colors": {
-                        "Lavender": 120000,
-                        "Sage": 120000,
-                        "Black": 120000,
-                        "White": 120000,
-                        "Mist Blue": 120000
-                    },
-                    "kaitori_price_min": 120000,
-                    "kaitori_price_max": 120000,
-                    "source": "kaitori-rudea"
-                },
-                "512GB": {
-                    "colors": {
-                        "Lavender": 150000,
-                        "Sage": 150000,
-                        "Black": 150000,
-                        "White": 150000,
-                        "Mist Blue": 150000
-                    },
-                    "kaitori_price_min": 150000,
-                    "kaitori_price_max": 150000,
-                    "source": "kaitori-rudea"
-                }
-            },
-            "iPhone 17 Air": {
-                "256GB": {
-                    "colors": {
-                        "Light Gold": 146000,
-                        "Sage": 146000,
-                        "Black": 146000,
-                        "White": 146000,
-                        "Mist Blue": 146000
-                    },
-                    "kaitori_price_min": 146000,
-                    "kaitori_price_max": 146000,
-                    "source": "kaitori-rudea"
-                },
-                "512GB": {
-                    "colors": {
-                        "Light Gold": 176000,
-                        "Sage": 176000,
-                        "Black": 176000,
-                        "White": 176000,
-                        "Mist Blue": 176000
-                    },
-                    "kaitori_price_min": 176000,
-                    "kaitori_price_max": 176000,
-                    "source": "kaitori-rudea"
-                },
-                "1TB": {
-                    "colors": {
-                        "Light Gold": 201000,
-                        "Sage": 201000,
-                        "Black": 201000,
-                        "White": 201000,
-                        "Mist Blue": 201000
-                    },
-                    "kaitori_price_min": 201000,
-                    "kaitori_price_max": 201000,
-                    "source": "kaitori-rudea"
-                }
-            },
-            "iPhone 17 Pro": {
-                "256GB": {
-                    "colors": {
-                        "Natural Titanium": 177200,
-                        "Blue Titanium": 177200,
-                        "White Titanium": 177200,
-                        "Black Titanium": 177200
-                    },
-                    "kaitori_price_min": 177200,
-                    "kaitori_price_max": 177200,
-                    "source": "kaitori-rudea"
-                },
-                "512GB": {
-                    "colors": {
-                        "Natural Titanium": 210200,
-                        "Blue Titanium": 210200,
-                        "White Titanium": 210200,
-                        "Black Titanium": 210200
-                    },
-                    "kaitori_price_min": 210200,
-                    "kaitori_price_max": 210200,
-                    "source": "kaitori-rudea"
-                },
-                "1TB": {
-                    "colors": {
-                        "Natural Titanium": 243200,
-                        "Blue Titanium": 243200,
-                        "White Titanium": 243200,
-                        "Black Titanium": 243200
-                    },
-                    "kaitori_price_min": 243200,
-                    "kaitori_price_max": 243200,
-                    "source": "kaitori-rudea"
-                }
-            },
-            "iPhone 17 Pro Max": {
-                "256GB": {
-                    "colors": {
-                        "Natural Titanium": 210200,
-                        "Blue Titanium": 210200,
-                        "White Titanium": 210200,
-                        "Black Titanium": 210200
-                    },
-                    "kaitori_price_min": 210200,
-                    "kaitori_price_max": 210200,
-                    "source": "kaitori-rudea"
-                },
-                "512GB": {
-                    "colors": {
-                        "Natural Titanium": 236200,
-                        "Blue Titanium": 236200,
-                        "White Titanium": 236200,
-                        "Black Titanium": 236200
-                    },
-                    "kaitori_price_min": 236200,
-                    "kaitori_price_max": 236200,
-                    "source": "kaitori-rudea"
-                },
-                "1TB": {
-                    "colors": {
-                        "Natural Titanium": 276200,
-                        "Blue Titanium": 276200,
-                        "White Titanium": 276200,
-                        "Black Titanium": 276200
-                    },
-                    "kaitori_price_min": 276200,
-                    "kaitori_price_max": 276200,
-                    "source": "kaitori-rudea"
-                },
-                "2TB": {
-                    "colors": {
-                        "Natural Titanium": 330200,
-                        "Blue Titanium": 330200,
-                        "White Titanium": 330200,
-                        "Black Titanium": 330200
-                    },
-                    "kaitori_price_min": 330200,
-                    "kaitori_price_max": 330200,
-                    "source": "kaitori-rudea"
+            series: {
+                capacity: {
+                    **data,
+                    'kaitori_price_min': min(data['colors'].values()),
+                    'kaitori_price_max': max(data['colors'].values()),
+                    'source': 'kaitori-rudea'
                 }
+                for capacity, data in capacities.items()
             }
+            for series, capacities in load_product_catalog().reference_prices('kaitori').items()
         }
 
     # 旧データの削除
@@ -0,0 +1,60 @@
+"""
+スクレイピングのHTMLフィクスチャ
+- scrape_prices.py --record DIR で設定のURLごとのページHTMLを保存し、
+  --replay DIR やベンチマークでネットワークなしに同じHTMLを解析する
+- DIR/manifest.json に URL とファイル名の対応を保存する
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def fixture_name(url: str) -> str:
+    """URLからフィクスチャのファイル名を作る（読みやすい部分 + URLのハッシュ）"""
+    readable = re.sub(r'[^A-Za-z0-9]+', '_', re.sub(r'^https?://', '', url)).strip('_')[:60]
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]
+    return f"{readable}_{digest}.html"
+
+
+def save_fixtures(directory: str, pages: Dict[str, str]) -> str:
+    """URLごとのHTMLを保存する
+
+    Returns:
+        manifest.json のパス
+    """
+    os.makedirs(directory, exist_ok=True)
+    entries = []
+    for url, page_html in pages.items():
+        name = fixture_name(url)
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(page_html)
+        entries.append({'url': url, 'file': name, 'bytes': len(page_html.encode('utf-8'))})
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'recorded_at': datetime.now().isoformat(), 'pages': entries}, f, ensure_ascii=False, indent=2)
+    return manifest_path
+
+
+def load_fixtures(directory: str) -> List[Tuple[str, str]]:
+    """保存したHTMLを (URL, HTML) の配列で返す（manifest.json の順）
+
+    manifest.json がない場合は、ディレクトリ内の *.html をファイル名をURLとして読み込む。
+    """
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            entries = [(entry['url'], entry['file']) for entry in json.load(f)['pages']]
+    else:
+        entries = [(name, name) for name in sorted(os.listdir(directory)) if name.endswith('.html')]
+
+    fixtures = []
+    for url, name in entries:
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            fixtures.append((url, f.read()))
+    return fixtures
@@ -0,0 +1,208 @@
+"""
+スクレイピングの実行ジャーナル（チェックポイント）
+- 実行（run_id）ごとに、取得・解析が終わったURLとその価格データを1URL1ファイルで記録する
+- 外れ値ゲートを通した保存内容（plan）も記録し、保存の途中で止まった実行を同じ内容で保存し直す
+- 実行のジョブID（scrape_jobs）を meta.json に記録し、再開時は同じジョブを引き継ぐ
+- scrape_prices.py --resume RUN_ID（または SCRAPE_RUN_ID）で記録済みのURLを飛ばして再開する
+
+保存先は SCRAPE_JOURNAL（ローカルのディレクトリ、または gs://bucket/prefix）。
+ファイルの構成: <run_id>/meta.json, <run_id>/pages/<URLのファイル名>.json, <run_id>/plan.json
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from common.price_record import PriceRecord
+from scrape_fixtures import fixture_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_LOCATION = 'scrape_journal'
+
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+
+
+def encode_records(records: Sequence[PriceRecord]) -> List[Dict]:
+    """PriceRecord をJSONにする（updated_at は秒までのため timestamp も保存して元の値に戻せるようにする）"""
+    return [{**record.to_kaitori_doc(), 'timestamp': record.timestamp} for record in records]
+
+
+def decode_records(docs: Sequence[Dict]) -> List[PriceRecord]:
+    return [record for record in map(PriceRecord.from_firestore, docs) if record]
+
+
+class LocalJournalStore:
+    """ローカルのディレクトリ"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def read(self, name: str) -> Optional[str]:
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def write(self, name: str, text: str) -> None:
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 書き込み途中で止まっても壊れたファイルが残らないよう、一時ファイルから置き換える
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def list(self, prefix: str) -> List[str]:
+        directory = os.path.join(self.root, prefix)
+        if not os.path.isdir(directory):
+            return []
+        return [f"{prefix}/{name}" for name in sorted(os.listdir(directory)) if name.endswith('.json')]
+
+
+class GCSJournalStore:
+    """Cloud Storage（gs://bucket/prefix）"""
+
+    def __init__(self, location: str):
+        from google.cloud import storage
+        from google.oauth2 import service_account
+
+        bucket_name, _, prefix = location[len('gs://'):].partition('/')
+        if os.path.exists('key.json'):
+            client = storage.Client(credentials=service_account.Credentials.from_service_account_file('key.json'))
+        else:
+            # GitHub Actions などで設定済みの認証情報を使う
+            client = storage.Client()
+        self.bucket = client.bucket(bucket_name)
+        self.prefix = prefix.strip('/')
+
+    def _blob_name(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def read(self, name: str) -> Optional[str]:
+        blob = self.bucket.blob(self._blob_name(name))
+        if not blob.exists():
+            return None
+        return blob.download_as_text(encoding='utf-8')
+
+    def write(self, name: str, text: str) -> None:
+        self.bucket.blob(self._blob_name(name)).upload_from_string(text, content_type='application/json')
+
+    def list(self, prefix: str) -> List[str]:
+        base = self._blob_name('')
+        return sorted(
+            blob.name[len(base):]
+            for blob in self.bucket.list_blobs(prefix=self._blob_name(prefix) + '/')
+            if blob.name.endswith('.json')
+        )
+
+
+def open_journal_store(location: str):
+    if location.startswith('gs://'):
+        return GCSJournalStore(location)
+    return LocalJournalStore(location)
+
+
+def new_run_id() -> str:
+    return datetime.now().strftime('%Y%m%d-%H%M%S')
+
+
+class ScrapeJournal:
+    """1回の実行（run_id）のジャーナル"""
+
+    def __init__(self, store, run_id: str):
+        self.store = store
+        self.run_id = run_id
+
+    @classmethod
+    def open(cls, run_id: Optional[str] = None, location: Optional[str] = None, resume: bool = False) -> 'ScrapeJournal':
+        """ジャーナルを開く（記録がなければ作成する）
+
+        Raises:
+            FileNotFoundError: resume=True で run_id の記録がない場合
+        """
+        location = location or os.getenv('SCRAPE_JOURNAL') or DEFAULT_JOURNAL_LOCATION
+        journal = cls(open_journal_store(location), run_id or new_run_id())
+        meta = journal.meta()
+        if meta is None:
+            if resume:
+                raise FileNotFoundError(f"実行 {journal.run_id} のジャーナルが見つかりません: {location}")
+            journal._write_json('meta.json', {
+                'run_id': journal.run_id,
+                'status': STATUS_RUNNING,
+                'created_at': datetime.now().isoformat()
+            })
+            logger.info(f"ジャーナルを作成しました: {location} ({journal.run_id})")
+        else:
+            logger.info(f"ジャーナルから再開します: {location} ({journal.run_id}, {meta.get('status')})")
+        return journal
+
+    def _read_json(self, name: str) -> Optional[Dict]:
+        text = self.store.read(f"{self.run_id}/{name}")
+        return json.loads(text) if text is not None else None
+
+    def _write_json(self, name: str, data: Dict) -> None:
+        self.store.write(f"{self.run_id}/{name}", json.dumps(data, ensure_ascii=False))
+
+    def meta(self) -> Optional[Dict]:
+        return self._read_json('meta.json')
+
+    def job_id(self) -> Optional[str]:
+        """record_job で記録したジョブID"""
+        return (self.meta() or {}).get('job_id')
+
+    def record_job(self, job_id: str) -> None:
+        """この実行のジョブIDを記録する（停止したワーカーのジョブを再開時に引き継ぐため）"""
+        meta = self.meta() or {'run_id': self.run_id}
+        if meta.get('job_id') != job_id:
+            self._write_json('meta.json', {**meta, 'job_id': job_id})
+
+    def is_completed(self) -> bool:
+        meta = self.meta()
+        return bool(meta) and meta.get('status') == STATUS_COMPLETED
+
+    def completed_pages(self) -> Dict[str, List[PriceRecord]]:
+        """記録済みのURLとその価格データ"""
+        pages = {}
+        for name in self.store.list(f"{self.run_id}/pages"):
+            page = json.loads(self.store.read(name))
+            pages[page['url']] = decode_records(page['records'])
+        return pages
+
+    def record_page(self, url: str, records: Sequence[PriceRecord]) -> None:
+        """取得・解析が終わったURLを記録する"""
+        self._write_json(f"pages/{os.path.splitext(fixture_name(url))[0]}.json", {
+            'url': url,
+            'records': encode_records(records),
+            'recorded_at': datetime.now().isoformat()
+        })
+
+    def load_plan(self) -> Optional[Dict]:
+        """保存内容（save_plan で記録したもの）。records は PriceRecord に戻す"""
+        plan = self._read_json('plan.json')
+        if plan is not None:
+            plan['records'] = decode_records(plan['records'])
+        return plan
+
+    def save_plan(self, records: Sequence[PriceRecord], quarantined: Sequence[Dict], report: Dict, windows: Dict) -> None:
+        """外れ値ゲートを通した保存内容を記録する（保存を始める前に呼び出す）"""
+        self._write_json('plan.json', {
+            'records': encode_records(records),
+            'quarantined': list(quarantined),
+            'report': report,
+            'windows': windows,
+            'created_at': datetime.now().isoformat()
+        })
+
+    def mark_completed(self, summary: Optional[Dict] = None) -> None:
+        meta = self.meta() or {'run_id': self.run_id}
+        self._write_json('meta.json', {
+            **meta,
+            **(summary or {}),
+            'status': STATUS_COMPLETED,
+            'completed_at': datetime.now().isoformat()
+        })
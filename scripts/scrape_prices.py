@@ -4,15 +4,26 @@ iPhone価格スクレイピングスクリプト
 - 買取価格データの取得
 - Firestoreへの保存
 - 2週間経過データの削除
+
+使用方法:
+  python scripts/scrape_prices.py                   # スクレイピングして保存
+  python scripts/scrape_prices.py --record DIR      # ページHTMLを DIR に保存（解析・保存はしない）
+  python scripts/scrape_prices.py --replay DIR      # DIR のHTMLを解析（ネットワーク・Firestoreなし）
+  python scripts/scrape_prices.py --shard 1/4 --output shard-1.json  # シャード1/4のURLだけを取得・解析
+  python scripts/scrape_prices.py --merge shard-*.json              # シャードの出力をまとめて保存
+  python scripts/scrape_prices.py --local-shards 4  # 4プロセスでシャードを並列に取得してから保存
+  python scripts/scrape_prices.py --resume RUN_ID   # 中断した実行をジャーナルから再開
 """
 
+import argparse
 import asyncio
 import json
 import logging
 import os
-import re
 import subprocess
 import sys
+import tempfile
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
 from pathlib import Path
@@ -24,6 +35,20 @@ from google.oauth2 import service_account
 from playwright.async_api import async_playwright
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.catalog import CatalogRegistry, register_catalog  # noqa: E402
+from common.history_stats import record_history_point  # noqa: E402
+from common.price_gate import PriceGate, PriceWindow  # noqa: E402
+from common.price_record import PriceRecord, history_doc_id, merge_by_model  # noqa: E402
+from common.product_catalog import load_product_catalog  # noqa: E402
+from kaitori_parser import create_parse_pool, normalize_price, parse_price_html  # noqa: E402
+from scrape_fixtures import load_fixtures, save_fixtures  # noqa: E402
+from scrape_journal import ScrapeJournal  # noqa: E402
+from scrape_shards import merge_shard_outputs, parse_shard, save_shard_output, shard_urls  # noqa: E402
+# functions/ を先頭に追加しているため、このスクリプトと同名の scrape_prices はジョブ管理のパッケージになる
+from scrape_prices.jobs import SCRAPE_JOB_LOCK_ID, SCRAPE_JOB_LOCKS_COLLECTION, SCRAPE_JOBS_COLLECTION, is_stale  # noqa: E402
+
 # ログ設定
 logging.basicConfig(
     level=logging.INFO,
@@ -31,6 +56,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ページの取得（ブラウザ）の同時実行数
+FETCH_CONCURRENCY = int(os.getenv('SCRAPE_FETCH_CONCURRENCY', '3'))
+# HTMLの解析（プロセスプール）のプロセス数（未指定の場合はCPU数）
+PARSE_WORKERS = int(os.getenv('SCRAPE_PARSE_WORKERS', '0')) or os.cpu_count() or 1
+# 取得済みで解析待ちのページ数の上限（超えると取得を待たせる）
+PARSE_QUEUE_SIZE = int(os.getenv('SCRAPE_PARSE_QUEUE_SIZE', '0')) or PARSE_WORKERS * 2
+
 # Decimalを処理するJSONエンコーダを追加
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -44,39 +76,145 @@ class DecimalEncoder(json.JSONEncoder):
             return int(obj) if obj % 1 == 0 else float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+class ScrapeJobTracker:
+    """scrape_jobs コレクションのジョブに進捗を記録する
+
+    scrape_prices エンドポイントが登録したジョブ（SCRAPE_JOB_ID）を処理する。
+    定期実行などでジョブIDがない場合は、登録済みで未処理のジョブを引き取るか、
+    新しいジョブを作成する。別のワーカーが実行中の場合は None を返す。
+    """
+
+    # 書き込み件数はこの件数ごとにまとめて記録する
+    ITEMS_FLUSH_INTERVAL = 20
+
+    def __init__(self, db, job_id: str):
+        self.db = db
+        self.job_id = job_id
+        self.job_ref = db.collection(SCRAPE_JOBS_COLLECTION).document(job_id)
+        self.urls_done = 0
+        self.items_scraped = 0
+        self.items_written = 0
+        self._unflushed_items = 0
+
+    @classmethod
+    def start(cls, db, job_id: Optional[str] = None) -> Optional['ScrapeJobTracker']:
+        """ジョブを実行中にして tracker を返す
+
+        job_id 省略時は、ロックのジョブが queued ならそれを引き取り、実行中（停止とみなす時間内）なら
+        スキップして None を返し、それ以外は新しいジョブを作る。ロックは scrape_prices エンドポイントの
+        登録（enqueue_scrape_job）と同じくトランザクションで読み書きし、同時に起動したワーカーが
+        同じジョブを二重に引き取らないようにする。
+        """
+        lock_ref = db.collection(SCRAPE_JOB_LOCKS_COLLECTION).document(SCRAPE_JOB_LOCK_ID)
+        jobs_ref = db.collection(SCRAPE_JOBS_COLLECTION)
+
+        @firestore.transactional
+        def claim(transaction):
+            now = datetime.now().isoformat()
+            running = {'status': 'running', 'started_at': now, 'updated_at': now}
+            if job_id:
+                transaction.set(jobs_ref.document(job_id), running, merge=True)
+                return job_id, False
+
+            lock = lock_ref.get(transaction=transaction)
+            current_id = lock.get('job_id') if lock.exists else None
+            current = jobs_ref.document(current_id).get(transaction=transaction) if current_id else None
+            job = current.to_dict() if current is not None and current.exists else None
+            if job and job.get('status') == 'queued':
+                transaction.update(jobs_ref.document(current_id), running)
+                return current_id, False
+            if job and job.get('status') == 'running':
+                if not is_stale(job):
+                    return None, False
+                transaction.update(jobs_ref.document(current_id), {
+                    'status': 'abandoned',
+                    'error': 'No progress from worker',
+                    'updated_at': now
+                })
+
+            job_ref = jobs_ref.document()
+            transaction.set(job_ref, {
+                **running,
+                'source': 'schedule',
+                'requested_count': 1,
+                'urls_done': 0,
+                'items_scraped': 0,
+                'items_written': 0,
+                'created_at': now
+            })
+            transaction.set(lock_ref, {'job_id': job_ref.id, 'updated_at': now})
+            return job_ref.id, True
+
+        claimed_id, created = claim(db.transaction())
+        if claimed_id is None:
+            logger.info("ジョブが実行中のためスキップします")
+            return None
+        if created:
+            logger.info(f"ジョブを作成しました: {claimed_id}")
+        elif not job_id:
+            logger.info(f"登録済みのジョブを引き取ります: {claimed_id}")
+        return cls(db, claimed_id)
+
+    def _update(self, fields: Dict) -> None:
+        try:
+            self.job_ref.set({**fields, 'updated_at': datetime.now().isoformat()}, merge=True)
+        except Exception as e:
+            # 進捗の記録に失敗してもスクレイピングは続行する
+            logger.warning(f"ジョブの進捗の記録に失敗: {e}")
+
+    def set_total(self, urls_total: int) -> None:
+        self._update({'urls_total': urls_total})
+
+    def url_done(self, items: int) -> None:
+        self.urls_done += 1
+        self.items_scraped += items
+        self._update({'urls_done': self.urls_done, 'items_scraped': self.items_scraped})
+
+    def item_written(self) -> None:
+        self.items_written += 1
+        self._unflushed_items += 1
+        if self._unflushed_items >= self.ITEMS_FLUSH_INTERVAL:
+            self._unflushed_items = 0
+            self._update({'items_written': self.items_written})
+
+    def record_validation(self, report: Dict) -> None:
+        self._update({'validation': report})
+
+    def finish(self, error: Optional[str] = None) -> None:
+        fields = {
+            'status': 'failed' if error else 'completed',
+            'items_written': self.items_written,
+            'finished_at': datetime.now().isoformat()
+        }
+        if error:
+            fields['error'] = error
+        self._update(fields)
+
+
 class PriceScraper:
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, connect_firestore: bool = True):
         self.config = config
+        self.db = None
         self.playwright = None
         self.browser = None
         self.context = None
+        self.job: Optional[ScrapeJobTracker] = None
+        self.journal: Optional[ScrapeJournal] = None
+        self._official_catalog: Optional[Dict[str, Dict]] = None
         
-        # Firestoreクライアントの初期化
-        try:
-            # サービスアカウントキーファイルから認証情報を取得
-            credentials = service_account.Credentials.from_service_account_file('key.json')
-            self.db = firestore.Client(credentials=credentials)
-            logger.info("Firestoreクライアントを初期化しました")
-        except Exception as e:
-            logger.error(f"Firestoreクライアントの初期化に失敗: {e}")
-            raise
-        
-        self.model_patterns = {
-            "iPhone 16 Pro Max": r"iPhone\s*16\s*Pro\s*Max",
-            "iPhone 16 Pro": r"iPhone\s*16\s*Pro(?!\s*Max)",
-            "iPhone 16 Plus": r"iPhone\s*16\s*Plus",
-            "iPhone 16 e": r"iPhone\s*16\s*[eE]",
-            "iPhone 16": r"iPhone\s*16(?!\s*(?:Pro|Plus|[eE]))"
-        }
+        # Firestoreクライアントの初期化（--record では使わない）
+        if connect_firestore:
+            try:
+                # サービスアカウントキーファイルから認証情報を取得
+                credentials = service_account.Credentials.from_service_account_file('key.json')
+                self.db = firestore.Client(credentials=credentials)
+                logger.info("Firestoreクライアントを初期化しました")
+            except Exception as e:
+                logger.error(f"Firestoreクライアントの初期化に失敗: {e}")
+                raise
         
-        # 各モデルの有効な容量を定義
-        self.valid_capacities = {
-            "iPhone 16": ["128GB", "256GB", "512GB"],
-            "iPhone 16 Plus": ["128GB", "256GB", "512GB"],
-            "iPhone 16 Pro": ["128GB", "256GB", "512GB", "1TB"],
-            "iPhone 16 Pro Max": ["256GB", "512GB", "1TB"],
-            "iPhone 16 e": ["128GB", "256GB", "512GB"]
-        }
+        # シリーズ・有効な容量・商品名の解析は製品カタログ（common/product_catalog.json）から
+        self.product_catalog = load_product_catalog()
 
     async def __aenter__(self):
         """非同期コンテキストマネージャーのエントリーポイント"""
@@ -94,171 +232,165 @@ class PriceScraper:
         if self.playwright:
             await self.playwright.stop()
 
-    def _price_text_to_int(self, price_text: str) -> int:
-        """価格テキストを整数に変換"""
-        try:
-            return int(price_text.replace("円", "").replace(",", ""))
-        except (ValueError, AttributeError):
-            return 0
-
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_exponential(multiplier=1, min=2, max=30),
         reraise=True
     )
-    async def scrape_url(self, url: str) -> List[Dict]:
-        """指定されたURLから価格データをスクレイピング"""
+    async def fetch_html(self, url: str) -> str:
+        """指定されたURLのページHTMLを取得"""
+        page = await self.context.new_page()
         try:
-            # ページの読み込み
-            page = await self.context.new_page()
-            try:
-                await page.goto(url, wait_until='networkidle', timeout=60000)
-                
-                # デバッグ情報の出力
-                logger.debug(f"ページのタイトル: {await page.title()}")
-                logger.debug(f"URL: {page.url}")
-                
-                # 価格要素の取得（セレクターを修正）
-                price_elements = await page.query_selector_all('.tr')
-                if not price_elements:
-                    logger.warning(f"価格要素が見つかりません: {url}")
-                    # ページ構造のデバッグ
-                    content = await page.content()
-                    logger.debug(f"ページ構造: {content[:500]}...")  # 最初の500文字のみ表示
-                    return []
-                
-                logger.info(f"価格要素が{len(price_elements)}個見つかりました")
-                
-                results = []
-                for element in price_elements:
-                    try:
-                        # モデル名の取得（セレクターを修正）
-                        model_name = await element.query_selector('.ttl h2')
-                        if not model_name:
-                            continue
-                        model_text = await model_name.text_content()
-                        if not model_text:
-                            continue
-                        
-                        logger.debug(f"モデル名: {model_text}")
-                        
-                        # モデルシリーズの識別
-                        series = self._identify_model_series(model_text.strip())
-                        if not series:
-                            logger.warning(f"未知のモデル名: {model_text}")
-                            continue
-                        
-                        # 容量の取得（正規表現で抽出）
-                        capacity_match = re.search(r'(\d+)\s*[GT]B', model_text)
-                        if not capacity_match:
-                            logger.warning(f"容量が見つかりません: {model_text}")
-                            continue
-                        capacity = f"{capacity_match.group(1)}GB"
-                        
-                        logger.debug(f"容量: {capacity}")
-                        
-                        # 価格の取得（セレクターを修正）
-                        price_element = await element.query_selector('.td.td2 .td2wrap')
-                        if not price_element:
-                            continue
-                        price_text = await price_element.text_content()
-                        if not price_text:
-                            continue
-                        
-                        # 価格の正規化
-                        price = self._normalize_price(price_text.strip())
-                        if not price:
-                            logger.warning(f"無効な価格: {price_text}")
-                            continue
-                        
-                        logger.debug(f"価格: {price}")
-                        
-                        # 色の取得（正規表現で抽出）
-                        color_match = re.search(r'(黒|白|桃|緑|青|金|灰)', model_text)
-                        color = color_match.group(1) if color_match else "不明"
-                        
-                        # 結果の追加
-                        result = {
-                            "id": f"{series}_{capacity}",
-                            "series": series,
-                            "capacity": capacity,
-                            "colors": [color.strip()],
-                            "kaitori_price_min": price,
-                            "kaitori_price_max": price
-                        }
-                        
-                        logger.debug(f"結果: {json.dumps(result, ensure_ascii=False)}")
-                        results.append(result)
-                        
-                    except Exception as e:
-                        logger.error(f"要素の処理中にエラーが発生: {e}")
-                        continue
-                
-                if results:
-                    logger.info(f"{len(results)}件の価格データを取得しました: {url}")
-                
-                return results
-                
-            finally:
-                await page.close()
-                
+            await page.goto(url, wait_until='networkidle', timeout=60000)
+            
+            # デバッグ情報の出力
+            logger.debug(f"ページのタイトル: {await page.title()}")
+            logger.debug(f"URL: {page.url}")
+            
+            return await page.content()
+        finally:
+            await page.close()
+
+    async def scrape_url(self, url: str) -> List[PriceRecord]:
+        """指定されたURLから価格データをスクレイピング（1URL分。取得したHTMLを kaitori_parser で解析）"""
+        try:
+            page_html = await self.fetch_html(url)
         except Exception as e:
             logger.error(f"スクレイピングエラー (URL: {url}): {e}")
             return []
 
-    def _normalize_capacity(self, capacity: str) -> Optional[str]:
-        """容量を正規化"""
         try:
-            # 数値の抽出
-            match = re.search(r'(\d+)\s*[Gg][Bb]', capacity)
-            if not match:
-                return None
-            return f"{match.group(1)}GB"
-        except Exception:
-            return None
+            results = parse_price_html(page_html, self.product_catalog)
+        except Exception as e:
+            logger.error(f"HTMLの解析中にエラーが発生 (URL: {url}): {e}")
+            return []
+        self._log_parsed(url, page_html, results)
+        return results
+
+    def _log_parsed(self, url: str, page_html: str, results: List[PriceRecord]) -> None:
+        if not results:
+            logger.warning(f"価格要素が見つかりません: {url}")
+            # ページ構造のデバッグ
+            logger.debug(f"ページ構造: {page_html[:500]}...")  # 最初の500文字のみ表示
+        else:
+            logger.info(f"{len(results)}件の価格データを取得しました: {url}")
+
+    async def record_fixtures(self, directory: str) -> str:
+        """設定のURLごとのページHTMLをフィクスチャとして保存（--record）"""
+        if not self.context:
+            raise RuntimeError("ブラウザコンテキストが初期化されていません")
+
+        semaphore = asyncio.Semaphore(3)  # 同時実行数を制限
+        pages = {}
+
+        async def fetch_with_semaphore(url: str) -> None:
+            async with semaphore:
+                try:
+                    pages[url] = await self.fetch_html(url)
+                except Exception as e:
+                    logger.error(f"ページの取得に失敗 (URL: {url}): {e}")
+
+        urls = self.config['scraper']['kaitori_rudea_urls']
+        await asyncio.gather(*(fetch_with_semaphore(url) for url in urls))
+        # 設定のURLの順で保存する
+        manifest_path = save_fixtures(directory, {url: pages[url] for url in urls if url in pages})
+        logger.info(f"{len(pages)}/{len(urls)}ページのHTMLを保存しました: {manifest_path}")
+        return manifest_path
 
     def _normalize_price(self, price: str) -> Optional[int]:
         """価格を正規化"""
-        try:
-            # 数値の抽出
-            match = re.search(r'(\d+(?:,\d+)*)', price)
-            if not match:
-                return None
-            # カンマを除去して整数に変換
-            return int(match.group(1).replace(',', ''))
-        except Exception:
-            return None
+        return normalize_price(price)
+
+    async def scrape_pages(self, urls: List[str]) -> Dict[str, List[PriceRecord]]:
+        """URLごとに価格データをスクレイピング（取得に失敗したURLは結果に含めない）
+
+        取得（ブラウザ、FETCH_CONCURRENCY 並列）と解析（プロセスプール、PARSE_WORKERS 並列）を
+        上限 PARSE_QUEUE_SIZE のキューでつなぐ。解析が追いつかない場合はキューが空くまで
+        取得を待たせるため、URLが数百あっても取得済みのHTMLがメモリに溜まらない。
 
-    async def scrape_all_prices(self) -> List[Dict]:
-        """全てのURLから価格データを並行してスクレイピング"""
+        journal がある場合は、記録済みのURLは取得せずに記録した価格データを使い、
+        解析が終わったURLを順に記録する。
+        """
         if not self.context:
             raise RuntimeError("ブラウザコンテキストが初期化されていません")
 
-        # 並列処理の設定
-        semaphore = asyncio.Semaphore(3)  # 同時実行数を制限
-        
-        async def scrape_with_semaphore(url: str) -> List[Dict]:
+        if self.job:
+            self.job.set_total(len(urls))
+
+        results_by_url: Dict[str, List[PriceRecord]] = {}
+        if self.journal:
+            completed = self.journal.completed_pages()
+            for url in urls:
+                if url in completed:
+                    results_by_url[url] = completed[url]
+                    if self.job:
+                        self.job.url_done(len(completed[url]))
+            if results_by_url:
+                logger.info(f"ジャーナルに記録済みの{len(results_by_url)}/{len(urls)}件のURLを飛ばします")
+            urls = [url for url in urls if url not in results_by_url]
+            if not urls:
+                return results_by_url
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+        semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)  # 同時実行数を制限
+        loop = asyncio.get_running_loop()
+
+        async def fetch(url: str) -> None:
             async with semaphore:
                 try:
-                    return await self.scrape_url(url)
+                    page_html = await self.fetch_html(url)
                 except Exception as e:
                     logger.error(f"スクレイピング失敗 (URL: {url}): {e}")
-                    return []
+                    page_html = None
+                # キューが一杯の間はブラウザの枠を空けずに待つ（取得を解析の速度に合わせる）
+                await queue.put((url, page_html))
 
-        # タスクの作成と実行
-        tasks = [scrape_with_semaphore(url) for url in self.config['scraper']['kaitori_rudea_urls']]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # 結果の処理
-        flattened_results = []
-        for result in results:
-            if isinstance(result, Exception):
-                logger.error(f"スクレイピング失敗: {result}")
-                continue
-            if isinstance(result, list):
-                flattened_results.extend(result)
-            else:
-                flattened_results.append(result)
+        async def parse(pool) -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                url, page_html = item
+                results = []
+                if page_html is not None:
+                    try:
+                        results = await loop.run_in_executor(pool, parse_price_html, page_html)
+                    except Exception as e:
+                        logger.error(f"HTMLの解析中にエラーが発生 (URL: {url}): {e}")
+                    else:
+                        self._log_parsed(url, page_html, results)
+                        if self.journal:
+                            await loop.run_in_executor(None, self._checkpoint, url, results)
+                    results_by_url[url] = results
+                if self.job:
+                    self.job.url_done(len(results))
+
+        workers = min(PARSE_WORKERS, len(urls)) or 1
+        with create_parse_pool(workers) as pool:
+            parsers = [asyncio.create_task(parse(pool)) for _ in range(workers)]
+            try:
+                await asyncio.gather(*(fetch(url) for url in urls))
+            finally:
+                for _ in parsers:
+                    await queue.put(None)
+                await asyncio.gather(*parsers)
+        return results_by_url
+
+    def _checkpoint(self, url: str, results: List[PriceRecord]) -> None:
+        try:
+            self.journal.record_page(url, results)
+        except Exception as e:
+            # ジャーナルの記録に失敗してもスクレイピングは続行する（再開時にそのURLを取得し直す）
+            logger.warning(f"ジャーナルの記録に失敗 (URL: {url}): {e}")
+
+    async def scrape_all_prices(self, urls: Optional[List[str]] = None) -> List[PriceRecord]:
+        """全てのURL（urls を指定した場合はそのURL）から価格データをスクレイピング"""
+        if urls is None:
+            urls = self.config['scraper']['kaitori_rudea_urls']
+        results_by_url = await self.scrape_pages(urls)
+
+        # 設定のURLの順にまとめる
+        flattened_results = [result for url in urls for result in results_by_url.get(url, [])]
         
         # 結果の検証
         if not flattened_results:
@@ -268,25 +400,17 @@ class PriceScraper:
         
         return flattened_results
 
-    def save_to_firestore(self, data: Dict) -> None:
-        """Firestoreにデータを保存"""
+    def save_to_firestore(self, record: PriceRecord, catalog: CatalogRegistry) -> None:
+        """Firestoreにデータを保存（catalog は register_catalog で record の名前を登録済みのもの）"""
         try:
             # kaitori_pricesコレクションへの保存（上書き）
-            kaitori_data = {
-                "series": data["series"],
-                "capacity": data["capacity"],
-                "colors": data["colors"],
-                "kaitori_price_min": data["kaitori_price_min"],
-                "kaitori_price_max": data["kaitori_price_max"],
-                "source": "kaitori-rudea",
-                "updated_at": datetime.now().isoformat()
-            }
+            kaitori_data = record.to_kaitori_doc()
             
             # 既存のドキュメントを検索して更新、または新規作成
             query = (
                 self.db.collection('kaitori_prices')
-                .where('series', '==', data["series"])
-                .where('capacity', '==', data["capacity"])
+                .where('series', '==', record.series)
+                .where('capacity', '==', record.capacity)
             )
             docs = query.stream()
             
@@ -301,23 +425,20 @@ class PriceScraper:
             logger.info(f"kaitori_pricesコレクションに保存: {json.dumps(kaitori_data, ensure_ascii=False)}")
             
             # price_historyコレクションへの保存（履歴追加）
-            current_timestamp = int(datetime.now().timestamp())
-            history_data = {
-                "model": data["id"],
-                "timestamp": current_timestamp,
-                "series": data["series"],
-                "capacity": data["capacity"],
-                "colors": data["colors"],
-                "kaitori_price_min": data["kaitori_price_min"],
-                "kaitori_price_max": data["kaitori_price_max"],
-                "source": "kaitori-rudea",
-                "date": datetime.now().strftime('%Y-%m-%d'),
-                "expiration_time": int((datetime.now() + timedelta(days=14)).timestamp())
-            }
+            history_data = record.to_history_doc(catalog)
             
-            doc_ref = self.db.collection('price_history').document()
+            # ドキュメントIDをモデルIDと timestamp から決め、同じ結果を保存し直しても履歴が重複しないようにする
+            doc_ref = self.db.collection('price_history').document(history_doc_id(history_data))
             doc_ref.set(history_data)
             logger.info(f"price_historyコレクションに保存: {json.dumps(history_data, ensure_ascii=False)}")
+
+            # 移動平均・ボラティリティの統計を更新（失敗しても価格の保存は成功扱い）
+            try:
+                record_history_point(
+                    self.db, record.series, record.capacity, record.timestamp, record.kaitori_price_max
+                )
+            except Exception as e:
+                logger.warning(f"価格統計の更新に失敗: {record.series} {record.capacity}: {e}")
             
         except Exception as e:
             error_msg = f"Firestore保存エラー: {e}"
@@ -335,10 +456,10 @@ class PriceScraper:
                 .where('timestamp', '<', two_weeks_ago)
             )
             
-            docs = query.stream()
-            items = [doc.to_dict() for doc in docs]
+            # stream() はジェネレーターなので、件数の確認と削除の両方に使えるようリストにする
+            docs = list(query.stream())
             
-            if not items:
+            if not docs:
                 logger.info("2週間以上経過しているデータは存在しないため、削除処理をスキップしました")
                 return
             
@@ -357,29 +478,39 @@ class PriceScraper:
             # 削除処理の失敗は他の処理に影響を与えない
             pass
 
-    def _is_valid_capacity(self, series: str, capacity: str) -> bool:
-        """指定されたモデルと容量の組み合わせが有効かどうかを検証"""
-        valid_capacities = self.valid_capacities.get(series, [])
-        is_valid = capacity in valid_capacities
-        if not is_valid:
-            logger.warning(f"無効な容量の組み合わせ: {series} {capacity} (有効な容量: {valid_capacities})")
-        return is_valid
-
     def _identify_model_series(self, model_name: str) -> Optional[str]:
         """モデル名からシリーズを特定"""
-        model_name = model_name.strip()
-        for series, pattern in self.model_patterns.items():
-            if re.search(pattern, model_name, re.IGNORECASE):
-                return series
-        return None
+        return self.product_catalog.identify_series(model_name.strip())
+
+    def get_official_catalog(self) -> Dict[str, Dict]:
+        """
+        公式価格のスナップショット（シリーズ -> 容量別の価格データ）を返す。
+        
+        official_prices コレクションは1回の実行中に変わらないため、最初の呼び出しで
+        全件を1回だけ読み込み、以降はメモリ上のスナップショットを返す。
+        """
+        if self._official_catalog is None:
+            catalog = {}
+            try:
+                for doc in self.db.collection('official_prices').stream():
+                    catalog[doc.id] = doc.to_dict().get('price', {})
+                logger.info(f"公式価格のスナップショットを読み込みました: {len(catalog)}シリーズ")
+            except Exception as e:
+                # 読み込みに失敗した場合は空のスナップショットとし、次の呼び出しで再試行する
+                logger.error(f"Error loading official prices: {e}")
+                return {}
+            self._official_catalog = catalog
+        return self._official_catalog
 
     def get_official_prices(self, series: str) -> Dict[str, str]:
         """
-        Retrieves official iPhone prices by series and capacity from Firestore.
+        Retrieves official iPhone prices by series and capacity.
         
-        For the specified series, queries the official prices collection for each standard capacity.
-        Returns a dictionary mapping each capacity to the lowest available price among all colors.
-        If no prices are found or an error occurs, returns an empty dictionary.
+        Looks the series up in the official catalog snapshot (loaded once per run) and
+        returns a dictionary mapping each capacity to the lowest available price among all colors.
+        The lowest price comes from the precomputed stats stored at write time,
+        falling back to the color prices for documents written before stats existed.
+        If no prices are found, returns an empty dictionary.
         
         Args:
             series: The iPhone series name to look up.
@@ -387,44 +518,25 @@ class PriceScraper:
         Returns:
             A dictionary where keys are capacities (e.g., '128GB') and values are the lowest price as strings.
         """
-        try:
-            # Handle both "iPhone 16e" and "iPhone 16 e" formats
-            lookup_series = series.replace(' e', 'e') if ' e' in series else series
-            logger.info(f"Looking up official prices for {lookup_series} (original request: {series})")
-            
-            # 各容量の価格を取得
-            formatted_prices = {}
-            capacities = ['128GB', '256GB', '512GB', '1TB']
-            
-            for capacity in capacities:
-                try:
-                    doc_ref = self.db.collection('official_prices').document(lookup_series)
-                    doc = doc_ref.get()
-                    
-                    if doc.exists:
-                        data = doc.to_dict()
-                        # 容量別の価格を取得
-                        price_data = data.get('price', {})
-                        if capacity in price_data:
-                            formatted_prices[capacity] = str(price_data[capacity])
-                            logger.info(f"Found price for {lookup_series} {capacity}: {price_data[capacity]}")
-                        else:
-                            logger.warning(f"No price found for {lookup_series} {capacity}")
-                    else:
-                        logger.warning(f"No data found for {lookup_series} {capacity}")
-                except Exception as e:
-                    logger.error(f"Error getting price for {capacity}: {e}")
-                    continue
-            
-            if not formatted_prices:
-                logger.warning(f"No official prices found for {lookup_series}")
-            else:
-                logger.info(f"Found official prices for {lookup_series}: {formatted_prices}")
-            return formatted_prices
-                
-        except Exception as e:
-            logger.error(f"Error getting official prices: {e}")
+        # Handle both "iPhone 16e" and "iPhone 16 e" formats
+        lookup_series = series.replace(' e', 'e') if ' e' in series else series
+        price_data = self.get_official_catalog().get(lookup_series)
+        if not price_data:
+            logger.warning(f"No official prices found for {lookup_series}")
             return {}
+        
+        formatted_prices = {}
+        for capacity, capacity_data in price_data.items():
+            stats = capacity_data.get('stats') or {}
+            colors = capacity_data.get('colors') or {}
+            lowest = stats.get('min', min(colors.values()) if colors else None)
+            if lowest is None:
+                logger.warning(f"No price found for {lookup_series} {capacity}")
+                continue
+            formatted_prices[capacity] = str(lowest)
+        
+        logger.info(f"Found official prices for {lookup_series}: {formatted_prices}")
+        return formatted_prices
 
 def load_config() -> dict:
     """設定ファイルの読み込み"""
@@ -463,26 +575,245 @@ def load_config() -> dict:
         logger.error(error_msg)
         raise
 
-async def main():
-    """メイン処理"""
+def replay_fixtures(directory: str, output: Optional[str] = None, workers: int = 1) -> List[PriceRecord]:
+    """保存したHTMLを scrape_url と同じ解析処理で解析する（--replay。ネットワーク・Firestoreは使わない）
+
+    workers が2以上の場合は scrape_all_prices と同じプロセスプールで解析する。
+    """
+    fixtures = load_fixtures(directory)
+    results = []
+    start = time.perf_counter()
+    if workers > 1:
+        with create_parse_pool(workers) as pool:
+            parsed = list(pool.map(parse_price_html, [page_html for _, page_html in fixtures]))
+    else:
+        product_catalog = load_product_catalog()
+        parsed = [parse_price_html(page_html, product_catalog) for _, page_html in fixtures]
+    for (url, _), records in zip(fixtures, parsed):
+        logger.info(f"{len(records)}件: {url}")
+        results.extend(records)
+    elapsed = time.perf_counter() - start
+
+    logger.info(
+        f"{len(fixtures)}ページから合計{len(results)}件の価格データを解析しました"
+        f"（{elapsed * 1000:.1f}ms、{len(results) / elapsed if elapsed else 0:,.0f}行/秒）"
+    )
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump([record.to_kaitori_doc() for record in results], f, ensure_ascii=False, indent=2)
+        logger.info(f"解析結果を保存しました: {output}")
+    return results
+
+
+async def record(directory: str) -> None:
+    """設定のURLごとのページHTMLを保存する（--record）"""
+    config = load_config()
+    async with PriceScraper(config, connect_firestore=False) as scraper:
+        await scraper.record_fixtures(directory)
+
+
+def open_journal(resume: Optional[str] = None) -> ScrapeJournal:
+    """実行のジャーナルを開く
+
+    --resume の run_id（記録がなければエラー）、SCRAPE_RUN_ID（記録があれば再開）、
+    どちらもなければ新しい run_id を使う。
+    """
+    return ScrapeJournal.open(resume or os.getenv('SCRAPE_RUN_ID') or None, resume=bool(resume))
+
+
+async def scrape_shard(spec: str, output: str, resume: Optional[str] = None) -> None:
+    """設定のURLのうちシャード spec（i/N）の分だけを取得・解析して output に保存する（--shard）
+
+    Firestoreには接続しない。保存は --merge でシャードの出力をまとめてから行う。
+    """
+    index, count = parse_shard(spec)
+    config = load_config()
+    urls = shard_urls(config['scraper']['kaitori_rudea_urls'], index, count)
+    logger.info(f"シャード {index}/{count}: {len(urls)}件のURL")
+    journal = open_journal(resume)
+    async with PriceScraper(config, connect_firestore=False) as scraper:
+        scraper.journal = journal
+        results_by_url = await scraper.scrape_pages(urls) if urls else {}
+    failed_urls = [url for url in urls if url not in results_by_url]
+    save_shard_output(output, index, count, urls, results_by_url, failed_urls)
+    logger.info(
+        f"シャード {index}/{count} の結果を保存しました: {output}"
+        f"（{sum(len(records) for records in results_by_url.values())}件、取得失敗 {len(failed_urls)}件）"
+    )
+    if urls and len(failed_urls) == len(urls):
+        sys.exit(1)
+
+
+async def run_local_shards(count: int, directory: str, run_id: str) -> List[str]:
+    """シャード 1/N〜N/N をそれぞれ別のプロセス（別のブラウザ）で並列に実行する（--local-shards）
+
+    各シャードは同じ run_id のジャーナルに記録する。
+
+    Returns:
+        出力できたシャードのファイルのパス
+    """
+    env = dict(os.environ, SCRAPE_RUN_ID=run_id)
+    # 解析のプロセス数は、指定がなければCPU数をシャードで分け合う
+    env.setdefault('SCRAPE_PARSE_WORKERS', str(max(1, (os.cpu_count() or 1) // count)))
+    outputs = [os.path.join(directory, f"shard-{index}.json") for index in range(1, count + 1)]
+    processes = [
+        await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), '--shard', f"{index}/{count}", '--output', output, env=env
+        )
+        for index, output in enumerate(outputs, 1)
+    ]
+    return_codes = await asyncio.gather(*(process.wait() for process in processes))
+    for index, return_code in enumerate(return_codes, 1):
+        if return_code != 0:
+            logger.error(f"シャード {index}/{count} が終了コード {return_code} で終了しました")
+    return [output for output in outputs if os.path.exists(output)]
+
+
+def load_merged_results(paths: List[str], config: Dict, job: Optional[ScrapeJobTracker] = None) -> List[PriceRecord]:
+    """シャードの出力を設定のURLの順に1つにまとめる（--merge / --local-shards）"""
+    if not paths:
+        raise RuntimeError("シャードの出力がありません")
+    merged = merge_shard_outputs(paths, config['scraper']['kaitori_rudea_urls'])
+    if merged['missing_shards']:
+        logger.error(f"出力がないシャード: {', '.join(merged['missing_shards'])}")
+    if job:
+        job.set_total(len(merged['pages']))
+        for page in merged['pages']:
+            job.url_done(page['items'])
+    failed = [page['url'] for page in merged['pages'] if not page['ok']]
+    if failed:
+        logger.warning(f"取得に失敗したURL: {len(failed)}件")
+    logger.info(f"{len(paths)}件のシャードの出力から合計{len(merged['results'])}件の価格データをまとめました")
+    return merged['results']
+
+
+def persist_results(scraper: PriceScraper, job: ScrapeJobTracker, results: List[PriceRecord],
+                    journal: Optional[ScrapeJournal] = None, plan: Optional[Dict] = None) -> None:
+    """外れ値ゲートを通した価格データを Firestore に保存する
+
+    ゲートの判定結果と保存するレコードは保存を始める前にジャーナルに記録する（plan）。
+    plan がある場合（保存の途中で止まった実行の再開）はゲートを通し直さずに同じ内容を保存する。
+    price_history・price_quarantine のドキュメントIDは内容から決まるため、保存し直しても重複しない。
+    """
+    if plan is None:
+        # 外れ値ゲート（直近の価格から大きく外れた行は保存せず、quarantine に記録）
+        gate = PriceGate.load(scraper.db)
+        accepted, quarantined = gate.filter(results)
+        report = gate.report()
+
+        # 色ごとの行をモデルごとの1件にまとめる
+        records = merge_by_model(accepted)
+        if journal:
+            journal.save_plan(
+                records, quarantined, report, {sku: window.to_dict() for sku, window in gate.windows.items()}
+            )
+    else:
+        logger.info("ジャーナルに記録した保存内容で保存し直します")
+        gate = PriceGate({sku: PriceWindow.from_dict(window) for sku, window in plan['windows'].items()})
+        records, quarantined, report = plan['records'], plan['quarantined'], plan['report']
+
+    gate.save(scraper.db, quarantined, job_id=job.job_id, run_id=journal.run_id if journal else None)
+    job.record_validation(report)
+    logger.info(
+        f"外れ値ゲート: accept {report['accept']}件 / quarantine {report['quarantine']}件 / reject {report['reject']}件"
+    )
+    for flagged in report['flagged']:
+        logger.warning(f"外れ値として除外: {json.dumps(flagged, ensure_ascii=False)}")
+
+    # シリーズ・容量・色のカタログIDを割り当て（price_history はIDで保存する）
+    catalog = register_catalog(scraper.db, records)
+
+    # 結果の保存
+    for record in records:
+        scraper.save_to_firestore(record, catalog)
+        job.item_written()
+
+    # 古いデータの削除
+    scraper.delete_old_data()
+
+
+async def main(merge_paths: Optional[List[str]] = None, local_shards: int = 0, resume: Optional[str] = None):
+    """メイン処理
+
+    merge_paths を指定するとシャードの出力（--shard）をまとめて保存し、
+    local_shards を指定するとシャードごとのプロセスで取得してからまとめて保存する。
+    resume を指定すると、その実行のジャーナルに記録済みのURL・保存内容を使って再開する。
+    """
+    job = None
     try:
         # 設定ファイルの読み込み
         config = load_config()
+        journal = open_journal(resume)
+        if journal.is_completed():
+            logger.info(f"実行 {journal.run_id} は完了済みです")
+            return
+        scraper = PriceScraper(config)
 
-        # スクレイピングの実行
-        async with PriceScraper(config) as scraper:
-            results = await scraper.scrape_all_prices()
-            
-            # 結果の保存
-            for result in results:
-                scraper.save_to_firestore(result)
+        # scrape_prices エンドポイントのジョブに進捗を記録（実行中のジョブがあれば終了）。
+        # 再開時はジャーナルに記録したジョブを引き継ぐ（停止したワーカーのジョブは running のまま残っているため）
+        job = ScrapeJobTracker.start(scraper.db, os.getenv('SCRAPE_JOB_ID') or journal.job_id())
+        if job is None:
+            return
+        journal.record_job(job.job_id)
+        scraper.job = job
+        scraper.journal = journal
 
-            # 古いデータの削除
-            scraper.delete_old_data()
+        # 保存内容を記録済みの場合（保存の途中で止まった実行）は取得し直さない
+        results = []
+        plan = journal.load_plan()
+        if plan is None:
+            if local_shards:
+                with tempfile.TemporaryDirectory(prefix='scrape-shards-') as directory:
+                    paths = await run_local_shards(local_shards, directory, journal.run_id)
+                    results = load_merged_results(paths, config, job)
+            elif merge_paths:
+                results = load_merged_results(merge_paths, config, job)
+            else:
+                # スクレイピングの実行
+                async with scraper:
+                    results = await scraper.scrape_all_prices()
+
+        persist_results(scraper, job, results, journal, plan)
+        job.finish()
+        journal.mark_completed({'job_id': job.job_id, 'items_written': job.items_written})
+        logger.info(f"実行 {journal.run_id} が完了しました")
 
     except Exception as e:
         logger.error(f"予期せぬエラーが発生しました: {e}")
+        if job:
+            job.finish(error=str(e))
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='買取価格のスクレイピング')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', metavar='DIR', help='設定のURLごとのページHTMLを DIR に保存する（解析・保存はしない）')
+    mode.add_argument('--replay', metavar='DIR', help='DIR に保存したHTMLを解析する（ネットワーク・Firestoreを使わない）')
+    mode.add_argument('--shard', metavar='i/N', help='設定のURLのうちシャード i の分だけを取得・解析して --output に保存する（Firestoreを使わない）')
+    mode.add_argument('--merge', metavar='FILE', nargs='+', help='--shard の出力をまとめて Firestore に保存する')
+    mode.add_argument('--local-shards', metavar='N', type=int, help='N 個のプロセス（ブラウザ）でシャードを並列に取得してからまとめて保存する')
+    parser.add_argument('--output', help='--replay の解析結果 / --shard の出力を保存するJSONファイル')
+    parser.add_argument('--parse-workers', type=int, default=1, help='--replay の解析に使うプロセス数')
+    parser.add_argument('--resume', metavar='RUN_ID', help='中断した実行をジャーナルから再開する（記録済みのURLは取得しない）')
+    args = parser.parse_args()
+
+    if args.shard:
+        if not args.output:
+            parser.error('--shard には --output を指定してください')
+        try:
+            parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        asyncio.run(scrape_shard(args.shard, args.output, args.resume))
+    elif args.merge:
+        asyncio.run(main(merge_paths=args.merge, resume=args.resume))
+    elif args.local_shards is not None:
+        if args.local_shards < 1:
+            parser.error('--local-shards には1以上を指定してください')
+        asyncio.run(main(local_shards=args.local_shards, resume=args.resume))
+    elif args.record:
+        asyncio.run(record(args.record))
+    elif args.replay:
+        replay_fixtures(args.replay, args.output, args.parse_workers)
+    else:
+        asyncio.run(main(resume=args.resume))
@@ -0,0 +1,105 @@
+"""
+スクレイピングのシャード（URLの分割）
+- scrape_prices.py --shard i/N で kaitori_rudea_urls のうちシャード i の分だけを取得・解析し、
+  結果をシャードの出力（JSON）に保存する（Firestoreには保存しない）
+- scrape_prices.py --merge FILE... でシャードの出力を1つのスナップショットにまとめて保存する
+- URLの割り当てはURLのハッシュで決めるため、URLの追加・削除で他のURLのシャードは変わらない
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from common.price_record import PriceRecord
+from scrape_journal import decode_records, encode_records
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """"i/N"（1 ≤ i ≤ N）を (i, N) にする
+
+    Raises:
+        ValueError: 形式や範囲が正しくない場合
+    """
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"シャードは i/N の形式で指定してください: {spec}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"シャードの番号は 1 から N の範囲で指定してください: {spec}")
+    return index, count
+
+
+def shard_of(url: str, count: int) -> int:
+    """URLのシャード番号（1 から count）。実行環境によらず同じ値になるよう sha1 を使う"""
+    digest = hashlib.sha1(url.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def shard_urls(urls: Sequence[str], index: int, count: int) -> List[str]:
+    """シャード index に割り当てられたURL（設定の順）"""
+    return [url for url in urls if shard_of(url, count) == index]
+
+
+def save_shard_output(path: str, index: int, count: int, urls: Sequence[str],
+                      results_by_url: Dict[str, List[PriceRecord]], failed_urls: Sequence[str] = ()) -> str:
+    """シャードの結果をURLごとに保存する"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    failed = set(failed_urls)
+    pages = [
+        {
+            'url': url,
+            'ok': url not in failed,
+            'records': encode_records(results_by_url.get(url, []))
+        }
+        for url in urls
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'shard': f"{index}/{count}",
+            'created_at': datetime.now().isoformat(),
+            'pages': pages
+        }, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def merge_shard_outputs(paths: Sequence[str], urls: Optional[Sequence[str]] = None) -> Dict:
+    """シャードの出力を1つのスナップショットにまとめる
+
+    同じURLが複数のシャードの出力にある場合（シャードの再実行など）は後のファイルを使う。
+    urls（設定のURL）を指定すると、その順に並べる（設定にないURLは後ろに出力の順で並べる）。
+
+    Returns:
+        {'results': [PriceRecord], 'pages': [{'url', 'ok', 'items'}], 'missing_shards': [i/N]}
+    """
+    by_url: Dict[str, Dict] = {}
+    seen_shards = set()
+    shard_count = None
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            output = json.load(f)
+        index, count = parse_shard(output['shard'])
+        if shard_count is not None and count != shard_count:
+            raise ValueError(f"シャード数が異なる出力はまとめられません: {path}（{count} と {shard_count}）")
+        shard_count = count
+        seen_shards.add(index)
+        for page in output.get('pages', []):
+            by_url.pop(page['url'], None)
+            by_url[page['url']] = page
+
+    order = [url for url in (urls or []) if url in by_url]
+    ordered = set(order)
+    order += [url for url in by_url if url not in ordered]
+    results = []
+    pages = []
+    for url in order:
+        page = by_url[url]
+        records = decode_records(page.get('records', []))
+        results.extend(records)
+        pages.append({'url': url, 'ok': page.get('ok', True), 'items': len(records)})
+
+    missing = [f"{index}/{shard_count}" for index in range(1, (shard_count or 0) + 1) if index not in seen_shards]
+    return {'results': results, 'pages': pages, 'missing_shards': missing}
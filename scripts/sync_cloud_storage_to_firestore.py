@@ -9,11 +9,18 @@ Cloud Storageの最新スクレイピングデータをFirestoreに同期する
 import json
 import logging
 import os
+import sys
 from datetime import datetime, timedelta
 
 from google.cloud import firestore, storage
 from google.oauth2 import service_account
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions'))
+
+from common.catalog import register_catalog  # noqa: E402
+from common.history_stats import record_history_point  # noqa: E402
+from common.price_record import PriceRecord, history_doc_id, merge_by_model  # noqa: E402
+
 # ログ設定
 logging.basicConfig(
     level=logging.INFO,
@@ -55,80 +62,42 @@ def sync_cloud_storage_to_firestore():
             doc.reference.delete()
         logger.info("Cleared existing kaitori_prices collection")
         
-        # 容量ごとにデータを集計してFirestoreに保存
-        series_capacity_map = {}
-        
-        for item in kaitori_data:
-            series = item.get('series')
-            capacity = item.get('capacity')
-            kaitori_price_min = item.get('kaitori_price_min', 0)
-            kaitori_price_max = item.get('kaitori_price_max', 0)
-            colors = item.get('colors', [])
-            
-            if not series or not capacity:
-                continue
-            
-            # 容量の正規化: 1GB → 1TB
-            normalized_capacity = capacity
-            if capacity == "1GB":
-                normalized_capacity = "1TB"
-                logger.info(f"Normalized capacity from 1GB to 1TB for {series}")
-            
-            key = f"{series}_{normalized_capacity}"
-            if key not in series_capacity_map:
-                series_capacity_map[key] = {
-                    'series': series,
-                    'capacity': normalized_capacity,
-                    'kaitori_price_min': float('inf'),
-                    'kaitori_price_max': 0,
-                    'colors': {},
-                    'source': 'kaitori-rudea',
-                    'updated_at': datetime.now().isoformat()
-                }
-            
-            # 最小・最大価格を更新
-            if kaitori_price_min < series_capacity_map[key]['kaitori_price_min']:
-                series_capacity_map[key]['kaitori_price_min'] = kaitori_price_min
-            if kaitori_price_max > series_capacity_map[key]['kaitori_price_max']:
-                series_capacity_map[key]['kaitori_price_max'] = kaitori_price_max
-            
-            # 色ごとの価格を保存
-            for color in colors:
-                series_capacity_map[key]['colors'][color] = kaitori_price_min
+        # 容量ごとにデータを集計してFirestoreに保存（1GB → 1TB の補正は PriceRecord で行う）
+        # 時刻はデータの timestamp / updated_at（スクレイピング時の時刻）を使い、ない場合だけ現在時刻にする
+        current_timestamp = int(datetime.now().timestamp())
+        records = merge_by_model(
+            record
+            for record in (
+                PriceRecord.from_firestore(
+                    item, timestamp=None if item.get('timestamp') or item.get('updated_at') else current_timestamp
+                )
+                for item in kaitori_data
+            )
+            if record is not None
+        )
         
         # Firestoreに保存
-        for key, data in series_capacity_map.items():
-            if data['kaitori_price_min'] == float('inf'):
-                data['kaitori_price_min'] = 0
-            
+        for record in records:
             doc_ref = db.collection('kaitori_prices').document()
-            doc_ref.set(data)
-            logger.info(f"Saved to Firestore: {data['series']} {data['capacity']} - min: {data['kaitori_price_min']}, max: {data['kaitori_price_max']}")
-        
-        # 履歴データも保存（price_historyコレクション）
-        current_timestamp = int(datetime.now().timestamp())
-        for key, data in series_capacity_map.items():
-            if data['kaitori_price_min'] == float('inf'):
-                continue
-                
-            history_data = {
-                'model': key,
-                'timestamp': current_timestamp,
-                'series': data['series'],
-                'capacity': data['capacity'],
-                'colors': data['colors'],
-                'kaitori_price_min': data['kaitori_price_min'],
-                'kaitori_price_max': data['kaitori_price_max'],
-                'source': data['source'],
-                'date': datetime.now().strftime('%Y-%m-%d'),
-                'expiration_time': int((datetime.now() + timedelta(days=14)).timestamp())
-            }
-            
-            doc_ref = db.collection('price_history').document()
-            doc_ref.set(history_data)
-            logger.info(f"Saved history: {key}")
-        
-        logger.info(f"Successfully synced {len(series_capacity_map)} items to Firestore")
+            doc_ref.set(record.to_kaitori_doc())
+            logger.info(f"Saved to Firestore: {record.series} {record.capacity} - min: {record.kaitori_price_min}, max: {record.kaitori_price_max}")
+        
+        # 履歴データも保存（price_historyコレクション。シリーズ・容量・色はカタログIDで保存）
+        # IDはスクレイピングと同じ形式のため、スクレイピングが保存済みの履歴は上書きになり重複しない
+        catalog = register_catalog(db, records)
+        for record in records:
+            history_data = record.to_history_doc(catalog)
+            db.collection('price_history').document(history_doc_id(history_data)).set(history_data)
+            logger.info(f"Saved history: {record.model}")
+
+            try:
+                record_history_point(
+                    db, record.series, record.capacity, record.timestamp, record.kaitori_price_max
+                )
+            except Exception as e:
+                logger.warning(f"Failed to update price stats: {record.model}: {e}")
+        
+        logger.info(f"Successfully synced {len(records)} items to Firestore")
         
         # 古い履歴データのクリーンアップ（2週間以上前）
         cleanup_old_history_data(db)
@@ -11,6 +11,7 @@
 """
 
 import json
+import os
 import sys
 import time
 from typing import Any, Dict, List, Optional
@@ -18,7 +19,8 @@ from typing import Any, Dict, List, Optional
 import requests
 
 # Cloud Functions のベースURL
-BASE_URL = "https://asia-northeast1-price-comparison-app-463007.cloudfunctions.net"
+# API_BASE_URL でローカルハーネス（scripts/local_functions_harness.py）などに切り替え可能
+BASE_URL = os.getenv("API_BASE_URL", "https://asia-northeast1-price-comparison-app-463007.cloudfunctions.net")
 
 class DetailedAPITester:
     def __init__(self):
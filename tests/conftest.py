@@ -0,0 +1,63 @@
+"""
+テストの共通設定
+- functions/（Cloud Functions のソース）と scripts/ を import できるようにする
+- scripts/scrape_prices.py が functions/scrape_prices パッケージより優先されないよう scripts/ は末尾に追加する
+"""
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(ROOT, 'functions'))
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import flask  # noqa: E402
+import pytest  # noqa: E402
+
+import common.cache as cache  # noqa: E402
+import common.rate_limit as rate_limit  # noqa: E402
+from local_functions_harness import InMemoryFirestore, install_fake_transactional, seed_synthetic_data  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def reset_instance_state():
+    """インスタンス内のキャッシュとレート制限をテストごとにリセットする"""
+    for instance_cache in cache._caches.values():
+        instance_cache.clear()
+    rate_limit._limiter = None
+    yield
+
+
+@pytest.fixture
+def seeded_db():
+    """合成データを入れたインメモリのFirestore"""
+    install_fake_transactional()
+    return seed_synthetic_data(InMemoryFirestore(), days=3)
+
+
+# テスト用リクエストの接続元アドレス
+REMOTE_ADDR = '192.0.2.1'
+
+
+@pytest.fixture
+def call_handler():
+    """Flask のテスト用リクエストでハンドラーを呼び出し、(body, status, headers) を返す"""
+    app = flask.Flask('tests')
+
+    def call(handler, path='/', method='GET', headers=None, json=None):
+        with app.test_request_context(path, method=method, headers=headers or {}, json=json,
+                                      environ_base={'REMOTE_ADDR': REMOTE_ADDR}):
+            return handler(flask.request)
+
+    return call
+
+
+@pytest.fixture(scope='session')
+def scrape_script():
+    """scripts/scrape_prices.py（functions/scrape_prices パッケージと同名のため、パスから読み込む）"""
+    spec = importlib.util.spec_from_file_location('scrape_prices_script', os.path.join(ROOT, 'scripts', 'scrape_prices.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,98 @@
+from common.alerts import AlertIndex
+from common.price_record import model_key
+
+EVALUATED_AT = '2026-01-01T00:00:00'
+
+
+def make_alert(id_, threshold, direction, series='iPhone 17', capacity='256GB', evaluated=True):
+    alert = {
+        'id': id_,
+        'series': series,
+        'capacity': capacity,
+        'model': model_key(series, capacity),
+        'threshold': threshold,
+        'direction': direction,
+        'recipient': 'user@example.com'
+    }
+    if evaluated:
+        alert['last_evaluated_at'] = EVALUATED_AT
+    return alert
+
+
+def matched_ids(index, price, previous_price=None, series='iPhone 17', capacity='256GB'):
+    return sorted(alert['id'] for alert in index.match(series, capacity, price, previous_price))
+
+
+def test_above_fires_when_price_crosses_threshold():
+    index = AlertIndex.build([
+        make_alert('a100', 100000, 'above'),
+        make_alert('a110', 110000, 'above'),
+        make_alert('a120', 120000, 'above'),
+    ])
+    # previous_price < threshold <= price
+    assert matched_ids(index, 110000, 100000) == ['a110']
+    assert matched_ids(index, 125000, 99000) == ['a100', 'a110', 'a120']
+
+
+def test_below_fires_when_price_crosses_threshold():
+    index = AlertIndex.build([
+        make_alert('b100', 100000, 'below'),
+        make_alert('b110', 110000, 'below'),
+    ])
+    # price <= threshold < previous_price
+    assert matched_ids(index, 110000, 120000) == ['b110']
+    assert matched_ids(index, 95000, 120000) == ['b100', 'b110']
+
+
+def test_evaluated_alert_does_not_refire_without_crossing():
+    index = AlertIndex.build([make_alert('a100', 100000, 'above'), make_alert('b90', 90000, 'below')])
+    assert matched_ids(index, 105000, 105000) == []
+    assert matched_ids(index, 106000, 105000) == []
+    # 逆方向の変化では発火しない
+    assert matched_ids(index, 95000, 105000) == []
+
+
+def test_without_previous_price_matches_current_condition():
+    index = AlertIndex.build([make_alert('a100', 100000, 'above'), make_alert('b90', 90000, 'below')])
+    assert matched_ids(index, 105000) == ['a100']
+    assert matched_ids(index, 85000) == ['b90']
+
+
+def test_never_evaluated_alert_fires_on_current_price():
+    index = AlertIndex.build([
+        make_alert('new', 100000, 'above', evaluated=False),
+        make_alert('old', 100000, 'above'),
+    ])
+    # 作成時点で条件を満たしている未判定のアラートは、価格が動かなくても発火する
+    assert matched_ids(index, 105000, 105000) == ['new']
+    assert [alert['id'] for alert in index.new_alerts('iPhone 17', '256GB')] == ['new']
+
+
+def test_notified_alert_counts_as_evaluated():
+    alert = make_alert('notified', 100000, 'above', evaluated=False)
+    alert['last_notified_at'] = EVALUATED_AT
+    index = AlertIndex.build([alert])
+    assert matched_ids(index, 105000, 105000) == []
+    assert index.new_alerts('iPhone 17', '256GB') == []
+
+
+def test_add_matches_build():
+    alerts = [
+        make_alert('a1', 120000, 'above'),
+        make_alert('a2', 100000, 'above'),
+        make_alert('b1', 90000, 'below'),
+        make_alert('n1', 95000, 'below', evaluated=False),
+    ]
+    built = AlertIndex.build(alerts)
+    added = AlertIndex()
+    for alert in alerts:
+        added.add(alert)
+    assert len(built) == len(added) == 4
+    for price, previous_price in [(125000, 95000), (85000, 125000), (100000, 100000)]:
+        assert matched_ids(built, price, previous_price) == matched_ids(added, price, previous_price)
+
+
+def test_other_models_do_not_match():
+    index = AlertIndex.build([make_alert('a100', 100000, 'above', capacity='512GB')])
+    assert matched_ids(index, 150000, 90000) == []
+    assert matched_ids(index, 150000, 90000, capacity='512GB') == ['a100']
@@ -0,0 +1,95 @@
+import json
+import threading
+
+import pytest
+
+import api_status.main as api_status_main
+import api_status.probes as probes
+import common.firestore_client as firestore_client
+from api_status.probes import DependencyProbe, _percentile
+
+
+class CountingCheck:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_probe_result_is_cached_for_the_ttl():
+    check = CountingCheck(['connected'])
+    probe = DependencyProbe('database', check, ttl_seconds=60)
+    results = [probe.get() for _ in range(5)]
+    assert check.calls == 1
+    assert results[-1]['status'] == 'connected'
+    assert results[-1]['samples'] == 1
+    assert results[-1]['last_success'] is not None and results[-1]['last_failure'] is None
+
+
+def test_expired_probe_is_refreshed_inline():
+    check = CountingCheck(['connected', RuntimeError('unreachable'), 'connected'])
+    probe = DependencyProbe('database', check, ttl_seconds=0)
+    assert probe.get()['status'] == 'connected'
+    failed = probe.get()
+    assert failed['status'] == 'disconnected'
+    assert failed['error'] == 'unreachable'
+    assert failed['last_failure'] is not None
+    recovered = probe.get()
+    assert check.calls == 3
+    assert recovered['status'] == 'connected' and 'error' not in recovered
+    # 復旧後も最後の失敗時刻は残す
+    assert recovered['last_failure'] == failed['last_failure']
+    assert recovered['samples'] == 3
+
+
+def test_requests_during_a_refresh_do_not_wait():
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_check():
+        entered.set()
+        release.wait(5)
+        return 'connected'
+
+    probe = DependencyProbe('database', slow_check, ttl_seconds=60)
+    worker = threading.Thread(target=probe.get)
+    worker.start()
+    entered.wait(5)
+    try:
+        # 再取得中は待たずに現在の（未取得の）結果を返す
+        assert probe.get()['status'] == 'unknown'
+    finally:
+        release.set()
+        worker.join()
+    assert probe.get()['status'] == 'connected'
+
+
+def test_percentiles_use_the_nearest_rank():
+    values = sorted(range(1, 101))
+    assert _percentile(values, 50) == 50
+    assert _percentile(values, 95) == 95
+    assert _percentile([7], 95) == 7
+    assert _percentile([], 50) is None
+
+
+@pytest.fixture
+def fresh_probes(seeded_db, monkeypatch):
+    monkeypatch.setattr(firestore_client, '_client', seeded_db)
+    monkeypatch.delenv('BUCKET_NAME', raising=False)
+    monkeypatch.setattr(probes, 'PROBES', {
+        'database': DependencyProbe('database', probes._check_firestore, ttl_seconds=60),
+        'storage': DependencyProbe('storage', probes._check_storage, ttl_seconds=60),
+    })
+    return seeded_db
+
+
+def test_status_polls_share_one_probe_check(fresh_probes, call_handler):
+    bodies = [call_handler(api_status_main.api_status)[0] for _ in range(3)]
+    result = json.loads(bodies[-1])
+    assert result['services'] == {'api': 'running', 'database': 'connected', 'storage': 'not_configured'}
+    assert result['probes']['database']['samples'] == 1
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import get_prices.main as get_prices_main
+from common.cache import COALESCED, HIT, MISS, STALE, SingleFlightCache
+
+
+class BlockingLoader:
+    """release されるまで戻らない loader（呼び出し回数を数える）"""
+
+    def __init__(self, value='loaded'):
+        self.value = value
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(5)
+        return self.value
+
+
+def test_hit_after_miss():
+    cache = SingleFlightCache('test_hit', ttl_seconds=60)
+    assert cache.get('k', lambda: 1) == (1, MISS)
+    assert cache.get('k', lambda: 2) == (1, HIT)
+    assert cache.is_fresh('k') and not cache.is_fresh('other')
+
+
+def test_concurrent_misses_share_one_load():
+    cache = SingleFlightCache('test_coalesce', ttl_seconds=60)
+    loader = BlockingLoader()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(cache.get, 'k', loader)
+        loader.entered.wait(5)
+        waiters = [pool.submit(cache.get, 'k', loader) for _ in range(3)]
+        # 全員が読み込み中の Future を待ち始めてから読み込みを終わらせる
+        deadline = time.monotonic() + 5
+        while cache.stats()[COALESCED] < 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        loader.release.set()
+        results = [leader.result()] + [waiter.result() for waiter in waiters]
+    assert loader.calls == 1
+    assert results == [('loaded', MISS)] + [('loaded', COALESCED)] * 3
+    stats = cache.stats()
+    assert stats[MISS] == 1 and stats[COALESCED] == 3 and stats['inflight'] == 0
+
+
+def test_expired_value_is_served_stale_while_reloading():
+    cache = SingleFlightCache('test_stale', ttl_seconds=0)
+    cache.get('k', lambda: 'old')
+    loader = BlockingLoader('new')
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        reload = pool.submit(cache.get, 'k', loader)
+        loader.entered.wait(5)
+        assert cache.get('k', loader) == ('old', STALE)
+        loader.release.set()
+        assert reload.result() == ('new', MISS)
+
+
+def test_waiter_times_out_when_the_load_is_slow():
+    cache = SingleFlightCache('test_timeout', ttl_seconds=60, wait_timeout=0.05)
+    loader = BlockingLoader()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(cache.get, 'k', loader)
+        loader.entered.wait(5)
+        try:
+            with pytest.raises(TimeoutError):
+                cache.get('k', loader)
+        finally:
+            loader.release.set()
+        assert leader.result() == ('loaded', MISS)
+    assert cache.stats()['timeouts'] == 1
+
+
+def test_failed_load_is_not_cached():
+    cache = SingleFlightCache('test_error', ttl_seconds=60)
+
+    def fail():
+        raise RuntimeError('firestore down')
+
+    with pytest.raises(RuntimeError):
+        cache.get('k', fail)
+    assert cache.get('k', lambda: 'ok') == ('ok', MISS)
+    assert cache.stats()['errors'] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SingleFlightCache('test_evict', ttl_seconds=60, max_entries=2)
+    cache.get('a', lambda: 1)
+    cache.get('b', lambda: 2)
+    cache.get('a', lambda: 1)
+    cache.get('c', lambda: 3)
+    assert cache.is_fresh('a') and cache.is_fresh('c') and not cache.is_fresh('b')
+
+
+@pytest.fixture
+def db(seeded_db, monkeypatch):
+    monkeypatch.setattr(get_prices_main, 'get_firestore_client', lambda: seeded_db)
+    return seeded_db
+
+
+def test_get_prices_serves_repeat_requests_from_the_cache(db, call_handler):
+    first = call_handler(get_prices_main.get_prices, path='/?series=iPhone 17')
+    reads = db.stats()['reads']
+    second = call_handler(get_prices_main.get_prices, path='/?series=iPhone 17')
+    assert first[1] == second[1] == 200
+    assert (first[2]['X-Cache'], second[2]['X-Cache']) == ('MISS', 'HIT')
+    assert json.loads(first[0]) == json.loads(second[0])
+    assert db.stats()['reads'] == reads
+
+
+def test_get_prices_returns_503_when_a_waiter_times_out(db, call_handler, monkeypatch):
+    def timed_out(key, loader):
+        raise TimeoutError('in-flight load')
+
+    monkeypatch.setattr(get_prices_main._prices_cache, 'get', timed_out)
+    body, status, headers = call_handler(get_prices_main.get_prices, path='/?series=iPhone 17')
+    assert status == 503
+    assert 'retry' in json.loads(body)['error']
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+import get_catalog.main as get_catalog_main
+import get_price_history.main as history_main
+from common.catalog import CATALOG_COLLECTION, CATALOG_IDS_ID, CatalogRegistry, compact_history, expand_history_doc, load_catalog, register_catalog
+from common.price_record import PriceRecord
+from local_functions_harness import InMemoryFirestore, install_fake_transactional
+
+TIMESTAMP = 1_760_000_000
+
+
+def test_ids_are_assigned_once_and_never_reused():
+    catalog = CatalogRegistry()
+    assert catalog.assign('series', 'iPhone 17') == (0, True)
+    assert catalog.assign('series', 'iPhone 16') == (1, True)
+    assert catalog.assign('series', 'iPhone 17') == (0, False)
+    restored = CatalogRegistry.from_dict(catalog.to_dict())
+    assert restored.assign('series', 'iPhone 17 Pro') == (2, True)
+    assert restored.name_of('series', '1') == 'iPhone 16'
+
+
+@pytest.mark.parametrize('model_id', ['0:x', 'x:0', '0', '', 5, '0:9', '0:0:0'])
+def test_malformed_or_unknown_ids_are_unknown(model_id):
+    catalog = CatalogRegistry({'series': {'iPhone 17': 0}, 'capacities': {'256GB': 0}})
+    assert catalog.model_names('0:0') == ('iPhone 17', '256GB')
+    assert catalog.model_names(model_id) is None
+    assert expand_history_doc({'model_id': model_id, 'timestamp': TIMESTAMP}, catalog) is None
+    assert catalog.name_of('colors', [1]) is None
+
+
+def test_register_catalog_bumps_the_version_only_when_names_are_added():
+    install_fake_transactional()
+    db = InMemoryFirestore()
+    records = [PriceRecord.create('iPhone 17', '256GB', {'黒': 120000, '白': 118000}, timestamp=TIMESTAMP)]
+    catalog = register_catalog(db, records)
+    assert catalog.version == 1
+    assert catalog.model_id('iPhone 17', '256GB') == '0:0'
+    assert register_catalog(db, records).version == 1
+    catalog = register_catalog(db, records + [PriceRecord.create('iPhone 16', '256GB', {'黒': 1}, timestamp=TIMESTAMP)])
+    assert catalog.version == 2
+    assert load_catalog(db).model_id('iPhone 16', '256GB') == '1:0'
+
+
+def test_legacy_named_history_documents_pass_through():
+    doc = {'model': 'iPhone 17_256GB', 'series': 'iPhone 17', 'capacity': '256GB', 'timestamp': TIMESTAMP}
+    assert expand_history_doc(doc, CatalogRegistry()) is doc
+
+
+def test_compact_history_is_columnar_with_nulls():
+    history = [
+        {'timestamp': 1, 'kaitori_price_min': 10, 'kaitori_price_max': 12, 'colors': {'0': 10, '2': 12}},
+        {'timestamp': 2, 'kaitori_price_min': 11, 'kaitori_price_max': 11, 'colors': {'0': 11}},
+    ]
+    assert compact_history(history) == {
+        'timestamp': [1, 2],
+        'kaitori_price_min': [10, 11],
+        'kaitori_price_max': [12, 11],
+        'colors': {'0': [10, 11], '2': [12, None]},
+    }
+
+
+@pytest.fixture
+def db(seeded_db, monkeypatch):
+    monkeypatch.setattr(get_catalog_main, 'get_firestore_client', lambda: seeded_db)
+    monkeypatch.setattr(history_main, 'get_firestore_client', lambda: seeded_db)
+    return seeded_db
+
+
+def test_catalog_endpoint_is_cacheable_by_version(db, call_handler):
+    body, status, headers = call_handler(get_catalog_main.get_catalog)
+    assert status == 200
+    dictionary = json.loads(body)
+    assert headers['ETag'] == f'"catalog-{dictionary["version"]}"'
+    assert 'iPhone 17' in dictionary['series'].values()
+    body, status, _ = call_handler(get_catalog_main.get_catalog, headers={'If-None-Match': headers['ETag']})
+    assert (body, status) == ('', 304)
+
+
+def test_compact_history_response_expands_with_the_dictionary(db, call_handler):
+    path = '/?series=iPhone 17&capacity=256GB&days=7'
+    full = json.loads(call_handler(history_main.get_price_history, path=path)[0])
+    compact = json.loads(call_handler(history_main.get_price_history, path=path + '&format=compact')[0])
+    dictionary = json.loads(call_handler(get_catalog_main.get_catalog)[0])
+    assert compact['format'] == 'compact'
+    assert compact['catalog_version'] == dictionary['version']
+    series_id, capacity_id = compact['model_id'].split(':')
+    assert (dictionary['series'][series_id], dictionary['capacities'][capacity_id]) == ('iPhone 17', '256GB')
+    assert compact['history']['timestamp'] == [point['timestamp'] for point in full['history']]
+    for color_id, prices in compact['history']['colors'].items():
+        name = dictionary['colors'][color_id]
+        assert prices == [point['colors'].get(name) for point in full['history']]
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+import check_prices.main as check_prices_main
+from common.notifications import SlackTransport
+from common.price_record import model_key
+from local_functions_harness import InMemoryFirestore, install_fake_transactional
+
+SECRET = 'test-secret'
+
+
+@pytest.fixture
+def db(seeded_db, monkeypatch):
+    monkeypatch.setattr(check_prices_main, 'get_firestore_client', lambda: seeded_db)
+    monkeypatch.setenv('CHECK_PRICES_SECRET', SECRET)
+    monkeypatch.setenv('NOTIFICATION_TRANSPORT', 'stdout')
+    monkeypatch.delenv('SLACK_WEBHOOK_URL', raising=False)
+    return seeded_db
+
+
+def test_get_is_rejected_without_touching_firestore(db, call_handler):
+    body, status, headers = call_handler(check_prices_main.check_prices, method='GET')
+    assert status == 405
+    assert headers['Allow'] == 'POST'
+    assert db.stats()['reads'] == 0 and db.stats()['writes'] == 0
+
+
+@pytest.mark.parametrize('authorization', [None, 'Bearer wrong-secret', f'Basic {SECRET}', SECRET])
+def test_post_without_the_secret_is_unauthorized(db, call_handler, authorization):
+    headers = {'Authorization': authorization} if authorization else {}
+    body, status, response_headers = call_handler(check_prices_main.check_prices, method='POST', headers=headers)
+    assert status == 401
+    assert response_headers['WWW-Authenticate'] == 'Bearer'
+    assert db.stats()['reads'] == 0 and db.stats()['writes'] == 0
+
+
+def test_post_is_unauthorized_when_no_secret_is_configured(db, call_handler, monkeypatch):
+    monkeypatch.delenv('CHECK_PRICES_SECRET')
+    body, status, headers = call_handler(check_prices_main.check_prices, method='POST',
+                                         headers={'Authorization': 'Bearer '})
+    assert status == 401
+
+
+def test_authorized_post_evaluates_alerts(db, call_handler):
+    body, status, headers = call_handler(check_prices_main.check_prices, method='POST',
+                                         headers={'Authorization': f'Bearer {SECRET}'})
+    assert status == 200
+    result = json.loads(body)
+    assert result['models_checked'] > 0
+    assert result['alerts_active'] == len(db._collections['price_alerts'])
+    # 初回の判定では発火させず、判定済みの印だけを付ける
+    assert all('last_evaluated_at' in alert for alert in db._collections['price_alerts'].values())
+
+
+class RecordingTransport:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    def send(self, messages):
+        if self.fail:
+            raise ConnectionError('webhook unavailable')
+        self.sent.extend(messages)
+
+
+@pytest.fixture
+def alert_db(monkeypatch):
+    """1モデルの買取価格と、それを上回るしきい値の未判定アラート1件"""
+    install_fake_transactional()
+    db = InMemoryFirestore()
+    db.collection('kaitori_prices').document().set({
+        'series': 'iPhone 17', 'capacity': '256GB', 'kaitori_price_max': 120000
+    })
+    db.collection('price_alerts').document('alert-1').set({
+        'series': 'iPhone 17', 'capacity': '256GB', 'model': model_key('iPhone 17', '256GB'),
+        'threshold': 110000, 'direction': 'above', 'recipient': 'user@example.com', 'active': True
+    })
+    monkeypatch.setattr(check_prices_main, 'get_firestore_client', lambda: db)
+    monkeypatch.setenv('CHECK_PRICES_SECRET', SECRET)
+    return db
+
+
+def run_check(call_handler, path='/'):
+    body, status, headers = call_handler(check_prices_main.check_prices, path=path, method='POST',
+                                         headers={'Authorization': f'Bearer {SECRET}'})
+    assert status == 200
+    return json.loads(body)
+
+
+def test_failed_notifications_are_retried_on_the_next_run(alert_db, call_handler, monkeypatch):
+    failing = RecordingTransport(fail=True)
+    monkeypatch.setattr(check_prices_main, 'get_transport', lambda: failing)
+    result = run_check(call_handler)
+    assert result['alerts_triggered'] == 1
+    assert result['notifications']['failed'] == 1
+    events = alert_db._collections['alert_events']
+    assert [event['delivered'] for event in events.values()] == [False]
+
+    # 価格は変わらないので新たな発火はなく、失敗したイベントだけを再送する
+    working = RecordingTransport()
+    monkeypatch.setattr(check_prices_main, 'get_transport', lambda: working)
+    result = run_check(call_handler)
+    assert result['alerts_triggered'] == 0
+    assert result['notifications']['retried'] == 1
+    assert [message['recipient'] for message in working.sent] == ['user@example.com']
+    assert [event['delivered'] for event in events.values()] == [True]
+    assert 'last_notified_at' in alert_db._collections['price_alerts']['alert-1']
+
+
+def test_dry_run_writes_nothing_and_never_uses_slack(alert_db, call_handler, monkeypatch, capsys):
+    monkeypatch.delenv('NOTIFICATION_TRANSPORT', raising=False)
+    monkeypatch.setenv('SLACK_WEBHOOK_URL', 'https://hooks.slack.invalid/services/test')
+
+    def send_to_slack(self, messages):
+        raise AssertionError('dry run must not send to Slack')
+
+    monkeypatch.setattr(SlackTransport, 'send', send_to_slack)
+    alert_db.reset_stats()
+    result = run_check(call_handler, path='/?dry_run=1')
+    assert result['dry_run'] is True
+    assert result['alerts_triggered'] == 1
+    assert result['notifications']['events_sent'] == 1
+    assert alert_db.stats()['writes'] == 0
+    assert not alert_db._collections.get('alert_events')
+    assert 'last_evaluated_at' not in alert_db._collections['price_alerts']['alert-1']
+    assert 'user@example.com' in capsys.readouterr().out
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+import pytest
+
+from profile_cold_start import FUNCTIONS_DIR, IMPORT_MARKER, measure, parse_importtime, write_seed
+
+# コールドスタートで読み込まず、使うときまで遅延させる重いモジュール
+LAZY_MODULES = ('google.cloud.firestore', 'numpy', 'requests', 'lxml')
+
+
+def test_parse_importtime_reads_only_modules_after_the_marker():
+    stderr = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       100 |        100 | flask',
+        IMPORT_MARKER,
+        'import time: self [us] | cumulative | imported package',
+        'import time:        50 |         50 |   common.cors',
+        'import time:       120 |        170 | main',
+        'unrelated line',
+        'import time: garbage',
+    ])
+    assert parse_importtime(stderr) == [('common.cors', 50, 50), ('main', 120, 170)]
+
+
+def test_handlers_import_without_heavy_dependencies():
+    code = (
+        'import sys\n'
+        f'sys.path.insert(0, {FUNCTIONS_DIR!r})\n'
+        'import importlib, main\n'
+        'for name in main.HANDLER_NAMES:\n'
+        '    importlib.import_module(name + ".main")\n'
+        f'print(",".join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n'
+    )
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=FUNCTIONS_DIR, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == ''
+
+
+@pytest.fixture(scope='module')
+def seed_path(tmp_path_factory):
+    return write_seed(str(tmp_path_factory.mktemp('cold-start')), days=2)
+
+
+def test_health_responds_without_loading_firestore(seed_path):
+    result = measure('health', seed_path)
+    assert result['status'] == 200
+    assert not any(name.startswith('google.cloud') for name, _, _ in result['modules'])
+
+
+def test_check_prices_is_measured_with_an_authorized_request(seed_path):
+    result = measure('check_prices', seed_path)
+    assert result['status'] == 200
+    assert any(name == 'google.cloud.firestore' for name, _, _ in result['modules'])
@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+
+from get_price_history.downsample import downsample_history, lttb_indices
+
+
+def reference_lttb(x, y, n_out):
+    """比較用: 1点ずつ計算するLTTB（バケットの分け方は lttb_indices と同じ）"""
+    n = len(x)
+    edges = [int(edge) for edge in np.linspace(1, n - 1, n_out - 1)]
+    selected = [0]
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            next_x = sum(x[next_start:next_end]) / (next_end - next_start)
+            next_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        else:
+            next_x, next_y = x[-1], y[-1]
+        a = selected[-1]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - next_x) * (y[j] - y[a]) - (x[a] - x[j]) * (next_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+    selected.append(n - 1)
+    return selected
+
+
+def make_series(n, seed=1):
+    rng = random.Random(seed)
+    x = sorted(rng.sample(range(1_760_000_000, 1_760_000_000 + n * 3600), n))
+    y = [120000 + rng.randrange(-5000, 5001, 100) for _ in range(n)]
+    return x, y
+
+
+def test_matches_reference_implementation():
+    for n, n_out in [(50, 10), (500, 37), (1000, 200), (101, 100)]:
+        x, y = make_series(n, seed=n)
+        assert lttb_indices(x, y, n_out).tolist() == reference_lttb(x, y, n_out)
+
+
+def test_keeps_endpoints_and_returns_sorted_unique_indices():
+    x, y = make_series(1000)
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0
+    assert indices[-1] == 999
+    assert (np.diff(indices) > 0).all()
+
+
+def test_keeps_spike():
+    x = list(range(300))
+    y = [100000] * 300
+    y[150] = 150000
+    assert 150 in lttb_indices(x, y, 20).tolist()
+
+
+def test_small_inputs_are_returned_unchanged():
+    x, y = make_series(10)
+    assert lttb_indices(x, y, 10).tolist() == list(range(10))
+    assert lttb_indices(x, y, 20).tolist() == list(range(10))
+    assert lttb_indices(x, y, 2).tolist() == list(range(10))
+
+
+def test_downsample_history_keeps_both_series_within_limit():
+    x, y = make_series(400)
+    history = [
+        {'timestamp': timestamp, 'kaitori_price_min': price - 2000, 'kaitori_price_max': price}
+        for timestamp, price in zip(x, y)
+    ]
+    history[200]['kaitori_price_min'] = 50000
+    result = downsample_history(history, 60)
+    assert len(result) <= 60
+    assert result[0] is history[0] and result[-1] is history[-1]
+    assert history[200] in result
+    assert [point['timestamp'] for point in result] == sorted(point['timestamp'] for point in result)
+    assert downsample_history(history[:50], 60) == history[:50]
@@ -0,0 +1,97 @@
+import random
+import statistics
+
+from common.history_stats import DAY_SECONDS, ModelStats
+
+START = 1_760_000_000
+
+
+def make_points(count, seed=1):
+    rng = random.Random(seed)
+    points = []
+    timestamp = START
+    for _ in range(count):
+        timestamp += rng.randrange(3 * 60 * 60, 12 * 60 * 60)
+        points.append((timestamp, rng.randrange(100000, 150000, 100)))
+    return points
+
+
+def expected_summary(points, days, now):
+    values = [value for timestamp, value in points if timestamp >= now - days * DAY_SECONDS]
+    return {
+        'count': len(values),
+        'mean': statistics.fmean(values),
+        'std': statistics.stdev(values) if len(values) > 1 else 0.0,
+        'min': min(values),
+        'max': max(values),
+        'first': values[0],
+        'last': values[-1],
+    }
+
+
+def assert_matches_brute_force(stats, points):
+    now = points[-1][0]
+    summary = stats.summary()
+    for days in (7, 14, 30):
+        expected = expected_summary(points, days, now)
+        actual = summary[str(days)]
+        assert actual['count'] == expected['count']
+        assert abs(actual['mean'] - expected['mean']) <= 0.1
+        assert abs(actual['std'] - expected['std']) <= 0.1
+        for field in ('min', 'max', 'first', 'last'):
+            assert actual[field] == expected[field], (days, field)
+        assert actual['change'] == expected['last'] - expected['first']
+
+
+def test_rolling_windows_match_brute_force():
+    points = make_points(200)
+    stats = ModelStats('iPhone 17', '256GB')
+    for index, (timestamp, value) in enumerate(points, 1):
+        assert stats.add(timestamp, value)
+        if index % 25 == 0:
+            assert_matches_brute_force(stats, points[:index])
+
+
+def test_points_beyond_longest_window_are_dropped():
+    points = make_points(200)
+    stats = ModelStats('iPhone 17', '256GB')
+    for timestamp, value in points:
+        stats.add(timestamp, value)
+    cutoff = points[-1][0] - 30 * DAY_SECONDS
+    assert stats.points[0][0] >= cutoff
+    assert len(stats.points) == stats.summary()['30']['count']
+
+
+def test_duplicate_or_older_timestamp_is_ignored():
+    stats = ModelStats('iPhone 17', '256GB')
+    assert stats.add(START, 100000)
+    assert not stats.add(START, 120000)
+    assert not stats.add(START - 1, 120000)
+    assert not stats.add(START + 1, None)
+    assert stats.summary()['7']['count'] == 1
+    assert stats.summary()['7']['mean'] == 100000
+
+
+def test_summary_with_now_expires_old_points():
+    stats = ModelStats('iPhone 17', '256GB')
+    stats.add(START, 100000)
+    stats.add(START + DAY_SECONDS, 110000)
+    summary = stats.summary(now=START + 9 * DAY_SECONDS)
+    assert summary['7'] == {'days': 7, 'count': 0}
+    assert summary['14']['count'] == 2
+
+
+def test_round_trip_continues_with_same_result():
+    points = make_points(120, seed=2)
+    restored = ModelStats('iPhone 17', '256GB')
+    for timestamp, value in points[:60]:
+        restored.add(timestamp, value)
+    restored = ModelStats.from_dict(restored.to_dict())
+    continuous = ModelStats('iPhone 17', '256GB')
+    for timestamp, value in points[:60]:
+        continuous.add(timestamp, value)
+    for timestamp, value in points[60:]:
+        restored.add(timestamp, value)
+        continuous.add(timestamp, value)
+    assert restored.summary() == continuous.summary()
+    assert_matches_brute_force(restored, points)
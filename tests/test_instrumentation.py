@@ -0,0 +1,104 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import flask
+import pytest
+
+import common.instrumentation as instrumentation
+from common.cors import get_cors_headers
+from common.instrumentation import instrumented, phase, record_cache, record_reads, submit_with_context
+
+
+@pytest.fixture
+def cold_instance(monkeypatch):
+    monkeypatch.setattr(instrumentation, '_cold_start', True)
+
+
+def log_records(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{')]
+
+
+def timing_names(header):
+    return [entry.split(';')[0] for entry in header.split(', ')]
+
+
+def test_phases_reads_and_cache_are_reported(call_handler, capsys, cold_instance):
+    @instrumented('example')
+    def handler(request):
+        with phase('firestore'):
+            record_reads(3)
+        with phase('aggregate'):
+            record_cache('hit')
+        with phase('firestore'):
+            record_reads(2)
+        return ('{"ok": true}', 200, {'Content-Type': 'application/json'})
+
+    body, status, headers = call_handler(handler)
+    assert status == 200
+    assert timing_names(headers['Server-Timing']) == ['firestore', 'aggregate', 'total', 'cache', 'cold-start']
+    assert 'cache;desc="hit"' in headers['Server-Timing']
+    record, = log_records(capsys)
+    assert record['severity'] == 'INFO'
+    assert record['endpoint'] == 'example' and record['method'] == 'GET' and record['status'] == 200
+    assert record['documents_read'] == 5
+    assert record['response_bytes'] == len(body)
+    assert record['cache'] == {'hit': 1}
+    assert record['cold_start'] is True
+    assert set(record['phases_ms']) == {'firestore', 'aggregate'}
+
+    call_handler(handler)
+    assert log_records(capsys)[0]['cold_start'] is False
+
+
+def test_phases_recorded_in_a_thread_pool_are_kept(call_handler):
+    @instrumented('pooled')
+    def handler(request):
+        def work():
+            with phase('query'):
+                record_reads(4)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            for future in [submit_with_context(pool, work) for _ in range(2)]:
+                future.result()
+        return ('{}', 200, {})
+
+    body, status, headers = call_handler(handler)
+    assert timing_names(headers['Server-Timing'])[0] == 'query'
+
+
+def test_handler_errors_are_logged_and_timed(call_handler, capsys):
+    @instrumented('broken')
+    def handler(request):
+        with phase('firestore'):
+            raise RuntimeError('boom')
+
+    body, status, headers = call_handler(handler)
+    assert status == 500
+    assert json.loads(body) == {'error': 'Internal Server Error'}
+    assert headers['Access-Control-Allow-Origin'] == '*'
+    assert 'firestore' in timing_names(headers['Server-Timing'])
+    record, = log_records(capsys)
+    assert record['severity'] == 'ERROR'
+    assert 'RuntimeError: boom' in record['error']
+
+
+def test_streaming_responses_get_server_timing(call_handler, capsys):
+    @instrumented('stream')
+    def handler(request):
+        return flask.Response(iter(['a\n', 'b\n']), mimetype='application/x-ndjson')
+
+    response = call_handler(handler)
+    assert 'total' in timing_names(response.headers['Server-Timing'])
+    assert log_records(capsys)[0]['response_bytes'] is None
+
+
+def test_measurement_outside_a_request_is_a_no_op():
+    with phase('firestore'):
+        record_reads(10)
+        record_cache('miss')
+
+
+def test_browsers_can_read_server_timing():
+    headers = get_cors_headers()
+    assert 'Server-Timing' in headers['Access-Control-Expose-Headers']
+    assert headers['Timing-Allow-Origin'] == '*'
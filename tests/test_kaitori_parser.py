@@ -0,0 +1,77 @@
+from kaitori_parser import build_records, extract_rows, normalize_price, parse_document, parse_price_html
+
+
+def row(title, price_html):
+    return (
+        '<div class="tr">'
+        f'<div class="td td1"><div class="ttl"><h2>{title}</h2></div></div>'
+        f'<div class="td td2"><div class="td2wrap">{price_html}</div></div>'
+        '<div class="td td3"><a href="#">買取申込</a></div>'
+        '</div>'
+    )
+
+
+def page(*rows):
+    return (
+        '<html><body><header><nav><a href="#">メニュー</a></nav></header>'
+        f'<div class="table">{"".join(rows)}</div>'
+        '<footer><p>注意事項</p></footer></body></html>'
+    )
+
+
+def test_normalize_price():
+    assert normalize_price('123,456円') == 123456
+    assert normalize_price('¥ 98,000') == 98000
+    assert normalize_price('5000') == 5000
+    assert normalize_price('お問い合わせ') is None
+
+
+def test_extract_rows_reads_title_and_first_price():
+    html = page(
+        row('iPhone 17 256GB 黒 新品未開封', '<span>120,000</span>円'),
+        '<div class="tr"><div class="ttl"><h2>価格なし</h2></div></div>',
+        row('', '1,000円'),
+    )
+    assert extract_rows(parse_document(html)) == [('iPhone 17 256GB 黒 新品未開封', '120,000円')]
+
+
+def test_extract_rows_matches_class_tokens_not_substrings():
+    html = page(
+        '<div class="tr-header"><div class="ttl"><h2>iPhone 17 256GB 黒</h2></div>'
+        '<div class="td td2"><div class="td2wrap">1円</div></div></div>',
+        row('iPhone 17 512GB 白', '150,000円'),
+    )
+    assert extract_rows(parse_document(html)) == [('iPhone 17 512GB 白', '150,000円')]
+
+
+def test_parse_price_html_builds_records():
+    records = parse_price_html(page(
+        row('iPhone 17 Pro Max 1TB 黒 新品未開封', '<span>230,000</span>円'),
+        row('【新品未開封】iPhone 16 e 128GB 白', '70,000円'),
+    ))
+    assert [(r.series, r.capacity, r.colors, r.kaitori_price_max) for r in records] == [
+        ('iPhone 17 Pro Max', '1TB', (('黒', 230000),), 230000),
+        ('iPhone 16 e', '128GB', (('白', 70000),), 70000),
+    ]
+
+
+def test_build_records_skips_unusable_rows():
+    records = build_records([
+        ('Galaxy S25 256GB 黒', '100,000円'),     # 未知のモデル
+        ('iPhone 17 黒', '100,000円'),            # 容量なし
+        ('iPhone 17 1TB 黒', '100,000円'),        # カタログにない容量
+        ('iPhone 17 256GB 黒', 'お問い合わせ'),    # 価格なし
+        ('iPhone 17 256GB', '100,000円'),
+    ])
+    assert [(r.series, r.capacity, r.colors) for r in records] == [('iPhone 17', '256GB', (('不明', 100000),))]
+
+
+def test_build_records_normalizes_capacity_alias():
+    records = build_records([('iPhone 17 Pro Max 2GB 黒', '250,000円')])
+    assert [(r.series, r.capacity) for r in records] == [('iPhone 17 Pro Max', '2TB')]
+
+
+def test_empty_page():
+    assert parse_price_html('') == []
+    assert parse_price_html('   ') == []
+    assert parse_price_html(page()) == []
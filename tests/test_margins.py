@@ -0,0 +1,97 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+import get_prices.main as get_prices_main
+from common.margins import DEFAULT_CHANNELS, MarginCatalog, PurchaseChannel, channels_config, compute_margins, load_channels
+
+CHANNELS = (
+    PurchaseChannel('official', 'Apple'),
+    PurchaseChannel('points', 'Points', point_rate=0.1),
+    PurchaseChannel('carrier', 'Carrier', discount_rate=0.05, discount_amount=22000, coupon=3000, point_rate=0.01),
+)
+
+KAITORI = {
+    'iPhone 17': {
+        '256GB': {'kaitori_price_max': 130000, 'colors': {'Black': 130000, 'White': 128000}},
+        '512GB': {'kaitori_price_max': 150000, 'colors': {'Black': 150000, 'White': 0}},
+    },
+    'iPhone 17 Pro': {
+        '256GB': {'kaitori_price_max': 180000, 'colors': {'Blue': 180000}},
+    },
+}
+OFFICIAL = {
+    'iPhone 17': {
+        '256GB': {'colors': {'Black': 129800, 'White': 129800}},
+        '512GB': {'colors': {'Black': 164800, 'White': 164800}},
+    },
+}
+
+
+def expected_margin(official, kaitori, channel):
+    paid = official * (1 - channel.discount_rate) - channel.discount_amount - channel.coupon
+    cost = paid * (1 - channel.point_rate)
+    return cost, kaitori - cost, (kaitori - cost) / cost
+
+
+def test_catalog_arrays_by_color():
+    catalog = MarginCatalog.from_prices(KAITORI, OFFICIAL)
+    assert catalog.series == ['iPhone 17', 'iPhone 17 Pro']
+    assert catalog.capacities == ['256GB', '512GB']
+    assert catalog.colors == ['Black', 'Blue', 'White']
+    assert catalog.shape == (2, 2, 3)
+    assert catalog.kaitori[0, 0, 2] == 128000
+    # 0円の色・公式価格がないシリーズ・存在しない容量は NaN
+    assert math.isnan(catalog.kaitori[0, 1, 2])
+    assert np.isnan(catalog.kaitori[1]).all()
+
+
+def test_catalog_arrays_by_capacity_use_max_and_average():
+    catalog = MarginCatalog.from_prices(KAITORI, OFFICIAL, by_color=False)
+    assert catalog.shape == (2, 2, 1)
+    assert catalog.kaitori[0, 1, 0] == 150000
+    assert catalog.official[0, 1, 0] == 164800
+
+
+def test_vectorized_margins_match_the_scalar_formula():
+    catalog = MarginCatalog.from_prices(KAITORI, OFFICIAL)
+    result = compute_margins(catalog, CHANNELS)
+    assert result.margin.shape == (len(CHANNELS),) + catalog.shape
+    for i, channel in enumerate(CHANNELS):
+        for s, c, k in zip(*np.nonzero(~np.isnan(catalog.kaitori))):
+            cost, margin, rate = expected_margin(catalog.official[s, c, k], catalog.kaitori[s, c, k], channel)
+            assert result.cost[i, s, c, k] == pytest.approx(cost)
+            assert result.margin[i, s, c, k] == pytest.approx(margin)
+            assert result.margin_rate[i, s, c, k] == pytest.approx(rate)
+    assert np.isnan(result.margin[:, 1]).all()
+
+
+def test_channel_values_are_json_ready():
+    result = compute_margins(MarginCatalog.from_prices(KAITORI, OFFICIAL), CHANNELS)
+    values = result.channel_values(0, 0, 0)
+    assert list(values) == ['official', 'points', 'carrier']
+    assert values['points'] == {'effective_price': 116820, 'margin': 13180, 'margin_rate': 0.1128}
+    json.dumps(values)
+
+
+def test_channels_come_from_the_environment(monkeypatch):
+    monkeypatch.delenv('MARGIN_CHANNELS', raising=False)
+    assert load_channels() == DEFAULT_CHANNELS
+    monkeypatch.setenv('MARGIN_CHANNELS', '[{"name": "docomo", "label": "ドコモ", "discount_amount": 22000}]')
+    assert load_channels() == (PurchaseChannel('docomo', 'ドコモ', discount_amount=22000),)
+    assert channels_config()[0]['discount_amount'] == 22000
+
+
+def test_get_prices_reports_margins_per_channel(seeded_db, call_handler, monkeypatch):
+    monkeypatch.setattr(get_prices_main, 'get_firestore_client', lambda: seeded_db)
+    monkeypatch.delenv('MARGIN_CHANNELS', raising=False)
+    body, status, _ = call_handler(get_prices_main.get_prices, path='/?series=iPhone 17')
+    assert status == 200
+    for capacity, prices in json.loads(body)['prices'].items():
+        channels = prices['channels']
+        assert set(channels) == {channel.name for channel in DEFAULT_CHANNELS}
+        # 従来の price_diff / rakuten_diff（公式価格の9割で購入）と同じ値
+        assert channels['official']['margin'] == prices['price_diff']
+        assert channels['rakuten']['margin'] == round(prices['rakuten_diff'])
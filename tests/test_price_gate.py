@@ -0,0 +1,111 @@
+from common.price_gate import ACCEPT, MIN_SAMPLES, PRICE_GATE_PROMOTE_AFTER, QUARANTINE, REJECT, WINDOW_SIZE
+from common.price_gate import PriceGate, PriceWindow, sku_key
+from common.price_record import PriceRecord
+
+SKU = 'iPhone 17_256GB_ブラック'
+BASE = 120000
+
+
+def warmed_gate(prices=None):
+    gate = PriceGate()
+    for price in prices or [BASE + 100 * i for i in range(MIN_SAMPLES)]:
+        assert gate.check(SKU, price)[0] == ACCEPT
+    return gate
+
+
+def test_warm_up_accepts_until_min_samples():
+    gate = PriceGate()
+    # サンプルが足りない間は中央値から離れた価格も受け入れる
+    prices = [BASE, BASE * 2, BASE // 2] + [BASE] * (MIN_SAMPLES - 3)
+    for price in prices:
+        assert gate.check(SKU, price) == (ACCEPT, {'reason': 'warming_up'})
+    assert gate.windows[SKU].count == MIN_SAMPLES
+    assert gate.check(SKU, BASE)[1].get('reason') != 'warming_up'
+
+
+def test_out_of_range_is_rejected_even_while_warming_up():
+    gate = PriceGate()
+    assert gate.check(SKU, 500)[0] == REJECT
+    assert gate.check(SKU, 3000000)[0] == REJECT
+    assert gate.check(SKU, '120000')[0] == REJECT
+    assert gate.windows[SKU].count == 0
+
+
+def test_in_band_price_is_accepted_and_added():
+    gate = warmed_gate()
+    decision, detail = gate.check(SKU, BASE + 1000)
+    assert decision == ACCEPT
+    assert 'median' in detail
+    assert gate.windows[SKU].values()[-1] == BASE + 1000
+
+
+def test_far_price_is_rejected_by_ratio():
+    gate = warmed_gate()
+    decision, detail = gate.check(SKU, BASE * 4)
+    assert decision == REJECT
+    assert detail['reason'] == 'ratio'
+    assert gate.check(SKU, BASE // 4)[0] == REJECT
+    assert gate.windows[SKU].count == MIN_SAMPLES
+
+
+def test_out_of_band_price_is_quarantined_without_changing_window():
+    gate = warmed_gate()
+    before = gate.windows[SKU].values()
+    decision, detail = gate.check(SKU, int(BASE * 1.5))
+    assert decision == QUARANTINE
+    assert detail['reason'] == 'band'
+    assert gate.windows[SKU].values() == before
+    assert gate.report()['flagged'][0]['sku'] == SKU
+
+
+def test_consistent_quarantines_are_promoted():
+    gate = warmed_gate()
+    new_level = int(BASE * 1.5)
+    prices = [new_level + 200 * i for i in range(PRICE_GATE_PROMOTE_AFTER)]
+    decisions = [gate.check(SKU, price) for price in prices]
+    assert [decision for decision, _ in decisions[:-1]] == [QUARANTINE] * (PRICE_GATE_PROMOTE_AFTER - 1)
+    assert decisions[-1][0] == ACCEPT
+    assert decisions[-1][1]['reason'] == 'promoted'
+    # ウィンドウは新しい価格帯に入れ替わる
+    assert gate.windows[SKU].values() == prices
+    assert gate.windows[SKU].pending == []
+
+
+def test_scattered_quarantines_are_not_promoted():
+    gate = warmed_gate()
+    prices = [int(BASE * 1.3), int(BASE * 1.8), int(BASE * 1.3)]
+    assert [gate.check(SKU, price)[0] for price in prices] == [QUARANTINE] * 3
+
+
+def test_in_band_price_clears_pending():
+    gate = warmed_gate()
+    assert gate.check(SKU, int(BASE * 1.5))[0] == QUARANTINE
+    assert gate.check(SKU, BASE)[0] == ACCEPT
+    assert gate.windows[SKU].pending == []
+
+
+def test_window_keeps_latest_prices_and_round_trips():
+    window = PriceWindow()
+    prices = list(range(100000, 100000 + (WINDOW_SIZE + 5) * 10, 10))
+    for price in prices:
+        window.push(price)
+    assert window.values() == prices[-WINDOW_SIZE:]
+    window.pending = [150000]
+    restored = PriceWindow.from_dict(window.to_dict())
+    assert restored.values() == window.values()
+    assert restored.pending == [150000]
+
+
+def test_filter_splits_records():
+    gate = warmed_gate()
+    records = [
+        PriceRecord.create('iPhone 17', '256GB', {'ブラック': BASE}),
+        PriceRecord.create('iPhone 17', '256GB', {'ブラック': int(BASE * 1.5)}),
+        PriceRecord.create('iPhone 17', '256GB', {'ブラック': BASE * 5}),
+    ]
+    assert sku_key(records[0]) == SKU
+    accepted, quarantined = gate.filter(records)
+    assert accepted == records[:1]
+    assert len(quarantined) == 1
+    assert quarantined[0]['gate']['reason'] == 'band'
+    assert gate.report()[REJECT] == 1
@@ -0,0 +1,110 @@
+import json
+import threading
+
+import pytest
+
+import get_price_history.main as history_main
+
+MODELS = 'iPhone 17:256GB,iPhone 16 Pro:1TB,iPhone 17:256GB'
+
+
+@pytest.fixture
+def db(seeded_db, monkeypatch):
+    monkeypatch.setattr(history_main, 'get_firestore_client', lambda: seeded_db)
+    return seeded_db
+
+
+def get(call_handler, path, headers=None):
+    body, status, response_headers = call_handler(history_main.get_price_history, path=path, headers=headers)
+    return json.loads(body), status, response_headers
+
+
+def test_batch_returns_every_model_in_one_response(db, call_handler):
+    result, status, headers = get(call_handler, f'/?models={MODELS}&days=7')
+    assert status == 200
+    # 重複指定は1回だけ返し、指定の順を保つ
+    assert [(entry['series'], entry['capacity']) for entry in result['models']] == [
+        ('iPhone 17', '256GB'), ('iPhone 16 Pro', '1TB')
+    ]
+    for entry in result['models']:
+        assert entry['status'] == 'ok'
+        assert len(entry['history']) == entry['original_count'] > 0
+        assert {(point['series'], point['capacity']) for point in entry['history']} == {(entry['series'], entry['capacity'])}
+    assert headers['Cache-Control'] == 'public, max-age=300'
+
+
+def test_batch_matches_single_model_responses(db, call_handler):
+    batch, _, _ = get(call_handler, '/?models=iPhone 17 Pro:512GB&days=7')
+    single, _, _ = get(call_handler, '/?series=iPhone 17 Pro&capacity=512GB&days=7')
+    assert batch['models'][0]['history'] == single['history']
+
+
+def test_slow_model_times_out_without_failing_the_batch(db, call_handler, monkeypatch):
+    release = threading.Event()
+    query_history = history_main._query_history
+
+    def slow_query(db, series, capacity, *args):
+        if series == 'iPhone 16 Pro':
+            release.wait(5)
+        return query_history(db, series, capacity, *args)
+
+    monkeypatch.setattr(history_main, '_query_history', slow_query)
+    monkeypatch.setattr(history_main, 'BATCH_MODEL_TIMEOUT_SECONDS', 0.2)
+    try:
+        result, status, headers = get(call_handler, f'/?models={MODELS}')
+    finally:
+        release.set()
+    assert status == 200
+    statuses = {entry['series']: entry['status'] for entry in result['models']}
+    assert statuses == {'iPhone 17': 'ok', 'iPhone 16 Pro': 'timeout'}
+    # 欠けたレスポンスはキャッシュさせない
+    assert headers['Cache-Control'] == 'no-store'
+
+
+@pytest.mark.parametrize('models', ['iPhone 17', 'iPhone 17:', ':256GB', ','.join(f'iPhone {i}:256GB' for i in range(21))])
+def test_batch_rejects_invalid_models(db, call_handler, models):
+    result, status, _ = get(call_handler, f'/?models={models}')
+    assert status == 400
+
+
+def test_cursor_pages_round_trip_to_the_full_history(db, call_handler):
+    full, _, _ = get(call_handler, '/?series=iPhone 17&capacity=256GB&days=7')
+    pages, token = [], None
+    while True:
+        path = '/?series=iPhone 17&capacity=256GB&days=7&page_size=4'
+        result, status, _ = get(call_handler, path + (f'&page_token={token}' if token else ''))
+        assert status == 200
+        assert len(result['history']) <= 4
+        pages.append(result['history'])
+        token = result['next_page_token']
+        if token is None:
+            break
+    assert len(pages) > 1
+    assert len(pages) == -(-len(full['history']) // 4)
+    assert [point for page in pages for point in page] == full['history']
+    timestamps = [point['timestamp'] for point in full['history']]
+    assert timestamps == sorted(timestamps)
+
+
+def test_last_page_has_no_token(db, call_handler):
+    result, status, _ = get(call_handler, '/?series=iPhone 17&capacity=256GB&days=7&page_size=1000')
+    assert status == 200 and result['history'] and result['next_page_token'] is None
+
+
+@pytest.mark.parametrize('query', [
+    'page_size=0', 'page_size=1001', 'page_size=abc', 'page_token=not-a-token',
+    'page_size=5&max_points=10', 'page_size=5&format=compact',
+])
+def test_invalid_pagination_is_rejected(db, call_handler, query):
+    result, status, _ = get(call_handler, f'/?series=iPhone 17&capacity=256GB&{query}')
+    assert status == 400
+
+
+def test_ndjson_streams_one_point_per_line(db, call_handler):
+    full, _, _ = get(call_handler, '/?series=iPhone 17&capacity=256GB&days=7')
+    response = call_handler(history_main.get_price_history, path='/?series=iPhone 17&capacity=256GB&days=7',
+                            headers={'Accept': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == full['history']
@@ -0,0 +1,81 @@
+import dataclasses
+import sys
+
+import pytest
+
+from common.catalog import CatalogRegistry
+from common.price_record import PriceRecord, history_doc_id, merge_by_model, model_key
+
+TIMESTAMP = 1_760_000_000
+
+
+def make_catalog(*records):
+    catalog = CatalogRegistry()
+    for record in records:
+        catalog.assign('series', record.series)
+        catalog.assign('capacities', record.capacity)
+        for color, _ in record.colors:
+            catalog.assign('colors', color)
+    return catalog
+
+
+def test_create_computes_min_max_and_normalizes_capacity():
+    record = PriceRecord.create('iPhone 17 Pro', '1GB', {'白': 200000, '黒': 195000}, timestamp=TIMESTAMP)
+    assert record.capacity == '1TB'
+    assert (record.kaitori_price_min, record.kaitori_price_max) == (195000, 200000)
+    assert record.colors == (('白', 200000), ('黒', 195000))
+    assert record.model == model_key('iPhone 17 Pro', '1TB') == 'iPhone 17 Pro_1TB'
+
+
+def test_record_is_slotted_and_frozen():
+    record = PriceRecord.create('iPhone 17', '256GB', {'黒': 120000}, timestamp=TIMESTAMP)
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        record.kaitori_price_max = 0
+    # 同じ名前の文字列は共有する
+    other = PriceRecord.create(''.join(['iPhone', ' 17']), '256GB', {'黒': 1}, timestamp=TIMESTAMP)
+    assert other.series is sys.intern('iPhone 17') is record.series
+
+
+def test_kaitori_doc_round_trip():
+    record = PriceRecord.create('iPhone 17', '256GB', {'黒': 120000, '白': 118000}, timestamp=TIMESTAMP, source='fixture')
+    assert PriceRecord.from_firestore(record.to_kaitori_doc()) == record
+
+
+def test_history_doc_round_trip_uses_catalog_ids():
+    record = PriceRecord.create('iPhone 17', '256GB', {'黒': 120000, '白': 118000}, timestamp=TIMESTAMP)
+    catalog = make_catalog(record)
+    doc = record.to_history_doc(catalog)
+    assert doc['model_id'] == catalog.model_id('iPhone 17', '256GB')
+    assert set(doc['colors']) == {str(catalog.id_of('colors', '黒')), str(catalog.id_of('colors', '白'))}
+    assert doc['expiration_time'] == TIMESTAMP + 14 * 24 * 60 * 60
+    assert history_doc_id(doc) == f"{doc['model_id']}_{TIMESTAMP}"
+    assert PriceRecord.from_history_doc(doc, catalog) == record
+
+
+def test_history_doc_requires_registered_names():
+    record = PriceRecord.create('iPhone 17', '256GB', {'黒': 120000}, timestamp=TIMESTAMP)
+    with pytest.raises(KeyError):
+        record.to_history_doc(CatalogRegistry())
+    assert PriceRecord.from_history_doc(record.to_history_doc(make_catalog(record)), CatalogRegistry()) is None
+
+
+def test_from_firestore_handles_legacy_documents():
+    # 色の配列だけの古い形式・timestamp のない kaitori_prices
+    record = PriceRecord.from_firestore({
+        'series': 'iPhone 16', 'capacity': '128GB', 'colors': ['黒', '白'],
+        'kaitori_price_min': 90000, 'kaitori_price_max': 95000, 'updated_at': '2026-01-01T00:00:00'
+    })
+    assert record.color_prices == {'黒': 90000, '白': 90000}
+    assert record.timestamp > 0
+    assert PriceRecord.from_firestore({'series': 'iPhone 16'}) is None
+
+
+def test_merge_by_model_keeps_order_and_prefers_later_colors():
+    a = PriceRecord.create('iPhone 17', '256GB', {'黒': 120000, '白': 118000}, timestamp=TIMESTAMP)
+    b = PriceRecord.create('iPhone 16', '128GB', {'黒': 90000}, timestamp=TIMESTAMP)
+    c = PriceRecord.create('iPhone 17', '256GB', {'黒': 121000}, timestamp=TIMESTAMP + 60)
+    merged = merge_by_model([a, b, c])
+    assert [record.model for record in merged] == [a.model, b.model]
+    assert merged[0].color_prices == {'黒': 121000, '白': 118000}
+    assert merged[0].timestamp == TIMESTAMP + 60
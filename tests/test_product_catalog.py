@@ -0,0 +1,51 @@
+import pytest
+
+from common.product_catalog import ProductCatalog, load_product_catalog
+
+CATALOG = ProductCatalog({
+    'series': [
+        {'name': 'iPhone 17', 'current': True, 'capacities': ['256GB', '512GB'], 'colors': ['Black', 'White'],
+         'reference_prices': {'official': {'256GB': 129800}}},
+        {'name': 'iPhone 17 Pro', 'current': True, 'capacities': ['256GB', '1TB'], 'colors': ['Blue']},
+        {'name': 'iPhone 17 Pro Max', 'current': True, 'capacities': ['256GB', '2TB'], 'colors': ['Blue']},
+        {'name': 'iPhone 16', 'current': False, 'capacities': ['128GB'], 'colors': ['Black']},
+        {'name': 'iPhone 16 e', 'current': False, 'capacities': ['128GB'], 'colors': ['White']},
+    ],
+    'kaitori_colors': ['黒', '白', '青'],
+})
+
+
+@pytest.mark.parametrize('title, expected', [
+    ('iPhone 17 256GB 黒 新品未開封', ('iPhone 17', '256GB', '黒')),
+    ('【新品】iPhone 17 Pro Max 2TB 青', ('iPhone 17 Pro Max', '2TB', '青')),
+    ('iPhone 17 Pro 1TB', ('iPhone 17 Pro', '1TB', None)),
+    ('IPHONE17PRO 256 gb 白', ('iPhone 17 Pro', '256GB', '白')),
+    ('白 512GB iPhone 17', ('iPhone 17', '512GB', '白')),
+    ('iPhone 16 e 128GB', ('iPhone 16 e', '128GB', None)),
+    # 語の途中では一致しない
+    ('iPhone 160 128GB', (None, '128GB', None)),
+    ('iPhone 16 eSIM 128GB', ('iPhone 16', '128GB', None)),
+    ('Galaxy S25', (None, None, None)),
+])
+def test_parse_title(title, expected):
+    assert CATALOG.parse_title(title) == expected
+    assert CATALOG.identify_series(title) == expected[0]
+
+
+def test_catalog_lookups():
+    assert CATALOG.series_names(current=True) == ['iPhone 17', 'iPhone 17 Pro', 'iPhone 17 Pro Max']
+    assert CATALOG.series_names(current=False) == ['iPhone 16', 'iPhone 16 e']
+    assert CATALOG.capacities('iPhone 17 Pro Max') == ['256GB', '2TB']
+    assert CATALOG.capacities('unknown') == []
+    assert CATALOG.colors('iPhone 17') == ['Black', 'White']
+    assert CATALOG.reference_prices('official') == {
+        'iPhone 17': {'256GB': {'colors': {'Black': 129800, 'White': 129800}}}
+    }
+
+
+def test_bundled_catalog_parses_every_series_name():
+    catalog = load_product_catalog()
+    assert catalog is load_product_catalog()
+    for name in catalog.series_names():
+        capacity = catalog.capacities(name)[0]
+        assert catalog.parse_title(f'{name} {capacity} 黒') == (name, capacity, '黒')
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import get_rankings.main as get_rankings_main
+from common.margins import DEFAULT_CHANNELS
+from common.rankings import MAX_RANKING_ENTRIES, build_margin_ranking, is_truncated, refresh_margin_ranking, top_entries
+from local_functions_harness import InMemoryFirestore
+
+CAPACITIES = ('128GB', '256GB', '512GB', '1TB')
+COLORS = ('Black', 'Blue', 'Pink', 'White')
+CHANNELS = DEFAULT_CHANNELS
+# 利益の小さいシリーズ（利益額・利益率のどちらでも上位 MAX_RANKING_ENTRIES 件に入らない）
+LOW_MARGIN_SERIES = 'iPhone 12 mini'
+
+
+def make_prices(series_count=20):
+    """シリーズごとに 容量4 × 色4 × チャネル2 = 32 エントリーになる価格データ"""
+    kaitori_data, official_data = {}, {}
+    names = [f'Model {i:02d}' for i in range(series_count)] + [LOW_MARGIN_SERIES]
+    for index, series in enumerate(names):
+        low = series == LOW_MARGIN_SERIES
+        kaitori_data[series] = {}
+        official_data[series] = {}
+        for c, capacity in enumerate(CAPACITIES):
+            official = 100000 + c * 20000
+            colors = {
+                color: official - 30000 if low else official + 5000 + index * 500 + k * 100
+                for k, color in enumerate(COLORS)
+            }
+            kaitori_data[series][capacity] = {'kaitori_price_max': max(colors.values()), 'colors': colors}
+            official_data[series][capacity] = {'colors': {color: official for color in COLORS}}
+    return kaitori_data, official_data
+
+
+def test_ranking_keeps_top_entries_and_records_the_candidate_count():
+    ranking = build_margin_ranking(*make_prices(), channels=CHANNELS)
+    assert ranking['candidate_count'] == 21 * len(CAPACITIES) * len(COLORS) * len(CHANNELS)
+    assert MAX_RANKING_ENTRIES <= len(ranking['entries']) < ranking['candidate_count']
+    assert is_truncated(ranking)
+    margins = [entry['margin'] for entry in ranking['entries']]
+    assert margins == sorted(margins, reverse=True)
+    rates = [ranking['entries'][p]['margin_rate'] for p in ranking['rate_order']]
+    assert rates == sorted(rates, reverse=True)
+    # 上位から外れたシリーズは保存済みのランキングだけでは絞り込めない
+    assert top_entries(ranking, 10, series=LOW_MARGIN_SERIES) == []
+
+
+def test_full_ranking_is_not_truncated():
+    ranking = build_margin_ranking(*make_prices(), channels=CHANNELS, max_entries=None)
+    assert len(ranking['entries']) == ranking['candidate_count']
+    assert not is_truncated(ranking)
+    assert len(top_entries(ranking, 10, series=LOW_MARGIN_SERIES)) == 10
+
+
+@pytest.fixture
+def ranking_db(monkeypatch):
+    monkeypatch.delenv('MARGIN_CHANNELS', raising=False)
+    db = InMemoryFirestore()
+    kaitori_data, official_data = make_prices()
+    for series, capacities in kaitori_data.items():
+        for capacity, info in capacities.items():
+            db.collection('kaitori_prices').document().set({'series': series, 'capacity': capacity, **info})
+        db.collection('official_prices').document(series).set({'price': official_data[series]})
+    refresh_margin_ranking(db, CHANNELS)
+    monkeypatch.setattr(get_rankings_main, 'get_firestore_client', lambda: db)
+    get_rankings_main._rankings_cache.clear()
+    get_rankings_main._full_rankings_cache.clear()
+    yield db
+    get_rankings_main._rankings_cache.clear()
+    get_rankings_main._full_rankings_cache.clear()
+
+
+@pytest.mark.parametrize('by', ['margin', 'rate'])
+def test_series_filter_falls_back_to_the_full_ranking(ranking_db, call_handler, by):
+    body, status, headers = call_handler(get_rankings_main.get_rankings,
+                                         path=f'/?series={LOW_MARGIN_SERIES}&limit=20&by={by}')
+    assert status == 200
+    entries = json.loads(body)['entries']
+    assert len(entries) == 20
+    assert {entry['series'] for entry in entries} == {LOW_MARGIN_SERIES}
+    key = 'margin' if by == 'margin' else 'margin_rate'
+    assert [entry[key] for entry in entries] == sorted((entry[key] for entry in entries), reverse=True)
+
+
+def test_filter_served_from_the_stored_ranking_reads_one_document(ranking_db, call_handler):
+    ranking_db.reset_stats()
+    body, status, headers = call_handler(get_rankings_main.get_rankings, path='/?series=Model%2019&limit=20')
+    assert status == 200
+    entries = json.loads(body)['entries']
+    assert len(entries) == 20 and {entry['series'] for entry in entries} == {'Model 19'}
+    assert ranking_db.stats()['reads'] == 1
@@ -0,0 +1,93 @@
+import hashlib
+
+import pytest
+
+from common.rate_limit import LocalBackend, RateLimiter, client_key
+
+RATE = 1.0  # 1秒に1トークン
+CAPACITY = 3
+
+
+def test_bucket_allows_a_burst_then_limits():
+    backend = LocalBackend()
+    assert [backend.take('ip:a', RATE, CAPACITY, now=0) for _ in range(CAPACITY)] == [0, 0, 0]
+    assert backend.take('ip:a', RATE, CAPACITY, now=0) == pytest.approx(1.0)
+    # 他のクライアントのバケットは別
+    assert backend.take('ip:b', RATE, CAPACITY, now=0) == 0
+
+
+def test_bucket_refills_over_time_up_to_capacity():
+    backend = LocalBackend()
+    for _ in range(CAPACITY):
+        backend.take('ip:a', RATE, CAPACITY, now=0)
+    assert backend.take('ip:a', RATE, CAPACITY, now=0.5) == pytest.approx(0.5)
+    assert backend.take('ip:a', RATE, CAPACITY, now=1.0) == 0
+    # 長時間空いても容量以上はたまらない
+    results = [backend.take('ip:a', RATE, CAPACITY, now=100) for _ in range(CAPACITY + 1)]
+    assert results[:CAPACITY] == [0] * CAPACITY and results[-1] > 0
+
+
+def test_bucket_cost_and_retry_after():
+    backend = LocalBackend()
+    assert backend.take('ip:a', RATE, CAPACITY, cost=2, now=0) == 0
+    # 残り1トークンで2トークン必要なら1秒待つ
+    assert backend.take('ip:a', RATE, CAPACITY, cost=2, now=0) == pytest.approx(1.0)
+
+
+def test_local_backend_evicts_least_recently_used_keys():
+    backend = LocalBackend(max_keys=3)
+    for key in ('ip:a', 'ip:b', 'ip:c'):
+        backend.take(key, RATE, CAPACITY, now=0)
+    backend.take('ip:a', RATE, CAPACITY, now=0)  # a を最近使ったものにする
+    backend.take('ip:d', RATE, CAPACITY, now=0)
+    assert list(backend._buckets) == ['ip:c', 'ip:a', 'ip:d']
+    # 使い切ったバケットでも上限を超えれば古い順に捨て、件数は max_keys を超えない
+    for i in range(100):
+        for _ in range(CAPACITY + 1):
+            backend.take(f'ip:flood-{i}', RATE, CAPACITY, now=0)
+        assert len(backend._buckets) <= 3
+
+
+def key_for(call_handler, headers=None, allowed_keys=(), trusted_hops=1):
+    return call_handler(lambda request: client_key(request, list(allowed_keys), trusted_hops), headers=headers)
+
+
+def test_client_key_uses_allowed_api_keys_hashed(call_handler):
+    key = key_for(call_handler, {'X-API-Key': 'partner-key'}, allowed_keys=['partner-key'])
+    assert key == f"key:{hashlib.sha256(b'partner-key').hexdigest()[:16]}"
+    assert 'partner-key' not in key
+
+
+def test_client_key_ignores_unknown_api_keys(call_handler):
+    assert key_for(call_handler, {'X-API-Key': 'made-up'}, allowed_keys=['partner-key']) == 'ip:192.0.2.1'
+
+
+def test_client_key_uses_the_address_added_by_the_trusted_proxy(call_handler):
+    # 先頭はクライアントが自由に付けられるため、末尾から trusted_hops 番目を使う
+    headers = {'X-Forwarded-For': '6.6.6.6, 203.0.113.7'}
+    assert key_for(call_handler, headers) == 'ip:203.0.113.7'
+    assert key_for(call_handler, {'X-Forwarded-For': '6.6.6.6, 203.0.113.7, 10.0.0.1'}, trusted_hops=2) == 'ip:203.0.113.7'
+    # 転送ヘッダーを使わない設定、またはヘッダーが短い場合は接続元のアドレス
+    assert key_for(call_handler, headers, trusted_hops=0) == 'ip:192.0.2.1'
+    assert key_for(call_handler, headers, trusted_hops=3) == 'ip:192.0.2.1'
+
+
+def test_rate_limiter_returns_429_with_retry_after(call_handler):
+    limiter = RateLimiter(per_minute=60, burst=2, backend=LocalBackend())
+    headers = {'X-Forwarded-For': '198.51.100.1'}
+    assert call_handler(limiter.check, headers=headers) is None
+    assert call_handler(limiter.check, headers=headers) is None
+    body, status, response_headers = call_handler(limiter.check, headers=headers)
+    assert status == 429
+    assert int(response_headers['Retry-After']) >= 1
+    # 別のクライアントは制限されない
+    assert call_handler(limiter.check, headers={'X-Forwarded-For': '198.51.100.2'}) is None
+
+
+def test_rate_limiter_allows_requests_when_the_backend_fails(call_handler):
+    class BrokenBackend:
+        def take(self, *args, **kwargs):
+            raise RuntimeError('backend unavailable')
+
+    limiter = RateLimiter(backend=BrokenBackend())
+    assert call_handler(limiter.check) is None
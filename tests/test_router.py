@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import common.firestore_client as firestore_client
+import main as functions_main
+
+
+@pytest.fixture
+def db(seeded_db, monkeypatch):
+    # 全ハンドラーが共有するクライアント
+    monkeypatch.setattr(firestore_client, '_client', seeded_db)
+    return seeded_db
+
+
+def test_router_dispatches_by_the_first_path_segment(db, call_handler):
+    body, status, headers = call_handler(functions_main.router, path='/get_price_history?series=iPhone 17&capacity=256GB')
+    assert status == 200
+    assert json.loads(body)['series'] == 'iPhone 17'
+    assert 'Server-Timing' in headers
+
+
+def test_router_and_aliases_share_one_handler(db, call_handler):
+    routed = call_handler(functions_main.router, path='/get_rankings/?limit=3')
+    aliased = call_handler(functions_main.get_rankings, path='/?limit=3')
+    assert routed[1] == aliased[1] == 200
+    assert json.loads(routed[0]) == json.loads(aliased[0])
+    assert functions_main._get_handler('get_rankings') is functions_main._get_handler('get_rankings')
+
+
+def test_every_handler_has_an_alias():
+    for name in functions_main.HANDLER_NAMES:
+        assert callable(getattr(functions_main, name))
+
+
+def test_unknown_endpoint_lists_the_routes(call_handler):
+    body, status, headers = call_handler(functions_main.router, path='/nope')
+    assert status == 404
+    assert json.loads(body)['endpoints'] == [f'/{name}' for name in functions_main.HANDLER_NAMES]
+    assert headers['Access-Control-Allow-Origin']
+
+
+def test_cursor_pagination_round_trips_through_the_router(db, call_handler):
+    base = '/get_price_history?series=iPhone 16&capacity=128GB&days=7&page_size=3'
+    history, token = [], None
+    while True:
+        body, status, _ = call_handler(functions_main.router, path=base + (f'&page_token={token}' if token else ''))
+        assert status == 200
+        page = json.loads(body)
+        history += page['history']
+        token = page['next_page_token']
+        if token is None:
+            break
+    body, _, _ = call_handler(functions_main.router, path='/get_price_history?series=iPhone 16&capacity=128GB&days=7')
+    assert history == json.loads(body)['history']
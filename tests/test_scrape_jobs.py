@@ -0,0 +1,119 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import scrape_prices.main as scrape_prices_main
+from local_functions_harness import InMemoryFirestore, install_fake_transactional
+from scrape_prices.jobs import JOB_MIN_INTERVAL_SECONDS, SCRAPE_JOB_LOCK_ID, SCRAPE_JOB_LOCKS_COLLECTION, SCRAPE_JOBS_COLLECTION
+
+SECRET = 'trigger-secret'
+AUTHORIZED = {'Authorization': f'Bearer {SECRET}'}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    install_fake_transactional()
+    db = InMemoryFirestore()
+    monkeypatch.setattr(scrape_prices_main, 'get_firestore_client', lambda: db)
+    monkeypatch.setenv('SCRAPE_TRIGGER_SECRET', SECRET)
+    # ワーカー（GitHub Actions）は起動しない
+    monkeypatch.delenv('GITHUB_TOKEN', raising=False)
+    return db
+
+
+def post(call_handler, headers=AUTHORIZED):
+    body, status, response_headers = call_handler(scrape_prices_main.scrape_prices, method='POST', headers=headers)
+    return json.loads(body), status, response_headers
+
+
+def jobs(db):
+    return db._collections.get(SCRAPE_JOBS_COLLECTION, {})
+
+
+@pytest.mark.parametrize('headers', [{}, {'Authorization': 'Bearer wrong'}, {'Authorization': SECRET}])
+def test_enqueue_requires_the_trigger_secret(db, call_handler, headers):
+    body, status, response_headers = post(call_handler, headers)
+    assert status == 401
+    assert response_headers['WWW-Authenticate'] == 'Bearer'
+    assert not jobs(db)
+
+
+def test_enqueue_is_refused_when_no_secret_is_configured(db, call_handler, monkeypatch):
+    monkeypatch.delenv('SCRAPE_TRIGGER_SECRET')
+    body, status, headers = post(call_handler, {'Authorization': 'Bearer '})
+    assert status == 401
+
+
+def test_concurrent_requests_coalesce_into_one_job(db, call_handler):
+    first, status, _ = post(call_handler)
+    assert status == 202 and first['coalesced'] is False
+    second, status, _ = post(call_handler)
+    assert status == 202 and second['coalesced'] is True
+    assert second['job_id'] == first['job_id']
+    assert list(jobs(db)) == [first['job_id']]
+    assert jobs(db)[first['job_id']]['requested_count'] == 2
+
+    body, status, _ = call_handler(scrape_prices_main.scrape_prices, path=f"/?job_id={first['job_id']}")
+    assert status == 200
+    assert json.loads(body)['status'] == 'queued'
+
+
+def test_recently_completed_job_is_not_rerun(db, call_handler):
+    first, _, _ = post(call_handler)
+    finished_at = datetime.now() - timedelta(seconds=60)
+    db.collection(SCRAPE_JOBS_COLLECTION).document(first['job_id']).set(
+        {'status': 'completed', 'finished_at': finished_at.isoformat()}, merge=True)
+    body, status, headers = post(call_handler)
+    assert status == 429
+    assert body['job_id'] == first['job_id']
+    assert 0 < int(headers['Retry-After']) <= JOB_MIN_INTERVAL_SECONDS - 60 + 1
+    assert len(jobs(db)) == 1
+
+    # 最小間隔が過ぎれば新しいジョブを登録する
+    finished_at = datetime.now() - timedelta(seconds=JOB_MIN_INTERVAL_SECONDS + 1)
+    db.collection(SCRAPE_JOBS_COLLECTION).document(first['job_id']).set({'finished_at': finished_at.isoformat()}, merge=True)
+    body, status, _ = post(call_handler)
+    assert status == 202 and body['job_id'] != first['job_id']
+
+
+def test_stale_job_is_abandoned_and_replaced(db, call_handler):
+    first, _, _ = post(call_handler)
+    db.collection(SCRAPE_JOBS_COLLECTION).document(first['job_id']).set({'updated_at': '2020-01-01T00:00:00'}, merge=True)
+    second, status, _ = post(call_handler)
+    assert status == 202 and second['coalesced'] is False
+    assert jobs(db)[first['job_id']]['status'] == 'abandoned'
+
+
+def test_status_without_any_job_is_not_found(db, call_handler):
+    body, status, _ = call_handler(scrape_prices_main.scrape_prices)
+    assert status == 404
+
+
+def test_worker_claims_the_queued_job_once(db, call_handler, scrape_script):
+    tracker_cls = scrape_script.ScrapeJobTracker
+    queued, _, _ = post(call_handler)
+    tracker = tracker_cls.start(db)
+    assert tracker.job_id == queued['job_id']
+    assert jobs(db)[queued['job_id']]['status'] == 'running'
+    # 実行中のジョブがあれば2つ目のワーカーはスキップし、APIからの登録はそのジョブに合流する
+    assert tracker_cls.start(db) is None
+    body, status, _ = post(call_handler)
+    assert body['job_id'] == queued['job_id'] and body['coalesced'] is True
+
+    tracker.finish()
+    lock = db._collections[SCRAPE_JOB_LOCKS_COLLECTION][SCRAPE_JOB_LOCK_ID]
+    assert lock['job_id'] == queued['job_id']
+    assert jobs(db)[queued['job_id']]['status'] == 'completed'
+
+
+def test_delete_old_data_removes_history_older_than_two_weeks(scrape_script):
+    scraper = scrape_script.PriceScraper({}, connect_firestore=False)
+    scraper.db = InMemoryFirestore()
+    now = datetime.now()
+    for days in (1, 13, 15, 30):
+        timestamp = int((now - timedelta(days=days)).timestamp())
+        scraper.db.collection('price_history').document(f'model_{timestamp}').set({'timestamp': timestamp})
+    scraper.delete_old_data()
+    remaining = sorted(doc['timestamp'] for doc in scraper.db._collections['price_history'].values())
+    assert remaining == sorted(int((now - timedelta(days=days)).timestamp()) for days in (1, 13))
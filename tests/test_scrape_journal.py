@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from common.price_record import PriceRecord
+from scrape_journal import STATUS_COMPLETED, STATUS_RUNNING, ScrapeJournal, decode_records, encode_records
+
+RECORDS = [
+    PriceRecord.create('iPhone 17', '256GB', {'黒': 120000, '白': 118000}, timestamp=1_760_000_123),
+    PriceRecord.create('iPhone 17 Pro Max', '2GB', {'青': 250000}, timestamp=1_760_000_456),
+    PriceRecord.create('iPhone 16 e', '128GB', {'不明': 70000}, timestamp=1_760_000_789, source='fixture'),
+]
+
+
+def test_encode_decode_round_trip():
+    docs = encode_records(RECORDS)
+    # JSON を経由しても元の PriceRecord に戻る（timestamp も秒単位で保持する）
+    assert decode_records(json.loads(json.dumps(docs, ensure_ascii=False))) == RECORDS
+
+
+def test_decode_skips_incomplete_docs():
+    docs = encode_records(RECORDS[:1]) + [{'capacity': '256GB'}, {'series': 'iPhone 17'}]
+    assert decode_records(docs) == RECORDS[:1]
+
+
+def test_open_creates_and_resumes(tmp_path):
+    location = str(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        ScrapeJournal.open('missing', location, resume=True)
+
+    journal = ScrapeJournal.open('run1', location)
+    assert journal.meta()['status'] == STATUS_RUNNING
+    assert not journal.is_completed()
+    resumed = ScrapeJournal.open('run1', location, resume=True)
+    assert resumed.meta() == journal.meta()
+
+
+def test_pages_and_plan_round_trip(tmp_path):
+    journal = ScrapeJournal.open('run1', str(tmp_path))
+    urls = ['https://kaitori-rudea.com/category/detail/1', 'https://kaitori-rudea.com/category/detail/2?page=2']
+    journal.record_page(urls[0], RECORDS[:2])
+    journal.record_page(urls[1], RECORDS[2:])
+    journal.record_page(urls[1], [])  # 同じURLは上書き
+
+    resumed = ScrapeJournal.open('run1', str(tmp_path), resume=True)
+    assert resumed.completed_pages() == {urls[0]: RECORDS[:2], urls[1]: []}
+
+    assert resumed.load_plan() is None
+    resumed.save_plan(RECORDS, [{'sku': 'x'}], {'accept': 3}, {'skus': {}})
+    plan = ScrapeJournal.open('run1', str(tmp_path), resume=True).load_plan()
+    assert plan['records'] == RECORDS
+    assert plan['quarantined'] == [{'sku': 'x'}]
+    assert plan['report'] == {'accept': 3}
+
+
+def test_job_id_and_completion_are_kept_in_meta(tmp_path):
+    journal = ScrapeJournal.open('run1', str(tmp_path))
+    assert journal.job_id() is None
+    journal.record_job('job1')
+    journal.record_job('job1')
+    assert ScrapeJournal.open('run1', str(tmp_path), resume=True).job_id() == 'job1'
+
+    journal.mark_completed({'items_written': 3})
+    meta = journal.meta()
+    assert journal.is_completed()
+    assert meta['status'] == STATUS_COMPLETED
+    assert meta['job_id'] == 'job1'
+    assert meta['items_written'] == 3
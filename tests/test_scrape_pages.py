@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from test_kaitori_parser import page, row
+
+URLS = [f'https://kaitori.example/detail/{i}' for i in range(6)]
+FAILING_URL = URLS[3]
+TITLES = {
+    URLS[0]: 'iPhone 17 256GB 黒',
+    URLS[1]: 'iPhone 17 Pro 1TB 白',
+    URLS[2]: 'iPhone 16 128GB 青',
+    URLS[4]: 'iPhone 17 Pro Max 2TB 黒',
+    URLS[5]: 'iPhone 16 e 128GB 白',
+}
+
+
+class FakeJob:
+    def __init__(self):
+        self.total = None
+        self.done = []
+
+    def set_total(self, total):
+        self.total = total
+
+    def url_done(self, items):
+        self.done.append(items)
+
+
+class FakeJournal:
+    def __init__(self, completed):
+        self.completed = completed
+        self.recorded = {}
+
+    def completed_pages(self):
+        return self.completed
+
+    def record_page(self, url, records):
+        self.recorded[url] = records
+
+
+@pytest.fixture
+def scraper(scrape_script, monkeypatch):
+    monkeypatch.setattr(scrape_script, 'FETCH_CONCURRENCY', 2)
+    monkeypatch.setattr(scrape_script, 'PARSE_WORKERS', 2)
+    monkeypatch.setattr(scrape_script, 'PARSE_QUEUE_SIZE', 1)
+    scraper = scrape_script.PriceScraper({}, connect_firestore=False)
+    scraper.context = object()  # ブラウザは起動しない
+    scraper.fetched = []
+    active = {'now': 0, 'max': 0}
+    scraper.active = active
+
+    async def fetch_html(url):
+        active['now'] += 1
+        active['max'] = max(active['max'], active['now'])
+        try:
+            await asyncio.sleep(0.01)
+            scraper.fetched.append(url)
+            if url == FAILING_URL:
+                raise ConnectionError('timeout')
+            return page(row(TITLES[url], '100,000円'))
+        finally:
+            active['now'] -= 1
+
+    scraper.fetch_html = fetch_html
+    return scraper
+
+
+def test_pages_are_fetched_and_parsed_in_the_pool(scraper):
+    scraper.job = FakeJob()
+    results = asyncio.run(scraper.scrape_pages(URLS))
+    # 取得に失敗したURLは結果に含めない
+    assert set(results) == set(TITLES)
+    for url, title in TITLES.items():
+        record, = results[url]
+        assert scraper.product_catalog.parse_title(title)[:2] == (record.series, record.capacity)
+        assert record.kaitori_price_max == 100000
+    assert scraper.active['max'] <= 2
+    assert scraper.job.total == len(URLS)
+    assert sorted(scraper.job.done) == [0] + [1] * len(TITLES)
+
+
+def test_pages_recorded_in_the_journal_are_not_fetched_again(scraper):
+    first = asyncio.run(scraper.scrape_pages(URLS[:2]))
+    scraper.fetched.clear()
+    scraper.journal = FakeJournal({URLS[0]: first[URLS[0]]})
+    results = asyncio.run(scraper.scrape_pages(URLS[:3]))
+    assert sorted(scraper.fetched) == sorted(URLS[1:3])
+    assert results[URLS[0]] == first[URLS[0]]
+    assert set(scraper.journal.recorded) == {URLS[1], URLS[2]}
+    assert [record.model for record in results[URLS[1]]] == [record.model for record in first[URLS[1]]]
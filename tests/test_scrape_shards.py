@@ -0,0 +1,76 @@
+import pytest
+
+from common.price_record import PriceRecord
+from scrape_shards import merge_shard_outputs, parse_shard, save_shard_output, shard_of, shard_urls
+
+URLS = [f"https://kaitori-rudea.com/category/detail/{i}" for i in range(200)]
+
+
+def test_parse_shard():
+    assert parse_shard('1/4') == (1, 4)
+    assert parse_shard('4/4') == (4, 4)
+    for spec in ('0/4', '5/4', '1/0', '1', 'a/b', '1/2/3'):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_shards_partition_urls():
+    count = 4
+    shards = [shard_urls(URLS, index, count) for index in range(1, count + 1)]
+    assert sorted(url for shard in shards for url in shard) == sorted(URLS)
+    # ハッシュで偏りなく分かれる（各シャード 50 件前後）
+    assert all(30 <= len(shard) <= 70 for shard in shards)
+    # 設定の順を保つ
+    for shard in shards:
+        assert shard == [url for url in URLS if url in shard]
+
+
+def test_shard_is_stable_when_urls_change():
+    changed = URLS[10:] + [f"https://kaitori-rudea.com/category/detail/new{i}" for i in range(20)]
+    for index in range(1, 5):
+        before = set(shard_urls(URLS, index, 4))
+        after = set(shard_urls(changed, index, 4))
+        # 残ったURLのシャードは変わらない
+        assert before & set(changed) == after & set(URLS)
+
+
+def test_shard_of_is_deterministic():
+    # 実行環境（PYTHONHASHSEED など）によらず同じ値になる（sha1）
+    assert [shard_of(url, 4) for url in URLS[:5]] == [3, 1, 3, 1, 1]
+    assert {shard_of(url, 1) for url in URLS} == {1}
+
+
+def test_save_and_merge_in_config_order(tmp_path):
+    urls = URLS[:20]
+    records = {url: [PriceRecord.create('iPhone 17', '256GB', {'黒': 100000 + i}, timestamp=1_760_000_000)]
+               for i, url in enumerate(urls)}
+    paths = []
+    for index in (2, 1):
+        shard = shard_urls(urls, index, 2)
+        failed = shard[:1]
+        results = {url: records[url] for url in shard if url not in failed}
+        paths.append(save_shard_output(str(tmp_path / f"shard-{index}.json"), index, 2, shard, results, failed))
+
+    merged = merge_shard_outputs(paths, urls)
+    assert [page['url'] for page in merged['pages']] == urls
+    assert merged['missing_shards'] == []
+    failed_urls = {page['url'] for page in merged['pages'] if not page['ok']}
+    assert len(failed_urls) == 2
+    expected = [record for url in urls if url not in failed_urls for record in records[url]]
+    assert merged['results'] == expected
+
+
+def test_merge_reports_missing_shards_and_rejects_mixed_counts(tmp_path):
+    first = save_shard_output(str(tmp_path / 'a.json'), 1, 3, [URLS[0]], {URLS[0]: []})
+    assert merge_shard_outputs([first])['missing_shards'] == ['2/3', '3/3']
+    other = save_shard_output(str(tmp_path / 'b.json'), 1, 2, [URLS[1]], {URLS[1]: []})
+    with pytest.raises(ValueError):
+        merge_shard_outputs([first, other])
+
+
+def test_later_output_wins_for_same_url(tmp_path):
+    old = [PriceRecord.create('iPhone 17', '256GB', {'黒': 100000}, timestamp=1_760_000_000)]
+    new = [PriceRecord.create('iPhone 17', '256GB', {'黒': 110000}, timestamp=1_760_000_100)]
+    first = save_shard_output(str(tmp_path / 'first.json'), 1, 1, [URLS[0]], {URLS[0]: old})
+    rerun = save_shard_output(str(tmp_path / 'rerun.json'), 1, 1, [URLS[0]], {URLS[0]: new})
+    assert merge_shard_outputs([first, rerun])['results'] == new